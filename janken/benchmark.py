@@ -0,0 +1,604 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import pygame
+
+from game_config import GameConfig
+from loader import AssetLoader, IMAGE, default_workers
+from group import Group
+from sprites import SimpleSprite, RichSprite, layout_rects
+from pointer import PointerDispatcher
+from lazy import LazyDict
+from headless import enable as enable_headless
+
+"""
+ベンチマーク
+
+リポジトリのルートから実行する．
+    python janken/benchmark.py load
+    python janken/benchmark.py blit
+    python janken/benchmark.py group
+    python janken/benchmark.py pointer
+    python janken/benchmark.py screens --stages 50 --roster 20 --extra-sprites 1000 --output result.json
+    python janken/benchmark.py screens --baseline old.json
+"""
+
+
+def measure(fnc: Callable, repeat: int=5) -> List[float]:
+    """fncをrepeat回呼び出し，それぞれの経過時間(秒)のリストを返す
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fnc()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summarize(times: List[float]) -> Dict[str, float]:
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "max": max(times),
+    }
+
+
+def bench_load(json_path: str="./jsons/config.json", workers: Optional[int]=None, repeat: int=5) -> Dict[str, dict]:
+    """GameConfigの読み込み時間を，逐次(workers=0)と並列で比較する．
+    ディスクキャッシュを使わない場合と，キャッシュが温まっている場合，バンドルがあればバンドルからの読み込みも計測する．
+    重複排除で節約できたバイト数も報告する．
+
+    Args:
+        json_path (str, optional): config.jsonのパス. Defaults to "./jsons/config.json".
+        workers (Optional[int], optional): 並列読み込みのワーカー数. Defaults to None.
+        repeat (int, optional): 計測回数. Defaults to 5.
+    """
+    if workers is None:
+        workers = default_workers()
+    # キャッシュを温めておく
+    game_config = GameConfig(json_path, workers=workers, use_bundle=False)
+    result = {
+        "dedup": game_config.dedup_report(),
+        "serial": summarize(measure(lambda: GameConfig(json_path, workers=0, use_surface_cache=False, use_bundle=False), repeat)),
+        "parallel[{}]".format(workers): summarize(measure(lambda: GameConfig(json_path, workers=workers, use_surface_cache=False, use_bundle=False), repeat)),
+        "serial+surface_cache": summarize(measure(lambda: GameConfig(json_path, workers=0, use_bundle=False), repeat)),
+        "parallel[{}]+surface_cache".format(workers): summarize(measure(lambda: GameConfig(json_path, workers=workers, use_bundle=False), repeat)),
+        "lazy": summarize(measure(lambda: GameConfig(json_path, workers=workers, lazy=True, use_bundle=False).close(), repeat)),
+    }
+    if GameConfig(json_path, lazy=True).bundle is not None:
+        result["bundle"] = summarize(measure(lambda: GameConfig(json_path, workers=workers, use_surface_cache=False), repeat))
+    return result
+
+
+def bench_blit(json_path: str="./jsons/config.json", frames: int=60, repeat: int=5) -> Dict[str, dict]:
+    """config.jsonが参照する全ての画像を1フレームに1回ずつ描画したときの1フレームあたりの時間(秒)を，
+    ファイルのピクセルフォーマットのままの場合と，displayのフォーマットに変換した場合で比較する．
+    (0, 0)の色で透過した場合(カラーキー，変換後はRLEACCEL)も計測する．
+
+    Args:
+        json_path (str, optional): config.jsonのパス. Defaults to "./jsons/config.json".
+        frames (int, optional): 1回の計測で描画するフレーム数. Defaults to 60.
+        repeat (int, optional): 計測回数. Defaults to 5.
+    """
+    display = pygame.display.get_surface()
+    game_config = GameConfig(json_path, lazy=True, use_surface_cache=False, use_bundle=False)
+    loader = AssetLoader(workers=0)
+    raw = [loader.image(path) for kind, path in game_config.asset_paths() if kind == IMAGE]
+    game_config.close()
+
+    raw_colorkey = []
+    for surface in raw:
+        surface = surface.copy()
+        surface.set_colorkey(surface.get_at((0, 0)))
+        raw_colorkey.append(surface)
+    surfaces = {
+        "raw": raw,
+        "converted": [game_config.to_display_format(surface) for surface in raw],
+        "raw+colorkey": raw_colorkey,
+        "converted+colorkey": [game_config.to_display_format(surface) for surface in raw_colorkey],
+    }
+
+    def draw(surfaces: List[pygame.surface.Surface]):
+        for _ in range(frames):
+            for surface in surfaces:
+                display.blit(surface, (0, 0))
+
+    result = {}
+    for name, lst in surfaces.items():
+        draw(lst)
+        result[name] = summarize([t / frames for t in measure(lambda: draw(lst), repeat)])
+    result["images"] = len(raw)
+    return result
+
+
+def make_group_tree(sprites: int=10000, branching: int=10, depth: int=2, sprite_size: int=8) -> Group:
+    """Groupの木を作る．葉のGroupにspritesを均等に配る．
+
+    Args:
+        sprites (int, optional): Spriteの総数. Defaults to 10000.
+        branching (int, optional): 各Groupが持つ子Groupの数. Defaults to 10.
+        depth (int, optional): 木の深さ(子Groupの段数). Defaults to 2.
+        sprite_size (int, optional): Spriteの画像の一辺. Defaults to 8.
+    """
+    display_rect = pygame.display.get_surface().get_rect()
+    image = pygame.Surface((sprite_size, sprite_size)).convert()
+    image.fill((200, 100, 0))
+    leaves = [Group()]
+    root = leaves[0]
+    for _ in range(depth):
+        children = []
+        for group in leaves:
+            for _ in range(branching):
+                child = Group()
+                group.add(child)
+                children.append(child)
+        leaves = children
+    for i in range(sprites):
+        x = (i * 7) % (display_rect.w - sprite_size)
+        y = (i * 13) % (display_rect.h - sprite_size)
+        leaves[i % len(leaves)].add(SimpleSprite(pygame.Rect(x, y, sprite_size, sprite_size), image))
+    return root
+
+
+def bench_group(sprites: int=10000, repeat: int=5) -> Dict[str, dict]:
+    """sprites個のSpriteを持つGroupの木の draw, update, has と，1つの追加・削除後のdrawの時間を，
+    平坦化したリストを使う場合(flatten=True)と再帰的にたどる場合(flatten=False)で比較する．
+
+    Args:
+        sprites (int, optional): Spriteの総数. Defaults to 10000.
+        repeat (int, optional): 計測回数. Defaults to 5.
+    """
+    display = pygame.display.get_surface()
+    result = {}
+    flatten = Group.flatten
+    try:
+        for name, value in [("recursive", False), ("flat", True)]:
+            Group.flatten = value
+            build_times = measure(lambda: make_group_tree(sprites), 1)
+            root = make_group_tree(sprites)
+            targets = _all_sprites(root)[::max(1, sprites // 1000)]
+            extra = SimpleSprite(pygame.Rect(0, 0, 8, 8), pygame.Surface((8, 8)))
+            leaf = _first_leaf(root)
+
+            def add_remove_draw():
+                leaf.add(extra)
+                root.draw(display)
+                leaf.remove(extra)
+                root.draw(display)
+
+            root.draw(display)
+            result[name] = {
+                "build": summarize(build_times),
+                "draw": summarize(measure(lambda: root.draw(display), repeat)),
+                "update": summarize(measure(root.update, repeat)),
+                "has[{}]".format(len(targets)): summarize(measure(lambda: [root.has(sprite) for sprite in targets], repeat)),
+                "add+remove+draw": summarize(measure(add_remove_draw, repeat)),
+            }
+    finally:
+        Group.flatten = flatten
+    return result
+
+
+def _all_sprites(group: Group) -> List[pygame.sprite.Sprite]:
+    sprites = group.sprites()
+    for child in group.groups():
+        sprites += _all_sprites(child)
+    return sprites
+
+
+def _first_leaf(group: Group) -> Group:
+    while group.groups():
+        group = group.groups()[0]
+    return group
+
+
+def bench_pointer(sprites: int=1000, frames: int=60, repeat: int=5) -> Dict[str, dict]:
+    """hover・pressの関数を持つsprites個のRichSpriteを画面に敷き詰め，マウスカーソルが画面を横切るときの
+    1フレームあたりの update と当たり判定の時間(秒)を，全てのRichSpriteを毎フレーム当たり判定する場合(従来のポーリング)と，
+    PointerDispatcherで振り分ける場合で比較する．マウスの位置はpygame.mouseを使わずに直接渡す．
+
+    Args:
+        sprites (int, optional): RichSpriteの数. Defaults to 1000.
+        frames (int, optional): 1回の計測のフレーム数. Defaults to 60.
+        repeat (int, optional): 計測回数. Defaults to 5.
+    """
+    display_rect = pygame.display.get_surface().get_rect()
+    cols = max(1, int(sprites ** 0.5))
+    rows = (sprites + cols - 1) // cols
+    rects = layout_rects(display_rect, cols=cols, rows=rows)[:sprites]
+    positions = [
+        (display_rect.w * i // frames, display_rect.h * i // frames)
+        for i in range(frames)
+    ]
+    result = {}
+    for name, use_dispatcher in [("polling", False), ("dispatcher", True)]:
+        group = Group()
+        sprite_list = []
+        for rect in rects:
+            image = pygame.Surface(rect.size)
+            sprite = RichSprite(*rect.center, image=image, enter_fnc=_noop, exit_fnc=_noop, press_fnc=_noop)
+            group.add(sprite)
+            sprite_list.append(sprite)
+        dispatcher = PointerDispatcher()
+        dispatcher.watch(group)
+        if not use_dispatcher:
+            # update()の中でpygame.mouseを読まないようにし，同じ当たり判定をここで全てのRichSpriteに行う
+            for sprite in sprite_list:
+                sprite.dispatched = True
+
+        def run():
+            for pos in positions:
+                group.update()
+                if use_dispatcher:
+                    dispatcher.dispatch(pos, False)
+                else:
+                    for sprite in sprite_list:
+                        sprite.pointer_update(sprite.rect.collidepoint(pos), False)
+
+        run()
+        result[name] = summarize([t / frames for t in measure(run, repeat)])
+    result["dispatcher_stats"] = dispatcher.stats()
+    return result
+
+
+def _noop(*args):
+    pass
+
+
+class InputScript:
+    def __init__(self, path: List[Tuple[int, int]], keys: List[Tuple[int, ...]]=(), key_interval: int=30):
+        """ベンチマークで画面に与える入力．フレーム番号から決まるので，何度実行しても同じ入力になる．
+
+        Args:
+            path (List[Tuple[int, int]]): フレームごとのマウスカーソルの位置. 最後まで行ったら最初に戻る
+            keys (List[Tuple[int, ...]], optional): key_intervalフレームごとに順に押すキーの組. 次のフレームで離す. Defaults to ().
+            key_interval (int, optional): キーを押す間隔(フレーム数). Defaults to 30.
+        """
+        self.path = list(path)
+        self.keys = list(keys)
+        self.key_interval = key_interval
+
+    def pos(self, frame: int) -> Tuple[int, int]:
+        return self.path[frame % len(self.path)]
+
+    def events(self, frame: int) -> List[pygame.event.Event]:
+        if not self.keys:
+            return []
+        keys = self.keys[(frame // self.key_interval) % len(self.keys)]
+        if frame % self.key_interval == 0:
+            event_type = pygame.KEYDOWN
+        elif frame % self.key_interval == 1:
+            event_type = pygame.KEYUP
+        else:
+            return []
+        return [pygame.event.Event(event_type, key=key, mod=0, unicode="", scancode=0) for key in keys]
+
+
+def sweep_path(rect: pygame.Rect, frames: int=240, rows: int=6) -> List[Tuple[int, int]]:
+    """rectの中をrows行でジグザグに横切るマウスカーソルの位置(1周がframesフレーム)
+    """
+    per_row = max(1, frames // rows)
+    path = []
+    for row in range(rows):
+        y = rect.y + rect.h * (2 * row + 1) // (2 * rows)
+        for i in range(per_row):
+            x = rect.x + rect.w * i // per_row
+            path.append((x if row % 2 == 0 else rect.right - 1 - (x - rect.x), y))
+    return path
+
+
+def scale_game_config(game_config: GameConfig, stages: Optional[int]=None, roster: Optional[int]=None):
+    """game_configのステージとキャラクターを，既存のものを複製してstages個，roster個にする(画像・音声は共有する)．
+    Noneの場合はそのまま．
+    """
+    if stages is not None:
+        game_config.stages = _scaled_lazy_dict(
+            game_config.stages, stages,
+            lambda key, i, stage: stage.clone(key, "{} {}".format(stage.name, i))
+        )
+    if roster is not None:
+        game_config.characters = _scaled_lazy_dict(
+            game_config.characters, roster,
+            lambda key, i, character: character.clone(key, "{} {}".format(character.name, i))
+        )
+
+
+def _scaled_lazy_dict(dic: LazyDict, n: int, copy_fnc: Callable) -> LazyDict:
+    keys = list(dic)
+    if not keys:
+        raise(ValueError("nothing to scale"))
+    scaled = LazyDict()
+    for i in range(n):
+        key = keys[i % len(keys)]
+        if i < len(keys):
+            scaled.set(key, *dic.entry(key))
+        else:
+            # 複製は画像・音声を共有するので，読み込みの対象(leaves)も同じ
+            scaled.set(str(i), copy_fnc(str(i), i, dic[key]), leaves=dic.entry(key)[1])
+    return scaled
+
+
+def add_extra_sprites(screen, n: int, sprite_size: int=16):
+    """screen.middle_spritesに動かないSpriteをn個加える(描画の負荷)
+    """
+    if n <= 0:
+        return
+    display_rect = screen.display.get_rect()
+    image = pygame.Surface((sprite_size, sprite_size)).convert()
+    image.fill((200, 100, 0))
+    group = Group()
+    for i in range(n):
+        x = (i * 37) % (display_rect.w - sprite_size)
+        y = (i * 53) % (display_rect.h - sprite_size)
+        group.add(SimpleSprite(pygame.Rect(x, y, sprite_size, sprite_size), image))
+    screen.middle_sprites.add(group)
+
+
+def _rss() -> Optional[int]:
+    """プロセスの常駐メモリ(バイト)．Linux以外ではNone
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def screen_scenarios(game_config: GameConfig) -> Dict[str, Tuple[Callable, Callable, InputScript]]:
+    """画面名 -> (画面を作る関数, 画面を作った後main()の前に行う準備, 入力)
+
+    マウスは画面を横切るだけで押さない(押すと画面が遷移して終わる)．
+    CharacterSelectScreenはプレイヤー1のキーでキャラクターを選び，GameScreenは両プレイヤーが手を出し続ける．
+    """
+    from title import TitleScreen
+    from character_select import CharacterSelectScreen
+    from stage_select import StageSelectScreen
+    from game import GameScreen, get_sample_game_player
+    from result import ResultScreen
+
+    class GameSetting:
+        def __init__(self):
+            self.stage = list(game_config.stages.values())[0]
+            # 終わらないように十分大きくする
+            self.stock = 999
+
+    def players():
+        player1 = get_sample_game_player(game_config, name="bench1")
+        player2 = get_sample_game_player(game_config, name="bench2")
+        player2.player = list(game_config.players.values())[-1]
+        return player1, player2
+
+    path = sweep_path(pygame.display.get_surface().get_rect())
+    keybind = list(game_config.players.values())[0].keybind
+    return {
+        "title": (lambda: TitleScreen(game_config), _noop, InputScript(path)),
+        "character_select": (
+            lambda: CharacterSelectScreen(game_config, *players()),
+            _noop,
+            InputScript(path, keys=[(keybind.C,), (keybind.C,), (keybind.A,)], key_interval=20),
+        ),
+        "stage_select": (lambda: StageSelectScreen(game_config, GameSetting()), _noop, InputScript(path)),
+        "game": (
+            lambda: GameScreen(game_config, *players(), GameSetting()),
+            _noop,
+            InputScript(path, keys=[(pygame.K_1, pygame.K_9), (pygame.K_2, pygame.K_8), (pygame.K_3, pygame.K_0)], key_interval=60),
+        ),
+        "result": (lambda: ResultScreen(game_config, *players(), GameSetting()), _noop, InputScript(path)),
+    }
+
+
+def bench_screen(make: Callable, prepare: Callable, script: InputScript, extra_sprites: int=0, warmup: int=60, frames: int=600, repeat: int=5) -> Dict[str, dict]:
+    """画面を作る時間，入力を与えながら動かしたときの定常状態の1フレームの時間(フェーズごと)，メモリを計測する．
+    ヘッドレスモードで動かすので，1フレームは待ち時間を含まない．
+
+    Args:
+        make (Callable): 画面を作る関数
+        prepare (Callable): 画面を作った後，フレームを進める前に呼ぶ関数
+        script (InputScript): 入力
+        extra_sprites (int, optional): 負荷として加えるSpriteの数. Defaults to 0.
+        warmup (int, optional): 計測の前に進めるフレーム数. Defaults to 60.
+        frames (int, optional): 計測するフレーム数. 画面が途中で終わった場合はそこまで. Defaults to 600.
+        repeat (int, optional): 画面を作る時間の計測回数. Defaults to 5.
+    """
+    construct_times = measure(make, repeat)
+    rss_before = _rss()
+    tracemalloc.start()
+    screen = make()
+    # main()と同じく，画面に入るときの状態にしてから動かす
+    screen.reset()
+    prepare(screen)
+    add_extra_sprites(screen, extra_sprites)
+    construct_current, construct_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_constructed = _rss()
+
+    frame = 0
+    screen.profiler.enabled = True
+    screen.clock.resync()
+    pygame.event.clear()
+    while screen.run and frame < warmup + frames:
+        if frame == warmup:
+            screen.profiler.reset()
+        # マウスの位置は画面のPointerDispatcherに直接渡す(ボタンは押さない)
+        screen.pointer_input = (script.pos(frame), False)
+        for event in script.events(frame):
+            pygame.event.post(event)
+        screen.profiled_frame()
+        frame += 1
+    rss_after = _rss()
+
+    summary = screen.profiler.summary()
+    return {
+        "construct": summarize(construct_times),
+        "frames": summary["frames"],
+        "finished": not screen.run,
+        "frame": summary["frame"],
+        "phases": summary["phases"],
+        "sprites": summary["sprites"],
+        "groups": summary["groups"],
+        "memory": {
+            "construct_python_bytes": construct_current,
+            "construct_python_peak_bytes": construct_peak,
+            "construct_rss_bytes": None if rss_before is None else rss_constructed - rss_before,
+            "frames_rss_bytes": None if rss_after is None else rss_after - rss_constructed,
+            "rss_bytes": rss_after,
+        },
+    }
+
+
+def bench_screens(json_path: str="./jsons/config.json", screens: Optional[List[str]]=None, stages: Optional[int]=None, roster: Optional[int]=None,
+                  extra_sprites: int=0, warmup: int=60, frames: int=600, repeat: int=5) -> dict:
+    """各画面をヘッドレスモードで，決まった入力と負荷で動かして計測する(bench_screen)．
+    結果はJSONにでき，compare_results()でコミット間を比較できる．
+
+    Args:
+        json_path (str, optional): config.jsonのパス. Defaults to "./jsons/config.json".
+        screens (Optional[List[str]], optional): 計測する画面の名前. Noneの場合は全て. Defaults to None.
+        stages (Optional[int], optional): ステージの数. Noneの場合はconfigのまま. Defaults to None.
+        roster (Optional[int], optional): キャラクターの数. Noneの場合はconfigのまま. Defaults to None.
+        extra_sprites (int, optional): 各画面に負荷として加えるSpriteの数. Defaults to 0.
+        warmup (int, optional): 計測の前に進めるフレーム数. Defaults to 60.
+        frames (int, optional): 計測するフレーム数. Defaults to 600.
+        repeat (int, optional): 画面を作る時間の計測回数. Defaults to 5.
+    """
+    # 画面の中のrandom(BGMの選択など)を毎回同じにする
+    random.seed(0)
+    start = time.perf_counter()
+    game_config = GameConfig(json_path)
+    load_time = time.perf_counter() - start
+    scale_game_config(game_config, stages=stages, roster=roster)
+    scenarios = screen_scenarios(game_config)
+    if screens is None:
+        screens = list(scenarios)
+    unknown = [name for name in screens if name not in scenarios]
+    if unknown:
+        raise(ValueError("unknown screens: {}".format(", ".join(unknown))))
+
+    result = {
+        "meta": {
+            "revision": _git_revision(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "display": list(pygame.display.get_surface().get_size()),
+        },
+        "params": {
+            "stages": len(game_config.stages),
+            "roster": len(game_config.characters),
+            "extra_sprites": extra_sprites,
+            "warmup": warmup,
+            "frames": frames,
+            "repeat": repeat,
+        },
+        "load": load_time,
+        "screens": {},
+    }
+    for name in screens:
+        make, prepare, script = scenarios[name]
+        # 画面のprintを結果のJSONに混ぜない
+        with contextlib.redirect_stdout(io.StringIO()):
+            result["screens"][name] = bench_screen(make, prepare, script, extra_sprites=extra_sprites, warmup=warmup, frames=frames, repeat=repeat)
+    game_config.close()
+    return result
+
+
+def compare_results(baseline: dict, result: dict) -> Dict[str, dict]:
+    """bench_screens()の2つの結果を比べ，画面ごとに 今回/基準 の比を返す(1より大きければ遅くなった)
+    """
+    comparison = {}
+    for name, current in result["screens"].items():
+        base = baseline.get("screens", {}).get(name)
+        if base is None:
+            continue
+        ratios = {
+            "construct_median": _ratio(current["construct"]["median"], base["construct"]["median"]),
+            "frame_mean": _ratio(current["frame"]["mean"], base["frame"]["mean"]),
+            "frame_p95": _ratio(current["frame"]["p95"], base["frame"]["p95"]),
+            "frame_p99": _ratio(current["frame"]["p99"], base["frame"]["p99"]),
+            "construct_python_peak_bytes": _ratio(current["memory"]["construct_python_peak_bytes"], base["memory"]["construct_python_peak_bytes"]),
+        }
+        for phase, summary in current["phases"].items():
+            ratios[phase + "_mean"] = _ratio(summary["mean"], base["phases"][phase]["mean"])
+        comparison[name] = ratios
+    return {
+        "baseline": baseline.get("meta", {}).get("revision"),
+        "current": result.get("meta", {}).get("revision"),
+        "screens": comparison,
+    }
+
+
+def _ratio(current: float, base: float) -> Optional[float]:
+    if not base:
+        return None
+    return current / base
+
+
+def init_display(size=(700, 700)):
+    pygame.init()
+    if not pygame.display.get_surface():
+        pygame.display.set_mode(size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="janken benchmarks")
+    parser.add_argument("target", choices=["load", "blit", "group", "pointer", "screens"])
+    parser.add_argument("--config", default="./jsons/config.json")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--frames", type=int, default=None)
+    parser.add_argument("--sprites", type=int, default=10000)
+    parser.add_argument("--screens", nargs="*", default=None)
+    parser.add_argument("--stages", type=int, default=None)
+    parser.add_argument("--roster", type=int, default=None)
+    parser.add_argument("--extra-sprites", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    args = parser.parse_args()
+
+    if args.target == "screens":
+        enable_headless((700, 700))
+    init_display()
+    frames = args.frames
+    if frames is None:
+        frames = 600 if args.target == "screens" else 60
+    if args.target == "load":
+        result = bench_load(args.config, workers=args.workers, repeat=args.repeat)
+    elif args.target == "blit":
+        result = bench_blit(args.config, frames=frames, repeat=args.repeat)
+    elif args.target == "group":
+        result = bench_group(sprites=args.sprites, repeat=args.repeat)
+    elif args.target == "pointer":
+        result = bench_pointer(sprites=args.sprites, frames=frames, repeat=args.repeat)
+    elif args.target == "screens":
+        result = bench_screens(args.config, screens=args.screens, stages=args.stages, roster=args.roster,
+                               extra_sprites=args.extra_sprites, warmup=args.warmup, frames=frames, repeat=args.repeat)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=4)
+    print(json.dumps(result, indent=4))
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(json.dumps(compare_results(baseline, result), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+from typing import Dict, List, Tuple
+import argparse
+import glob
+import io
+import json
+import mmap
+import os
+import struct
+
+import pygame
+
+from surface_cache import file_digest
+from loader import IMAGE
+
+"""
+アセットを1つのファイルにまとめたバンドル
+
+    ヘッダ: magic(4byte), version(2byte), インデックスの長さ(4byte)
+    インデックス: JSON. 名前(正規化したパス) -> offset, length, format, size, colorkey, digest, mtime_ns, file_size
+    データ: 各ファイルの中身(またはデコード済みのピクセル). 64バイト境界に揃える
+            offsetはデータ領域の先頭からの位置
+
+ビルドはリポジトリのルートから実行する．
+    python janken/bundle.py [--predecode]
+
+元のファイルがある場合(開発中)は，更新時刻・サイズ(違えば内容のハッシュ)をインデックスと比べ，
+バンドルを作った後に編集されたファイルはバンドルではなく元のファイルから読み込む．
+"""
+
+MAGIC = b"JKBN"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+ALIGN = 64
+RAW_FORMATS = ["RGBA", "RGB"]
+
+
+def data_base(index_len: int) -> int:
+    """データ領域の開始位置
+    """
+    base = HEADER.size + index_len
+    return base + (-base) % ALIGN
+
+
+def normalize(path: str) -> str:
+    """バンドル内での名前．"./images/a.png" と "images/a.png" を同じ名前として扱う
+    """
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+class AssetBundle:
+    def __init__(self, path: str):
+        """バンドルファイルをmmapして読み込む．
+
+        デコード済みのピクセルを持つ画像は，mmapをそのまま共有する(コピーオンライト)．
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, version, index_len = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            raise(ValueError("{} はバンドルファイルではないか，バージョンが違います．".format(path)))
+        self.index: Dict[str, dict] = json.loads(self.mm[HEADER.size:HEADER.size + index_len].decode("utf-8"))
+        self.base = data_base(index_len)
+        # 名前 -> 元のファイルとバンドルの中身が同じかどうか
+        self.fresh: Dict[str, bool] = {}
+
+    def has(self, path: str) -> bool:
+        """pathがバンドルに含まれ，元のファイルから変わっていないかどうか．
+        バンドルを作った後に元のファイルが編集されていればFalse(元のファイルから読み込む)．
+        """
+        name = normalize(path)
+        if name not in self.index:
+            return False
+        fresh = self.fresh.get(name)
+        if fresh is None:
+            fresh = self._is_fresh(path, self.index[name])
+            self.fresh[name] = fresh
+            if not fresh:
+                print("{} はバンドル({})を作った後に変更されているので，元のファイルから読み込みます．".format(path, self.path))
+        return fresh
+
+    def _is_fresh(self, path: str, entry: dict) -> bool:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # 元のファイルが無い(配布時など)場合はバンドルを使う
+            return True
+        if (entry.get("mtime_ns"), entry.get("file_size")) == (stat.st_mtime_ns, stat.st_size):
+            return True
+        # 更新時刻が変わっていても，内容が同じならバンドルを使う
+        return file_digest(path).hex() == entry["digest"]
+
+    def isdir(self, path: str) -> bool:
+        """path以下にファイルが含まれているかどうか
+        """
+        prefix = normalize(path) + "/"
+        return any(name.startswith(prefix) for name in self.index)
+
+    def listdir(self, path: str) -> List[str]:
+        """path直下のファイルの名前をソートして返す
+        """
+        prefix = normalize(path) + "/"
+        return sorted(name for name in self.index if name.startswith(prefix) and "/" not in name[len(prefix):])
+
+    def digest(self, path: str) -> bytes:
+        """元のファイルの内容のハッシュ
+        """
+        return bytes.fromhex(self.index[normalize(path)]["digest"])
+
+    def nbytes(self, path: str) -> int:
+        return self.index[normalize(path)]["length"]
+
+    def data(self, path: str) -> memoryview:
+        entry = self.index[normalize(path)]
+        start = self.base + entry["offset"]
+        return memoryview(self.mm)[start:start + entry["length"]]
+
+    def open(self, path: str) -> io.BytesIO:
+        """ファイルの中身をファイルオブジェクトとして返す(pygame.font.Fontなどに渡せる)
+        """
+        return io.BytesIO(self.data(path))
+
+    def load_image(self, path: str) -> pygame.surface.Surface:
+        entry = self.index[normalize(path)]
+        if entry["format"] in RAW_FORMATS:
+            surface = pygame.image.frombuffer(self.data(path), tuple(entry["size"]), entry["format"])
+            if entry["colorkey"] is not None:
+                surface.set_colorkey(entry["colorkey"])
+            return surface
+        return pygame.image.load(self.open(path), normalize(path))
+
+    def load_sound(self, path: str) -> pygame.mixer.Sound:
+        return pygame.mixer.Sound(self.open(path))
+
+    def __repr__(self):
+        return "<AssetBundle: {} ({} files)>".format(self.path, len(self.index))
+
+
+def build_bundle(paths: List[Tuple[str, str]], out_path: str, predecode: bool=False) -> Dict[str, dict]:
+    """ファイルをまとめてバンドルファイルを作成する
+
+    Args:
+        paths (List[Tuple[str, str]]): (種類, パス)のリスト. 種類は IMAGE, SOUND, "file"
+        out_path (str): 出力するバンドルファイルのパス
+        predecode (bool, optional): Trueの場合，画像はデコード済みのピクセルを格納する. Defaults to False.
+
+    Returns:
+        Dict[str, dict]: インデックス
+    """
+    index = {}
+    blobs = []
+    offset = 0
+    for kind, path in paths:
+        name = normalize(path)
+        if name in index:
+            continue
+        stat = os.stat(path)
+        entry = {
+            "format": os.path.splitext(name)[1].lstrip(".").lower(),
+            "size": None,
+            "colorkey": None,
+            "digest": file_digest(path).hex(),
+            "mtime_ns": stat.st_mtime_ns,
+            "file_size": stat.st_size,
+        }
+        if kind == IMAGE:
+            surface = pygame.image.load(path)
+            entry["size"] = list(surface.get_size())
+            if predecode:
+                fmt = "RGBA" if surface.get_flags() & pygame.SRCALPHA else "RGB"
+                colorkey = surface.get_colorkey()
+                entry["format"] = fmt
+                entry["colorkey"] = list(colorkey) if colorkey is not None else None
+                data = pygame.image.tobytes(surface, fmt)
+            else:
+                with open(path, "rb") as f:
+                    data = f.read()
+        else:
+            with open(path, "rb") as f:
+                data = f.read()
+        entry["offset"] = offset
+        entry["length"] = len(data)
+        index[name] = entry
+        blobs.append(data)
+        offset += len(data) + (-len(data)) % ALIGN
+
+    index_bytes = json.dumps(index).encode("utf-8")
+    base = data_base(len(index_bytes))
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(index_bytes)))
+        f.write(index_bytes)
+        f.write(b"\0" * (base - HEADER.size - len(index_bytes)))
+        for data in blobs:
+            f.write(data)
+            f.write(b"\0" * ((-len(data)) % ALIGN))
+    os.replace(tmp_path, out_path)
+    return index
+
+
+def main():
+    from game_config import GameConfig
+
+    parser = argparse.ArgumentParser(description="config.jsonが参照するアセットを1つのファイルにまとめる")
+    parser.add_argument("--config", default="./jsons/config.json")
+    parser.add_argument("--out", default=None, help="出力先. 省略した場合はconfig.jsonの bundle.path")
+    parser.add_argument("--predecode", action="store_true", help="画像をデコード済みのピクセルで格納する")
+    parser.add_argument("--fonts", default="./fonts", help="一緒にまとめるフォントのディレクトリ")
+    args = parser.parse_args()
+
+    pygame.init()
+    game_config = GameConfig(args.config, lazy=True, use_bundle=False)
+    out_path = args.out or game_config.dic.get("bundle", {}).get("path")
+    if out_path is None:
+        parser.error("--out を指定するか，config.json に bundle.path を設定してください．")
+    paths = game_config.asset_paths()
+    paths += [("file", path) for path in sorted(glob.glob(os.path.join(args.fonts, "*")))]
+    index = build_bundle(paths, out_path, predecode=args.predecode)
+    game_config.close()
+    print("{}: {} files, {} bytes".format(out_path, len(index), os.path.getsize(out_path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,46 @@
+from typing import List, Union
+
 from pygame import Surface
 from pygame.mixer import Sound
 
+from lazy import Lazy, resolve
+
 class Character:
-    def __init__(self, id_: str, name: str, face: Surface, gu: Surface, choki: Surface, pa: Surface, select_voice: Sound):
+    def __init__(self, id_: str, name: str, face: Union[Surface, Lazy], gu: Union[Surface, Lazy], choki: Union[Surface, Lazy], pa: Union[Surface, Lazy], select_voice: Union[Sound, Lazy]):
         self.id = id_
         self.name = name
-        self.face_image = face
-        self.arm_image = [gu, choki, pa]
-        self.select_voice = select_voice
+        self._face_image = face
+        self._arm_image = [gu, choki, pa]
+        self._select_voice = select_voice
+    
+    @property
+    def face_image(self) -> Surface:
+        return resolve(self._face_image)
+    
+    @face_image.setter
+    def face_image(self, image: Surface):
+        self._face_image = image
+    
+    @property
+    def arm_image(self) -> List[Surface]:
+        return [resolve(image) for image in self._arm_image]
     
+    @arm_image.setter
+    def arm_image(self, images: List[Surface]):
+        self._arm_image = list(images)
+    
+    @property
+    def select_voice(self) -> Sound:
+        return resolve(self._select_voice)
+    
+    @select_voice.setter
+    def select_voice(self, sound: Sound):
+        self._select_voice = sound
+    
+    def clone(self, id_: str, name: str) -> "Character":
+        """画像・音声を(読み込む前ならLazyのまま)共有した，別のidと名前のCharacterを作る
+        """
+        return Character(id_, name, self._face_image, *self._arm_image, self._select_voice)
+
     def set_face_image(self, image: Surface):
         self.face_image = image
-
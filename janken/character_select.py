@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import json
 from enum import Enum
 
@@ -14,6 +14,10 @@ from character import Character
 from player import Player
 from transform import surface_fit_to_rect, to_hoverable
 from component import ValuesGroup
+from scale_cache import cached_scale, cached_scale2x
+from font_registry import get_font
+from text_cache import render_text
+from key_events import KeyEventBus
 
 from group import Group, GroupSingle, LayeredGroup
 
@@ -59,7 +63,7 @@ class BadgeSpriteGroup(Group):
             x = self.badgesprite.sprite.rect.centerx,
             y = self.badgesprite.sprite.rect.centery,
             text = text,
-            font = pygame.font.Font(None, font_size),
+            font = get_font(None, font_size),
             color = color,
             align = "center",
             vertical_align = "middle"
@@ -98,21 +102,43 @@ class BadgeSpriteGroup(Group):
         self.textsprite.sprite.rect.center = center
 
 class GamePlayerSetter(Group):
-    def __init__(self, gameplayer, func):
+    def __init__(self, gameplayer, func, key_events: Optional[KeyEventBus]=None, initial: bool=True):
+        """gameplayerのキー(keybind)が押されたら，func(gameplayer, キーの番号)を呼び出す部品
+
+        key_eventsを指定した場合は押した瞬間(KEYDOWN)に1回だけ呼び出す．
+        Noneの場合は毎フレームpygame.key.get_pressed()を読み，押している間呼び出し続ける．
+        initial=Trueの場合は作ったときに最初のキーが押されたものとする．Falseの場合はreset()で行う．
+        """
         super().__init__()
         self.gameplayer = gameplayer
         self.keys = gameplayer.player.keybind.keys
         self.func = func
-        self.func(gameplayer, 0)
+        self.key_events = key_events
+        if key_events is not None:
+            for key in self.keys:
+                key_events.subscribe(key, self._on_key_event)
+        if initial:
+            self.func(gameplayer, 0)
+
+    def _on_key_event(self, event: pygame.event.Event):
+        if event.type == pygame.KEYDOWN:
+            self.func(self.gameplayer, self.keys.index(event.key))
+
+    def reset(self):
+        """最初のキーが押されたものとする
+        """
+        self.func(self.gameplayer, 0)
     
     def update(self):
+        if self.key_events is not None:
+            return
         pressed_keys = pygame.key.get_pressed()
         for i, key in enumerate(self.keys):
             if pressed_keys[key]:
                 self.func(self.gameplayer, i)
 
 class CharacterSelectArea(LayeredGroup):
-    def __init__(self, display_rect, characters, outline, gameplayer1, gameplayer2):
+    def __init__(self, display_rect, characters, outline, gameplayer1, gameplayer2, key_events: Optional[KeyEventBus]=None):
         super().__init__()
         self.characters = characters
         self.outline_image = outline
@@ -147,9 +173,14 @@ class CharacterSelectArea(LayeredGroup):
             gameplayer2: BadgeSpriteGroup(25, (5, 200, 5), "2")
         }
         self.front_sprites.add(self.badges.values())
-        self.gameplayers = [GamePlayerSetter(gameplayer1, self._set_character), GamePlayerSetter(gameplayer2, self._set_character)]
+        # キャラクターの選択(gameplayerの変更と声の再生)は画面に入るときにreset()で行う
+        self.gameplayers = [GamePlayerSetter(gameplayer1, self._set_character, key_events, initial=False), GamePlayerSetter(gameplayer2, self._set_character, key_events, initial=False)]
         self.add(self.gameplayers)
 
+    def reset(self):
+        for gameplayer_setter in self.gameplayers:
+            gameplayer_setter.reset()
+
     def _set_character(self, gameplayer, i):
         if i >= len(self.characters):
             return
@@ -170,8 +201,12 @@ class CharacterSelectArea(LayeredGroup):
 
 
 class CharacterSelectScreen(BaseScreen):
+    reusable = True
+    next_screens = (Screen.STAGE_SELECT, Screen.START)
+
     def __init__(self, game_config, gameplayer1, gameplayer2):
         super().__init__()
+        self.idle_pacing = True
 
         self.game_config = game_config
         self.players = list(self.game_config.players.values())
@@ -185,12 +220,19 @@ class CharacterSelectScreen(BaseScreen):
         self.player_select_rect = None
 
         self.outline_image = self.game_config.components["outline"]
-        self.outline_image = pygame.transform.scale2x(self.outline_image)
+        self.outline_image = cached_scale2x(self.outline_image)
         self.font_size = 40
         self.font = pygame.font.SysFont(None, self.font_size)
 
-        self.character_select_area = CharacterSelectArea(self.display_rect, self.characters, self.outline_image, self.gameplayer1, self.gameplayer2)
-        
+        self.character_select_area = CharacterSelectArea(self.display_rect, self.characters, self.outline_image, self.gameplayer1, self.gameplayer2, key_events=self.key_events)
+        self._adapt_display()
+
+    def reset(self):
+        super().reset()
+        pygame.display.set_caption("Character Select")
+        self.character_select_area.reset()
+        for btn in self.player_select_btn:
+            btn.reset()
 
     def _goto_stage_select(self):
         for i, gameplayer in enumerate([self.gameplayer1, self.gameplayer2]):
@@ -203,7 +245,7 @@ class CharacterSelectScreen(BaseScreen):
         self.run = False
 
     def _set_next_btn(self):
-        next_btn_image = self.font.render("Next", True, (0, 0, 0))
+        next_btn_image = render_text(self.font, "Next", True, (0, 0, 0))
         self.next_btn = RichSprite(*self.display_rect.bottomright, image=next_btn_image, align="right", vertical_align="bottom")
         self.next_btn.rect.move_ip(-5, -5)
         outline = make_outline_sprites(self.next_btn.rect, self.outline_image)
@@ -213,7 +255,7 @@ class CharacterSelectScreen(BaseScreen):
         self.front_sprites.add(self.next_btn)
     
     def _set_back_btn(self):
-        back_btn_image = self.font.render("Back", True, (0, 0, 0))
+        back_btn_image = render_text(self.font, "Back", True, (0, 0, 0))
         back_btn = RichSprite(*self.display_rect.bottomleft, image=back_btn_image, align="left", vertical_align="bottom")
         back_btn.rect.move_ip(5, -5)
         outline = make_outline_sprites(back_btn.rect, self.outline_image)
@@ -254,10 +296,8 @@ class CharacterSelectScreen(BaseScreen):
 
 
     def _adapt_display(self):
-        pygame.display.set_caption("Character Select")
-        
         bg_image = self.game_config.components["background"]
-        bg_image = pygame.transform.scale(bg_image, self.display_rect.size)
+        bg_image = cached_scale(bg_image, self.display_rect.size)
         bg_sprite = SimpleSprite(rect=self.display_rect, image=bg_image)
         self.background_sprites.add(bg_sprite)
 
@@ -273,10 +313,7 @@ class CharacterSelectScreen(BaseScreen):
         elif not self.front_sprites.has(self.next_btn) and self.player_select_btn[0].get_value() != self.player_select_btn[1].get_value():
             self.front_sprites.add(self.next_btn)
 
-    def main(self):
-        self._adapt_display()
-        super().main()
-            
+
 def main():
     from game_config import GameConfig
     pygame.init()
@@ -0,0 +1,135 @@
+from typing import Dict
+import time
+
+import pygame
+
+"""
+時間の管理
+
+描画のフレームレートとは別に，ゲームの更新(update)は固定の時間刻み(FIXED_STEP秒 = 1tick)で進める．
+GameClockは実際の経過時間を測って溜めておき，溜まった時間の分だけ update を呼ぶ回数を返す．
+タイマー・アニメーションはtick数で数えるので，30Hz, 60Hz, 144Hzのどれで描画しても同じ速さで進む．
+"""
+
+# 1tickの秒数
+FIXED_STEP = 1 / 60
+
+
+def seconds_to_ticks(seconds: float, step: float=FIXED_STEP) -> int:
+    """秒数をtick数に変換する(四捨五入)
+    """
+    return max(0, int(round(seconds / step)))
+
+
+def ticks_to_seconds(ticks: int, step: float=FIXED_STEP) -> float:
+    return ticks * step
+
+
+def seconds_to_interval(seconds: float, step: float=FIXED_STEP) -> int:
+    """アニメーションの画像1枚をseconds秒ずつ表示するための interval (RichSprite, AnimationSprite)
+    """
+    return max(0, seconds_to_ticks(seconds, step) - 1)
+
+
+class GameClock:
+    def __init__(self, step: float=FIXED_STEP, max_steps: int=5, snap: float=0.002, unthrottled: bool=False):
+        """pygame.time.Clockで実際の経過時間を測り，固定の時間刻みでの更新回数を求める．
+
+        Args:
+            step (float, optional): 1tickの秒数. Defaults to FIXED_STEP.
+            max_steps (int, optional): 1フレームで進める最大のtick数. 超えた分の時間は捨てる. Defaults to 5.
+            snap (float, optional): 溜まった時間が1tickにこれだけ足りない場合も1tick進める(フレームごとの経過時間のぶれで，更新回数が0回, 2回と揺れるのを防ぐ). \
+                進めすぎた分は次のフレームで差し引くので，時間がずれることはない. Defaults to 0.002.
+            unthrottled (bool, optional): Trueの場合，tick()はフレームレートの指定を無視して待たず，実際の経過時間に関係なく1フレームごとに1tick進める(ヘッドレスモード). Defaults to False.
+        """
+        self.step = step
+        self.max_steps = max_steps
+        self.snap = snap
+        self.unthrottled = unthrottled
+        self.reset()
+
+    def reset(self):
+        """フレーム数・tick数などの統計と溜まった時間を最初の状態に戻す(画面を再利用するとき)
+        """
+        self.clock = pygame.time.Clock()
+        # 直前のフレームの実際の経過時間(秒)
+        self.delta_time = self.step
+        # まだupdateに使っていない経過時間(秒)
+        self.accumulator = self.step
+        self.frames = 0
+        self.ticks = 0
+        self.dropped_ticks = 0
+        # tick()で測った実際の経過時間の合計(秒)
+        self.real_time = 0.0
+        self.last_time = time.perf_counter()
+
+    def tick(self, framerate: float=0) -> int:
+        """pygame.time.Clock.tick(framerate)を呼び，経過時間を溜める
+
+        Returns:
+            int: 前のフレームからの経過時間(ミリ秒)
+        """
+        ms = self.clock.tick(0 if self.unthrottled else framerate)
+        # ミリ秒単位より細かく測る
+        now = time.perf_counter()
+        seconds = now - self.last_time
+        self.last_time = now
+        self.real_time += seconds
+        if self.unthrottled:
+            self.delta_time = seconds
+            self.frames += 1
+            self.accumulator += self.step
+        else:
+            self.advance(seconds)
+        return ms
+
+    def advance(self, seconds: float):
+        """経過時間を溜める
+        """
+        self.delta_time = seconds
+        self.frames += 1
+        self.accumulator += seconds
+
+    def steps(self) -> int:
+        """溜まった時間で進めるtick数を返し，その分の時間を使う
+        """
+        n = int((self.accumulator + self.snap) / self.step)
+        if n > self.max_steps:
+            self.dropped_ticks += n - self.max_steps
+            n = self.max_steps
+            self.accumulator = 0.0
+        else:
+            # snapの分だけ負になることがある
+            self.accumulator -= n * self.step
+        self.ticks += n
+        return n
+
+    def resync(self):
+        """溜まった時間を捨て，次のフレームでは1tickだけ進める(画面の開始時やアイドルからの復帰時)
+        """
+        self.clock.tick()
+        self.last_time = time.perf_counter()
+        self.accumulator = self.step
+
+    def get_fps(self) -> float:
+        return self.clock.get_fps()
+
+    def average_fps(self) -> float:
+        """tick()で測った実際の経過時間から求めた平均のフレームレート
+        """
+        return self.frames / self.real_time if self.real_time > 0 else 0.0
+
+    def get_time(self) -> int:
+        return self.clock.get_time()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "frames": self.frames,
+            "ticks": self.ticks,
+            "dropped_ticks": self.dropped_ticks,
+            "fps": self.get_fps(),
+            "average_fps": self.average_fps(),
+        }
+
+    def __repr__(self):
+        return "<GameClock: {} frames, {} ticks, {} dropped>".format(self.frames, self.ticks, self.dropped_ticks)
@@ -1,4 +1,5 @@
 from typing import Tuple, NewType, Optional, Dict, Callable, Any, Union, List
+import heapq
 
 import pygame
 import pygame.gfxdraw
@@ -8,8 +9,13 @@ from pygame.sprite import Sprite
 
 from sprites import TextSprite, PressRect
 from sprites import RichSprite, SimpleSprite, adjust_rect
-from group import Group, GroupSingle, LayeredGroup
+from group import Group, GroupSingle, LayeredGroup, earliest_change
 from transform import surface_fit_to_rect, to_hoverable
+from scale_cache import cached_smoothscale, cached_scale2x
+from font_registry import get_font, fit_font_size, DEFAULT_FONT
+from text_cache import render_text
+from key_events import KeyEventBus
+from clock import seconds_to_ticks
 
 Color = NewType("Color", Tuple[int, int, int])
 
@@ -18,7 +24,7 @@ class SimpleButton(LayeredGroup):
         super().__init__()
         self.text = text
         self.font_size = height // 2
-        self.font = pygame.font.Font("./fonts/Mplus2-Medium.ttf", self.font_size)
+        self.font = get_font(DEFAULT_FONT, self.font_size)
         self.func = func
         self.func_args = func_args
         self.__text_height_scale = 1.0
@@ -32,9 +38,9 @@ class SimpleButton(LayeredGroup):
         self.init()
     
     def _fit_font(self):
-        while self.font.size(self.text)[0] > self.width:
-            self.font_size -= 1
-            self.font = pygame.font.Font("./fonts/Mplus2-Medium.ttf", self.font_size)
+        if self.font.size(self.text)[0] > self.width:
+            self.font_size = fit_font_size(self.text, self.width, self.font_size)
+            self.font = get_font(DEFAULT_FONT, self.font_size)
     
     def _set_frame(self, clear = True, image = None):
         if image == None:
@@ -44,7 +50,7 @@ class SimpleButton(LayeredGroup):
                 btn_image.set_colorkey(btn_image.get_at((0, 0)))
             self.frame_sprite = RichSprite(0, 0, image = btn_image, align = "left", vertical_align="top")
         else:
-            btn_image = pygame.transform.smoothscale(image, (self.width, self.height))
+            btn_image = cached_smoothscale(image, (self.width, self.height))
             self.frame_sprite = RichSprite(0, 0, image = btn_image, align = "left", vertical_align="top")
         self.frame_sprite.change_press_fnc(self.func, self.func_args)
 
@@ -56,8 +62,7 @@ class SimpleButton(LayeredGroup):
         self._fit_font()
         self._set_text()
         self._set_frame(clear=False)
-        self.outline = pygame.transform.scale2x(self.outline)
-        self.outline = pygame.transform.scale2x(self.outline)
+        self.outline = cached_scale2x(self.outline, times=2)
         
         self.outlines = to_hoverable(self.frame_sprite, self.outline, self.middle_sprites)
         self.background_sprites.add(self.frame_sprite)
@@ -74,6 +79,8 @@ class SimpleButton(LayeredGroup):
             if not self.middle_sprites.has(self.outlines):
                 for sprite in self.outlines:
                     sprite.rect.move_ip(dx, dy)
+            # 押せるframe_spriteが動いたので，マウスの当たり判定を作り直させる
+            self.members_moved()
         super().update()
 
 class CounterBtn:
@@ -110,6 +117,7 @@ class CounterBtn:
                 bgcolor=bgcolor,
                 align="center",
                 vertical_align="middle",
+                use_atlas=True,
             )
             self.sprites.append(num_sprite)
             left = min(left, num_sprite.rect.left)
@@ -180,7 +188,7 @@ class CounterSprite(Sprite):
         super().__init__()
         self.min = min_
         self.max = max_
-        self.images = [font.render(str(i), True, color) for i in range(min_, max_+1)]
+        self.images = [render_text(font, str(i), True, color, use_atlas=True) for i in range(min_, max_+1)]
         self.rects = [adjust_rect(image.get_rect(), x, y, align, vertical_align) for image in self.images]
         left = right = x
         top = bottom = y
@@ -251,11 +259,9 @@ def make_surface(size: Tuple[int, int], alpha: bool=True, used_colors: List[Colo
     surface = Surface(size)
     surface.fill(fill_color)
     if pygame.display.get_init():
+        surface = surface.convert()
         if alpha and bg_color is None:
-            surface.convert_alpha()
-            surface.set_colorkey(surface.get_at((0, 0)))
-        else:
-            surface.convert()
+            surface.set_colorkey(surface.get_at((0, 0)), pygame.RLEACCEL)
 
     return surface
 
@@ -276,14 +282,15 @@ class ValuesGroup(Group):
         super().__init__()
         self.values = values
         self.i = defalut_i
+        self.default_i = defalut_i
         self.base_rect = base_rect
         if defalut_i < 0 or len(values) <= defalut_i:
             raise(ValueError("default_i が values のリストの範囲を超えています."))
         
         # ラベルのSpriteのリストを作成
         self.labels = labels if labels else [str(v) for v in values]
-        font = pygame.font.Font(font_name, base_rect.h)
-        label_surfaces = [font.render(label, True, color) for label in self.labels]
+        font = get_font(font_name, base_rect.h)
+        label_surfaces = [render_text(font, label, True, color) for label in self.labels]
         self.label_sprites = []
         for surface in label_surfaces:
             rect = surface.get_rect()
@@ -331,6 +338,19 @@ class ValuesGroup(Group):
     
     def get_value(self):
         return self.values[self.i]
+
+    def set_index(self, i: int):
+        """i番目の値を選ぶ
+        """
+        if i < 0 or len(self.values) <= i:
+            raise(ValueError("i が values のリストの範囲を超えています."))
+        self.i = i
+        self._update_images()
+
+    def reset(self):
+        """初期値(defalut_i)に戻す
+        """
+        self.set_index(self.default_i)
     
     def _left(self):
         if self.i > 0:
@@ -379,7 +399,7 @@ class PlayerStockIcon(Group):
 
         # プレイヤーネーム
         font_size = int(0.2 * image_height)
-        font = pygame.font.Font(None, font_size)
+        font = get_font(None, font_size)
         left, bottom = self.character_sprite.rect.bottomright
         bottom -= stock_radius * 2
         self.player_name_sprite = TextSprite(
@@ -389,7 +409,8 @@ class PlayerStockIcon(Group):
             vertical_align="bottom",
             text=name,
             font=font,
-            color=(255, 255, 255)
+            color=(255, 255, 255),
+            use_atlas=True,
         )
         self.add(self.player_name_sprite)
 
@@ -419,36 +440,61 @@ class PlayerStockIcon(Group):
 
 
 class KeyHandler(Group):
-    def __init__(self, key_to_fnc_dic: Dict[int, Tuple[Callable, Any]]):
+    def __init__(self, key_to_fnc_dic: Dict[int, Tuple[Callable, Any]], key_events: Optional[KeyEventBus]=None):
         """キー入力に関数を割り当てる部品
 
+        キーを押して離した時に関数を呼び出し，入力の受け付けを止める(resume()で再開)．
+
         Args:
             key_to_fnc_dic (dict): pygame.K_***がキー，関数，引数のタプルがバリューの辞書
+            key_events (Optional[KeyEventBus], optional): 指定した場合はKEYDOWN/KEYUPのイベントで処理する. \
+                Noneの場合は毎フレームpygame.key.get_pressed()を読む. Defaults to None.
         """
         super().__init__()
         self.key_to_fnc_dic = key_to_fnc_dic
         self.waiting_inputs = True
         self.pressed = {key: False for key in self.key_to_fnc_dic.keys()}
+        self.key_events = key_events
+        if key_events is not None:
+            for key in self.key_to_fnc_dic:
+                key_events.subscribe(key, self._on_key_event)
     
     def stop(self):
         self.waiting_inputs = False
     
     def resume(self):
         self.waiting_inputs = True
+        if self.key_events is not None:
+            # 止めている間に押されたキーは，再開した時点で押されたものとする
+            for key in self.pressed:
+                self.pressed[key] = self.key_events.is_pressed(key)
+
+    def _call(self, key: int):
+        fnc, args = self.key_to_fnc_dic[key]
+        if args is not None:
+            fnc(*args)
+        else:
+            fnc()
+        self.stop()
+
+    def _on_key_event(self, event: pygame.event.Event):
+        if not self.waiting_inputs:
+            return
+        if event.type == pygame.KEYDOWN:  # 押した瞬間
+            self.pressed[event.key] = True
+        elif self.pressed[event.key]:  # 離した瞬間
+            self.pressed[event.key] = False
+            self._call(event.key)
     
     def update(self):
-        if self.waiting_inputs:
+        if self.waiting_inputs and self.key_events is None:
             key_pressed = pygame.key.get_pressed()
-            for key, (fnc, args) in self.key_to_fnc_dic.items():
+            for key in self.key_to_fnc_dic:
                 if not self.pressed[key] and key_pressed[key]:  # 押した瞬間のみ
                     self.pressed[key] = True
                 elif self.pressed[key] and not key_pressed[key]: # 離した瞬間のみ
                     self.pressed[key] = False
-                    if args is not None:
-                        fnc(*args)
-                    else:
-                        fnc()
-                    self.stop()
+                    self._call(key)
 
 
 class Checker(Group):
@@ -488,75 +534,202 @@ class Checker(Group):
                     self.fnc()
 
 
+class TimerHandle:
+    def __init__(self, sprite: Union[Sprite, Group], start_tick: int, end_tick: int, on_delete_fnc: Optional[Callable], on_delete_fnc_args: Any, layer: str, debug_label: str, seq: int):
+        """TimerGroup.add_timer_sprite() で登録したタイマー．cancel()で取り消せる．
+
+        Args:
+            sprite (Union[Sprite, Group]): 追加・削除するスプライトorグループ
+            start_tick (int): スプライトを追加するTimerGroupのtick
+            end_tick (int): スプライトを削除して on_delete_fnc を呼ぶTimerGroupのtick
+            on_delete_fnc (Optional[Callable]): 削除した際に呼び出す関数
+            on_delete_fnc_args (Any): 関数に渡す引数. Noneの場合は渡さない
+            layer (str): 追加するレイヤー (back, middle, front)
+            debug_label (str): 何のためのタイマーなのか
+            seq (int): 登録した順番. 同じtickのタイマーはこの順に処理する
+        """
+        self.sprite = sprite
+        self.start_tick = start_tick
+        self.end_tick = end_tick
+        self.fnc = on_delete_fnc
+        self.fnc_args = on_delete_fnc_args
+        self.layer = layer
+        self.debug_label = debug_label
+        self.seq = seq
+        self.group: Optional["TimerGroup"] = None
+        self.started = False
+        self.cancelled = False
+        # TimerGroupのヒープに入っているかどうか
+        self.queued = False
+
+    @property
+    def due(self) -> int:
+        """次に処理する(追加または削除する)tick
+        """
+        return self.end_tick if self.started else self.start_tick
+
+    @property
+    def active(self) -> bool:
+        """まだ終わっておらず，取り消されてもいないかどうか
+        """
+        return self.group is not None and not self.cancelled
+
+    def cancel(self, remove_sprite: bool=True):
+        """タイマーを取り消す．on_delete_fncは呼ばない．
+
+        Args:
+            remove_sprite (bool, optional): 既にスプライトを追加していた場合に取り除くかどうか. Defaults to True.
+        """
+        if self.active:
+            self.group._cancel(self, remove_sprite)
+
+    def __repr__(self):
+        return "<TimerHandle: {} {}-{} {}>".format(self.debug_label or self.sprite, self.start_tick, self.end_tick, "started" if self.started else "waiting")
+
+
 class TimerGroup(LayeredGroup):
     def __init__(self):
         """タイマーをセットして，時間が来たらスプライト(グループ)を追加・削除するグループ
+
+        タイマーは次に処理するtick(追加するtick，追加した後は削除するtick)の順にヒープ(heapq)に入れ，
+        update()では時間が来たものだけを取り出すので，登録しているタイマーの数によらず1tickの処理は軽い．
         """
         super().__init__()
-        self.time_sprites = {}
+        # update()を呼んだ回数
+        self.ticks = 0
+        # 登録中のスプライト -> TimerHandle
+        self.time_sprites: Dict[Union[Sprite, Group], TimerHandle] = {}
+        # (次に処理するtick, 登録した順番, ヒープに入れた順番, TimerHandle) のヒープ．取り消したものは取り出すときに捨てる
+        self._queue: List[Tuple[int, int, int, TimerHandle]] = []
+        self._cancelled = 0
+        self._seq = 0
+        self._pushed = 0
     
-    def add_timer_sprite(self, sprite: Union[Sprite, Group], timer: int, start_delay: int=0, on_delete_fnc: Optional[Callable]=None, on_delete_fnc_args: Any=None, layer: str="middle", debug_label: str=""):
+    def add_timer_sprite(self, sprite: Union[Sprite, Group], timer: int, start_delay: int=0, on_delete_fnc: Optional[Callable]=None, on_delete_fnc_args: Any=None, layer: str="middle", debug_label: str="") -> TimerHandle:
         """スプライト(or グループ)にタイマーをセットして追加する
 
         Args:
             sprite (Union[Sprite, Group]): 追加したいスプライトorグループ
-            timer (int): 追加したスプライトの生存フレーム数
-            start_delay (int, optional): スプライトを追加するまでのフレーム数. Defaults to 0.
+            timer (int): 追加したスプライトの生存tick数 (1tick = clock.FIXED_STEP秒)
+            start_delay (int, optional): スプライトを追加するまでのtick数. Defaults to 0.
             on_delete_fnc (Optional[Callable], optional): スプライトの生存期間が終了した際に呼び出される関数をセットできる. Defaults to None.
             on_delete_fnc_args (Any, optional): 関数に渡す引数をセットできる. Defaults to None.
             layer (str, optional): スプライトを追加したいレイヤー.自身のグループ内でのレイヤーとなる.back, middle, frontの文字列を渡す. Defaults to "middle".
             debug_label (str, optional): デバッグの際に表示したいラベル.何のためのスプライトorグループなのかを書いておくとわかりやすい. Defaults to "".
+
+        Returns:
+            TimerHandle: タイマーを取り消すためのハンドル. 同じスプライトのタイマーが既にあれば，それを置き換える
         """
-        dic = {
-            "time": timer,
-            "start_delay": start_delay,
-            "fnc": on_delete_fnc,
-            "fnc_args": on_delete_fnc_args,
-            "layer": layer,
-            "debug_label": debug_label,
-        }
-        self.time_sprites[sprite] = dic
+        old = self.time_sprites.get(sprite)
+        if old is not None:
+            # 前のタイマーは捨てる(スプライトはそのまま)．同じtickのタイマーの中での順番は前のものを引き継ぐ
+            self._cancel(old, remove_sprite=False)
+            seq = old.seq
+        else:
+            seq = self._seq
+            self._seq += 1
+        # 次のupdate()を1回目として，start_delay回目の後に追加し，その後timer回(最低1回)のupdate()で削除する
+        start_tick = self.ticks + start_delay + 1
+        handle = TimerHandle(sprite, start_tick, start_tick + max(timer, 1), on_delete_fnc, on_delete_fnc_args, layer, debug_label, seq)
+        handle.group = self
+        self.time_sprites[sprite] = handle
+        self._push(handle)
+        return handle
+
+    def add_timer_sprite_seconds(self, sprite: Union[Sprite, Group], seconds: float, start_delay: float=0.0, **kwargs) -> TimerHandle:
+        """add_timer_sprite() の生存期間と追加までの時間を秒で指定する版
+
+        Args:
+            sprite (Union[Sprite, Group]): 追加したいスプライトorグループ
+            seconds (float): 追加したスプライトの生存秒数
+            start_delay (float, optional): スプライトを追加するまでの秒数. Defaults to 0.0.
+            **kwargs: add_timer_sprite() に渡す引数 (on_delete_fnc, layer など)
+        """
+        return self.add_timer_sprite(sprite, seconds_to_ticks(seconds), start_delay=seconds_to_ticks(start_delay), **kwargs)
+
+    def cancel_timer_sprite(self, sprite: Union[Sprite, Group], remove_sprite: bool=True):
+        """spriteのタイマーを取り消す．on_delete_fncは呼ばない．
+        """
+        handle = self.time_sprites.get(sprite)
+        if handle is not None:
+            self._cancel(handle, remove_sprite)
+
+    def _push(self, handle: TimerHandle):
+        heapq.heappush(self._queue, (handle.due, handle.seq, self._pushed, handle))
+        self._pushed += 1
+        handle.queued = True
+
+    def _cancel(self, handle: TimerHandle, remove_sprite: bool):
+        handle.cancelled = True
+        handle.group = None
+        if self.time_sprites.get(handle.sprite) is handle:
+            del self.time_sprites[handle.sprite]
+        if handle.started and remove_sprite:
+            self._layer(handle.layer).remove(handle.sprite)
+        if not handle.queued:
+            return
+        # ヒープからはすぐには取り除かず，取り消したものが半分を超えたら作り直す
+        self._cancelled += 1
+        if self._cancelled * 2 > len(self._queue):
+            self._queue = [item for item in self._queue if not item[-1].cancelled]
+            heapq.heapify(self._queue)
+            self._cancelled = 0
+
+    def _layer(self, layer: str) -> Group:
+        if layer == "front":
+            return self.front_sprites
+        elif layer == "middle":
+            return self.middle_sprites
+        return self.background_sprites
+
+    def busy(self) -> bool:
+        return bool(self.time_sprites) or super().busy()
+
+    def next_change(self) -> Optional[int]:
+        """次にタイマーの時間が来る(スプライトを追加・削除する)までのupdate()の回数と，メンバのnext_change()のうち早いもの
+        """
+        queue = self._queue
+        # 先頭の取り消したタイマーはここで捨てる
+        while queue and queue[0][-1].cancelled:
+            heapq.heappop(queue)[-1].queued = False
+            self._cancelled -= 1
+        due = queue[0][0] - self.ticks if queue else None
+        return earliest_change(due, super().next_change())
     
     def update(self):
-        delete_sprites = []
-        for sprite, dic in self.time_sprites.items():
-            if dic["start_delay"] > 0:
-                dic["start_delay"] -= 1
-            elif dic["start_delay"] == 0:
-                print("add", dic)
-
+        self.ticks += 1
+        # このtickに時間が来たタイマーをまとめて取り出す．追加はすぐに行い，削除と関数の呼び出しは最後に登録順で行う
+        expired = []
+        queue = self._queue
+        while queue and queue[0][0] <= self.ticks:
+            handle = heapq.heappop(queue)[-1]
+            handle.queued = False
+            if handle.cancelled:
+                self._cancelled -= 1
+                continue
+            if not handle.started:
                 # 追加
-                if dic["layer"] == "front":
-                    self.front_sprites.add(sprite)
-                elif dic["layer"] == "middle":
-                    self.middle_sprites.add(sprite)
-                else:
-                    self.background_sprites.add(sprite)
-                
-                dic["start_delay"] -= 1
+                self._layer(handle.layer).add(handle.sprite)
+                handle.started = True
+                self._push(handle)
             else:
-                dic["time"] -= 1
-                if dic["time"] <= 0:
-                    delete_sprites.append(sprite)
+                expired.append(handle)
         
-        for sprite in delete_sprites:
-            dic = self.time_sprites.pop(sprite)
-
+        for handle in expired:
+            if handle.cancelled:
+                # 先に呼んだ関数の中で取り消された
+                continue
+            handle.group = None
+            if self.time_sprites.get(handle.sprite) is handle:
+                del self.time_sprites[handle.sprite]
             # 削除
-            # self.remove(sprite)
-            if dic["layer"] == "front":
-                self.front_sprites.remove(sprite)
-            elif dic["layer"] == "middle":
-                self.middle_sprites.remove(sprite)
-            else:
-                self.background_sprites.remove(sprite)
+            self._layer(handle.layer).remove(handle.sprite)
 
-            if dic["fnc"] is not None:
-                if dic["fnc_args"] is not None:
-                    dic["fnc"](dic["fnc_args"])
+            if handle.fnc is not None:
+                if handle.fnc_args is not None:
+                    handle.fnc(handle.fnc_args)
                 else:
-                    dic["fnc"]()
-
+                    handle.fnc()
 
 
 class SpriteTransformer:
@@ -608,7 +781,13 @@ class SpriteTransformManager(Group):
                 "image": sprite.image.subsurface(sprite.image.get_rect()),
             }
         }
-        
+
+    def busy(self) -> bool:
+        return bool(self.transform_sprites) or super().busy()
+
+    def next_change(self) -> Optional[int]:
+        # 変形は毎回進む
+        return 0 if self.transform_sprites else super().next_change()
     
     def update(self):
         remove_sprites = []
@@ -618,6 +797,7 @@ class SpriteTransformManager(Group):
                 prop = props.pop()
                 # print(transform_property)
                 prop.transform(sprite)
+                self._moved(sprite)
             else:
                 remove_sprites.append(sprite)
         
@@ -627,6 +807,15 @@ class SpriteTransformManager(Group):
                 origin = dic["origin"]
                 sprite.rect = origin["rect"]
                 sprite.image = origin["image"]
+                self._moved(sprite)
+
+    def _moved(self, sprite: Sprite):
+        """spriteを入れているGroupに，rectを動かしたことを知らせる(Group.members_moved)
+        """
+        for group in sprite.groups():
+            members_moved = getattr(group, "members_moved", None)
+            if members_moved is not None:
+                members_moved()
 
 def make_transform_properties(start_x: int, start_y: int, start_alpha: float, end_x: int, end_y: int, end_alpha: float, total_frame: int):
     """変形プロパティのリストを作成する
@@ -0,0 +1,120 @@
+from typing import Any, List, Optional, Tuple
+from collections import Counter
+
+import pygame
+from pygame.rect import Rect
+from pygame.surface import Surface
+
+"""
+変化した領域だけを描画し直すための部品
+
+BlitRecorderに対して描画すると，実際には描画せずに blit / fill の内容を記録する．
+DirtyRectTrackerは前のフレームの記録と比べて，変化した領域を求める．
+"""
+
+
+class BlitRecorder:
+    def __init__(self, surface: Surface):
+        """surfaceの代わりに描画先として渡し，blit(), blits(), fill()の内容を記録する．
+        それ以外の属性(get_rect()など)はsurfaceのものを返す．
+        """
+        self.surface = surface
+        self.clip = surface.get_rect()
+        # (描画内容を表すキー, 影響する領域)のリスト
+        self.entries: List[Tuple[tuple, Rect]] = []
+        # 記録中にidが再利用されないように，描画したSurfaceを保持しておく
+        self.sources: List[Surface] = []
+
+    def _record(self, source: Surface, dest: Any, area: Optional[Rect]=None, special_flags: int=0) -> Rect:
+        size = Rect(area).size if area is not None else source.get_size()
+        rect = Rect((dest[0], dest[1]), size).clip(self.clip)
+        key = (
+            id(source),
+            source.get_alpha(),
+            source.get_colorkey(),
+            tuple(rect),
+            tuple(Rect(area)) if area is not None else None,
+            special_flags,
+        )
+        self.entries.append((key, rect))
+        self.sources.append(source)
+        return rect
+
+    def blit(self, source: Surface, dest: Any, area: Optional[Rect]=None, special_flags: int=0) -> Rect:
+        return self._record(source, dest, area, special_flags)
+
+    def blits(self, blit_sequence, doreturn: bool=True) -> Optional[List[Rect]]:
+        rects = [self._record(*args) for args in blit_sequence]
+        return rects if doreturn else None
+
+    def fill(self, color, rect: Optional[Rect]=None, special_flags: int=0) -> Rect:
+        rect = Rect(rect).clip(self.clip) if rect is not None else self.clip.copy()
+        self.entries.append((("fill", tuple(pygame.Color(color)), tuple(rect), special_flags), rect))
+        return rect
+
+    def __getattr__(self, name: str):
+        return getattr(self.surface, name)
+
+
+def merge_rects(rects: List[Rect]) -> List[Rect]:
+    """重なる(含まれる・同じものを含む)領域を1つにまとめ，互いに重ならない領域のリストにする
+    """
+    merged: List[Rect] = []
+    for rect in rects:
+        rect = Rect(rect)
+        while True:
+            index = rect.collidelist(merged)
+            if index < 0:
+                break
+            rect.union_ip(merged.pop(index))
+        merged.append(rect)
+    return merged
+
+
+class DirtyRectTracker:
+    def __init__(self, max_rects: int=8):
+        """フレームごとの描画内容を比べて，変化した領域を求める．
+
+        Args:
+            max_rects (int, optional): 変化した領域がこれより多い場合は，1つの領域にまとめる. Defaults to 8.
+        """
+        self.max_rects = max_rects
+        self.keys: Optional[List[tuple]] = None
+        self.rects: List[Rect] = []
+        self.sources: List[Surface] = []
+        self.full = True
+
+    def invalidate(self):
+        """次のフレームで全体を描画し直す(Surfaceのピクセルを直接書き換えた場合など)
+        """
+        self.full = True
+
+    def dirty_rects(self, recorder: BlitRecorder) -> List[Rect]:
+        """前のフレームから変化した領域のリストを返す．変化が無ければ空のリスト．
+        重なる領域はまとめるので，返す領域は互いに重ならない．
+        """
+        keys = [key for key, _ in recorder.entries]
+        whole = recorder.clip.copy()
+        if self.full or self.keys is None:
+            rects = [whole]
+        elif keys == self.keys:
+            rects = []
+        else:
+            previous = Counter(self.keys)
+            current = Counter(keys)
+            changed = (previous - current) + (current - previous)
+            if not changed:
+                # 描画順だけが変わった場合
+                rects = [whole]
+            else:
+                rect_of = dict(zip(self.keys, self.rects))
+                rect_of.update((key, rect) for key, rect in recorder.entries)
+                # 画像を差し替えた場合などは，前のキーと新しいキーが同じ領域になる
+                rects = merge_rects([rect_of[key] for key in changed.elements() if rect_of[key].w and rect_of[key].h])
+                if len(rects) > self.max_rects:
+                    rects = [rects[0].unionall(rects[1:])]
+        self.full = False
+        self.keys = keys
+        self.rects = [rect for _, rect in recorder.entries]
+        self.sources = recorder.sources
+        return rects
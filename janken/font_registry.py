@@ -0,0 +1,121 @@
+from typing import Dict, Optional, Tuple
+import io
+import threading
+
+import pygame
+
+"""
+フォントのレジストリ
+
+フォントファイルは1度だけ読み込み，pygame.font.Fontは(ファイル, サイズ)ごとに1つだけ作って使い回す．
+共有されるので，取得したFontに set_bold() などの設定をしないこと．
+"""
+
+DEFAULT_FONT = "./fonts/Mplus2-Medium.ttf"
+
+
+class FontRegistry:
+    def __init__(self):
+        """(ファイル, サイズ)ごとにpygame.font.Fontを保持する．
+        """
+        # ファイルパス -> ファイルの中身
+        self.data: Dict[str, bytes] = {}
+        # (ファイルパス, サイズ) -> Font. ファイルパスがNoneの場合はpygameのデフォルトフォント
+        self.fonts: Dict[Tuple[Optional[str], int], pygame.font.Font] = {}
+        self.bundle = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def attach_bundle(self, bundle):
+        """バンドルに含まれるフォントはバンドルから読み込むようにする
+        """
+        self.bundle = bundle
+
+    def _read(self, path: str) -> bytes:
+        data = self.data.get(path)
+        if data is None:
+            if self.bundle is not None and self.bundle.has(path):
+                data = bytes(self.bundle.data(path))
+            else:
+                with open(path, "rb") as f:
+                    data = f.read()
+            self.data[path] = data
+        return data
+
+    def get(self, path: Optional[str], size: int) -> pygame.font.Font:
+        """フォントを取得する
+
+        Args:
+            path (Optional[str]): フォントファイルのパス. Noneの場合はpygameのデフォルトフォント
+            size (int): フォントサイズ
+
+        Returns:
+            pygame.font.Font: 共有されたFont
+        """
+        size = max(1, int(size))
+        key = (path, size)
+        with self.lock:
+            font = self.fonts.get(key)
+            if font is not None:
+                self.hits += 1
+                return font
+            self.misses += 1
+            if not pygame.font.get_init():
+                pygame.font.init()
+            if path is None:
+                font = pygame.font.Font(None, size)
+            else:
+                # Fontはファイルオブジェクトを読み続けるので，Fontごとに別のBytesIOを渡す
+                font = pygame.font.Font(io.BytesIO(self._read(path)), size)
+            self.fonts[key] = font
+            return font
+
+    def fit_size(self, path: Optional[str], text: str, width: int, max_size: int, min_size: int=1) -> int:
+        """textの描画幅がwidth以下になる最大のフォントサイズを，二分探索で求めて返す．
+        min_sizeでも収まらない場合はmin_sizeを返す．
+
+        Args:
+            path (Optional[str]): フォントファイルのパス
+            text (str): 描画するテキスト
+            width (int): 描画幅の上限
+            max_size (int): フォントサイズの上限
+            min_size (int, optional): フォントサイズの下限. Defaults to 1.
+        """
+        lo, hi = min_size, max(min_size, max_size)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.get(path, mid).size(text)[0] <= width:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def clear(self):
+        with self.lock:
+            self.fonts.clear()
+            self.data.clear()
+
+    def __repr__(self):
+        return "<FontRegistry: {} fonts, {} files, {} hits, {} misses>".format(len(self.fonts), len(self.data), self.hits, self.misses)
+
+
+font_registry = FontRegistry()
+
+
+def get_font(path: Optional[str]=DEFAULT_FONT, size: int=30) -> pygame.font.Font:
+    """font_registryからフォントを取得する
+    """
+    return font_registry.get(path, size)
+
+
+def fit_font_size(text: str, width: int, max_size: int, path: Optional[str]=DEFAULT_FONT, min_size: int=1) -> int:
+    """textがwidthに収まる最大のフォントサイズ
+    """
+    return font_registry.fit_size(path, text, width, max_size, min_size=min_size)
+
+
+def fit_font(text: str, width: int, max_size: int, path: Optional[str]=DEFAULT_FONT, min_size: int=1) -> pygame.font.Font:
+    """textがwidthに収まる最大のサイズのフォントをfont_registryから取得する
+    """
+    return font_registry.get(path, fit_font_size(text, width, max_size, path=path, min_size=min_size))
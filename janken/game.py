@@ -8,9 +8,16 @@ from sprites import RichSprite, SimpleSprite, layout_rects, TextSprite, fit_surf
 from component import PlayerStockIcon, KeyHandler, Checker, TimerGroup, SpriteTransformManager, make_transform_properties
 from transform import surface_fit_to_rect
 from game_config import GameConfig
+from registry import asset_registry
 from group import Group
+from font_registry import get_font, DEFAULT_FONT
+from text_cache import render_text
+from clock import seconds_to_ticks
+from replay import rng as get_rng
 
 class GameScreen(BaseScreen):
+    next_screens = (Screen.RESULT,)
+
     class Hand(Enum):
         ROCK = 0
         PAPER = 1
@@ -38,16 +45,22 @@ class GameScreen(BaseScreen):
         def __repr__(self):
             return "<Actor: {}>".format(self.game_player)
         
-    def __init__(self, game_player1, game_player2, game_setting):
+    def __init__(self, game_config, game_player1, game_player2, game_setting):
         """ゲーム画面
 
         Args:
+            game_config (GameConfig): ゲームの設定. Noneの場合はasset_registryから取得する.
             game_player1 (GamePlayer): プレイヤー情報(Player, Character, stock(player's rest stock))
             game_player2 (GamePlayer): プレイヤー情報(Player, Character, stock(player's rest stock))
             game_setting (GameSetting): ゲーム情報(stage, stock(先取))
         """
         super().__init__()
-        game_config = GameConfig("./jsons/config.json")
+        self.set_static_background()
+        # 自分でasset_registryから取得した場合は，画面を抜けるときに解放する
+        self.acquired_game_config = game_config is None
+        if game_config is None:
+            game_config = asset_registry.acquire("./jsons/config.json")
+        self.game_config = game_config
 
         if game_player1 is None:
             game_player1 = get_sample_game_player(game_config, name="sample1")
@@ -70,11 +83,11 @@ class GameScreen(BaseScreen):
         self.actor2 = self.Actor(game_player2)
 
         # self.font = pygame.font.Font(None, 60)
-        self.font = pygame.font.Font("./fonts/Mplus2-Medium.ttf", 60)
+        self.font = get_font(DEFAULT_FONT, 60)
 
-        self.yattane = pygame.mixer.Sound("./sounds/yattane.mp3")
-        self.uu = pygame.mixer.Sound("./sounds/uu.mp3")
-        self.sokomade = pygame.mixer.Sound("./sounds/sokomade.mp3")
+        self.yattane = game_config.sounds["yattane"]
+        self.uu = game_config.sounds["uu"]
+        self.sokomade = game_config.sounds["sokomade"]
 
         self.init()
     
@@ -134,16 +147,15 @@ class GameScreen(BaseScreen):
         """(デバッグ)ランダム勝敗ボタンの設置
         """
         rect = self.display.get_rect()
-        surface = self.font.render("random result", True, (255, 255, 255), (0, 0, 0))
+        surface = render_text(self.font, "random result", True, (255, 255, 255), (0, 0, 0))
         random_result_btn = RichSprite(rect.w//2, rect.h // 3, image=surface, press_fnc=self._random_result)
         self.middle_sprites.add(random_result_btn)
     
     def _random_result(self):
         """ランダムに勝敗をつける関数
         """
-        import random
         players = [self.actor1.game_player, self.actor2.game_player]
-        win_i = random.randint(0, 1)
+        win_i = get_rng().randint(0, 1)
         players[win_i].stock = 1
         players[(win_i + 1) % 2].stock = 0
 
@@ -161,7 +173,7 @@ class GameScreen(BaseScreen):
                 keys[1]: (self._set_hand, (actor, self.Hand.SCISSORS)),
                 keys[2]: (self._set_hand, (actor, self.Hand.PAPER)),
             }
-            key_hundler = KeyHandler(key_to_fnc_dic)
+            key_hundler = KeyHandler(key_to_fnc_dic, key_events=self.key_events)
             self.middle_sprites.add(key_hundler)
             self.key_handers.append(key_hundler)
     
@@ -246,20 +258,20 @@ class GameScreen(BaseScreen):
         """バトルアニメーションを開始
         """
         dummy = Group()
-        self.timer_group.add_timer_sprite(dummy, timer=30, on_delete_fnc=self.actor_state_group.empty)
+        self.timer_group.add_timer_sprite_seconds(dummy, 0.5, on_delete_fnc=self.actor_state_group.empty)
         if self.pre_aiko:
-            self.timer_group.add_timer_sprite(self.before_battle_sprite4, timer=60, start_delay=30, on_delete_fnc=self._start_battle_hand_animation, debug_label="あいこで")
-            self.timer_group.add_timer_sprite(self.before_battle_sprite5, timer=30, start_delay=90, layer="front", debug_label="しょ")
+            self.timer_group.add_timer_sprite_seconds(self.before_battle_sprite4, 1.0, start_delay=0.5, on_delete_fnc=self._start_battle_hand_animation, debug_label="あいこで")
+            self.timer_group.add_timer_sprite_seconds(self.before_battle_sprite5, 0.5, start_delay=1.5, layer="front", debug_label="しょ")
         else:
-            self.timer_group.add_timer_sprite(self.before_battle_sprite1, timer=60, start_delay=30, debug_label="最初はグー")
-            self.timer_group.add_timer_sprite(self.before_battle_sprite2, timer=60, start_delay=90, on_delete_fnc=self._start_battle_hand_animation, debug_label="じゃんけん")
-            self.timer_group.add_timer_sprite(self.before_battle_sprite3, timer=30, start_delay=150, layer="front", debug_label="ぽん")
+            self.timer_group.add_timer_sprite_seconds(self.before_battle_sprite1, 1.0, start_delay=0.5, debug_label="最初はグー")
+            self.timer_group.add_timer_sprite_seconds(self.before_battle_sprite2, 1.0, start_delay=1.5, on_delete_fnc=self._start_battle_hand_animation, debug_label="じゃんけん")
+            self.timer_group.add_timer_sprite_seconds(self.before_battle_sprite3, 0.5, start_delay=2.5, layer="front", debug_label="ぽん")
 
     def _start_battle_hand_animation(self):
         """手を出すアニメーションを開始
         """
         # self.actor_state_group.empty()
-        total_frame = 60
+        total_frame = seconds_to_ticks(1.0)
         group = Group()
         for actor in [self.actor1, self.actor2]:
             sprite = self.hand_sprites[actor][actor.hand]
@@ -290,14 +302,14 @@ class GameScreen(BaseScreen):
                 break
         
         dummy = Group()
-        self.timer_group.add_timer_sprite(dummy, timer=90, on_delete_fnc=self._start_battle_end_animation if end else self._reset, debug_label="ボイスの分")
+        self.timer_group.add_timer_sprite_seconds(dummy, 1.5, on_delete_fnc=self._start_battle_end_animation if end else self._reset, debug_label="ボイスの分")
     
     def _start_battle_end_animation(self):
         """Resultに移る前のアニメーション
         """
         self.sokomade.play()
         self.end_battle_sprite.image.set_alpha(0)
-        total_frame = 90
+        total_frame = seconds_to_ticks(1.5)
         props = make_transform_properties(0, 0, 0, 0, 0, 1, total_frame=int(total_frame * 0.3))
         self.transform_manager.add_transformer(self.end_battle_sprite, props)
         self.timer_group.add_timer_sprite(self.end_battle_sprite, timer=total_frame, on_delete_fnc=self._go_to_result, debug_label="result遷移までの間(そこまでボイス分)")
@@ -339,6 +351,12 @@ class GameScreen(BaseScreen):
 
         self._update_actor_state_sprites()
 
+    def main(self):
+        super().main()
+        if self.acquired_game_config:
+            asset_registry.release("./jsons/config.json")
+            self.acquired_game_config = False
+
 
 def get_sample_game_player(game_config, name: str="sample", stock: int=0):
     """GamePlayerのサンプルを得る
@@ -358,8 +376,6 @@ def get_sample_game_player(game_config, name: str="sample", stock: int=0):
 
     # player = Player(_id=random.randint(0, 10000), name=name, matches_num=1, win_num=1)
 
-    game_config = GameConfig("./jsons/config.json")
-
     class GamePlayer:
         def __init__(self):
             self.player = None
@@ -376,17 +392,19 @@ def get_sample_game_player(game_config, name: str="sample", stock: int=0):
 
     return game_player
 
-def get_sample_game_setting(game_config, stock: int=3):
+def get_sample_game_setting(game_config, stock: int=3, rng=None):
     """GameSetting(ステージ，ストック数)のサンプルを得る
 
     Args:
         game_config (GameConfig): ゲームの設定オブジェクト
         stock (int, optional): ストック数. Defaults to 3.
+        rng (random.Random, optional): ステージを選ぶ乱数. Noneの場合は入力の記録・再生中はそのシードの乱数(replay.rng()). Defaults to None.
 
     Returns:
         GameSetting: ステージ，ストック数をもつオブジェクト
     """
-    import random
+    if rng is None:
+        rng = get_rng()
 
     class GameSetting:
         def __init__(self):
@@ -394,7 +412,7 @@ def get_sample_game_setting(game_config, stock: int=3):
             self.stock = 0
         
     game_setting = GameSetting()
-    game_setting.stage = random.choice(list(game_config.stages.values()))
+    game_setting.stage = rng.choice(list(game_config.stages.values()))
     game_setting.stock = stock
 
     return game_setting
@@ -404,11 +422,11 @@ if __name__ == "__main__":
     pygame.init()
     pygame.display.set_mode((500, 500))
 
-    from game_config import GameConfig
-    game_config = GameConfig("./jsons/config.json")
+    game_config = asset_registry.acquire("./jsons/config.json")
 
     game_setting = get_sample_game_setting(game_config, stock=2)
     game_player1 = get_sample_game_player(game_config, name="sample1", stock=0)
     game_player2 = get_sample_game_player(game_config, name="sample2", stock=0)
-    gs = GameScreen(game_player1, game_player2, game_setting)
-    gs.main()
\ No newline at end of file
+    gs = GameScreen(game_config, game_player1, game_player2, game_setting)
+    gs.main()
+    asset_registry.release("./jsons/config.json")
\ No newline at end of file
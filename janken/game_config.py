@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Set, Union, Optional, Tuple
 import json
 import os
 import glob
@@ -8,32 +8,247 @@ import pygame
 from stage import Stage
 from character import Character
 from player import Player
+from loader import AssetLoader, LoadProgress, IMAGE, SOUND, asset_nbytes
+from bundle import AssetBundle
+from lazy import Lazy, LazyDict, prefetch
+from surface_cache import SurfaceCache
+from font_registry import font_registry
 
 class GameConfig:
-    def __init__(self, json_path: str):
+    def __init__(self, json_path: str, workers: Optional[int]=None, use_surface_cache: bool=True, lazy: bool=False, use_bundle: bool=True):
+        """ゲームの設定・アセットをまとめて保持する
+
+        Args:
+            json_path (str): config.jsonのパス
+            workers (Optional[int], optional): アセットのデコードに使うワーカースレッド数. 0の場合は逐次読み込む. Defaults to None.
+            use_surface_cache (bool, optional): デコード済み画像のディスクキャッシュを使うかどうか. Defaults to True.
+            lazy (bool, optional): Trueの場合，画像・サウンドは初めてアクセスされたときに読み込む. Defaults to False.
+            use_bundle (bool, optional): config.jsonのbundle.pathにバンドルファイルがあれば，そこから読み込む. 無い場合は個別のファイルから読み込む. \
+                バンドルを作った後に編集されたファイルは個別のファイルから読み込む. Defaults to True.
+        """
         with open(json_path, "r") as f:
             dic = json.load(f)
         self.dic = dic
-        self.stages = {}
-        self.characters = {}
+        self.workers = workers
+        self.lazy = lazy
+        self.surface_cache = SurfaceCache() if use_surface_cache else None
+        self.bundle = self._open_bundle() if use_bundle else None
+        self.loader = AssetLoader(self.workers, surface_cache=self.surface_cache, bundle=self.bundle)
+        self.stages = LazyDict()
+        self.characters = LazyDict()
         self.players = {}
-        self.components = {}
+        self.components = LazyDict()
+        self.sounds = LazyDict()
+        # (種類, 内容のハッシュ, 透過するかどうか) -> 読み込んだSurface・Sound (同じ内容のファイルは共有する)
+        self.assets: Dict[Tuple[str, bytes, bool], Any] = {}
+        # 表示用のピクセルフォーマットに変換済みのassetsのキー
+        self.display_format_keys: Set[Tuple[str, bytes, bool]] = set()
+        self.dedup_hits = 0
+        self.dedup_saved_bytes = 0
 
         self.check_pygame_inits()
         self.load()
 
+    def _open_bundle(self) -> Optional[AssetBundle]:
+        """config.jsonのbundle.pathにあるバンドルを開く．無ければNone(個別のファイルから読み込む)．
+        """
+        tmp_dic = self.dic.get("bundle")
+        if tmp_dic and os.path.isfile(tmp_dic["path"]):
+            bundle = AssetBundle(tmp_dic["path"])
+            # バンドルにまとめたフォントもバンドルから読み込む
+            font_registry.attach_bundle(bundle)
+            return bundle
+        return None
+
+    def _isdir(self, path: str) -> bool:
+        if self.bundle is not None and self.bundle.isdir(path):
+            return True
+        return os.path.isdir(path)
+
+    def _listdir(self, dir_path: str) -> List[str]:
+        """ディレクトリ内のファイルのパスをソートして返す．ディレクトリが無く，バンドルに含まれていればバンドルの中を見る．
+        """
+        if not os.path.isdir(dir_path) and self.bundle is not None and self.bundle.isdir(dir_path):
+            return self.bundle.listdir(dir_path)
+        return sorted(glob.glob(os.path.join(dir_path, "*")))
+
+    def asset_paths(self) -> List[Tuple[str, str]]:
+        """各JSONが参照する画像・サウンドのファイルパスを，(種類, パス)のリストで返す．
+        """
+        paths = []
+        tmp_dic = self.dic.get("stages")
+        if tmp_dic:
+            for dic in self._load_json(tmp_dic["path"]).values():
+                paths.append((IMAGE, dic["path"]))
+        tmp_dic = self.dic.get("character")
+        if tmp_dic:
+            for dic in self._load_json(tmp_dic["path"]).values():
+                for name in ["face_image_path", "gu_image_path", "choki_image_path", "pa_image_path"]:
+                    paths.append((IMAGE, dic[name]))
+                paths.append((SOUND, dic["select_voice_path"]))
+        tmp_dic = self.dic.get("components")
+        if tmp_dic:
+            for dic in self._load_json(tmp_dic["path"]).values():
+                if self._isdir(dic["path"]):
+                    paths += [(IMAGE, path) for path in self._listdir(dic["path"])]
+                else:
+                    paths.append((IMAGE, dic["path"]))
+        tmp_dic = self.dic.get("sounds")
+        if tmp_dic:
+            for dic in self._load_json(tmp_dic["path"]).values():
+                paths.append((SOUND, dic["path"]))
+        return paths
+
     def check_pygame_inits(self):
         if not pygame.get_init():
             pygame.init()
     
     def load(self):
         """全てを読み込む
+
+        各load_*はアセットを遅延読み込みの辞書(LazyDict)に登録するだけで，デコードはしない．
+        lazy=Falseの場合は，最後に全てのアセットをまとめて読み込む．
         """
         self.load_stages()
         self.load_characters()
         self.load_players()
         self.load_components()
         self.load_sounds()
+        if not self.lazy:
+            try:
+                self.prefetch()
+            finally:
+                self.close()
+
+    def prefetch(self, stages: Optional[Iterable[str]]=None, characters: Optional[Iterable[str]]=None, components: Optional[Iterable[str]]=None, sounds: Optional[Iterable[str]]=None):
+        """指定したキーのアセットをまとめて読み込む．全ての引数がNoneの場合は全てのアセットを読み込む．
+
+        画像・サウンドのデコードは先にまとめてワーカーに投入し，
+        convert などのdisplayに依存する処理は呼び出し元(メインスレッド)で行う．
+
+        Args:
+            stages (Optional[Iterable[str]], optional): self.stagesのキー. Defaults to None.
+            characters (Optional[Iterable[str]], optional): self.charactersのキー. Defaults to None.
+            components (Optional[Iterable[str]], optional): self.componentsのキー. Defaults to None.
+            sounds (Optional[Iterable[str]], optional): self.soundsのキー. Defaults to None.
+        """
+        keys_list = [stages, characters, components, sounds]
+        dicts = [self.stages, self.characters, self.components, self.sounds]
+        if all(keys is None for keys in keys_list):
+            leaves = [leaf for dic in dicts for leaf in dic.leaves()]
+        else:
+            leaves = [leaf for dic, keys in zip(dicts, keys_list) if keys is not None for leaf in dic.leaves(keys)]
+        prefetch(leaves)
+
+    def load_iter(self) -> Iterator[LoadProgress]:
+        """未読み込みのアセットを少しずつ読み込み，進捗を返すイテレータ．lazy=Trueで作ったGameConfigに対して使う．
+
+        デコードはワーカースレッドで行い，convertなどのpygameのdisplayに依存する処理は
+        イテレータを進める側のスレッド(メインスレッド)で行う．
+        1つのアセットを読み込むごと，またはワーカーのデコードを待つ必要があるときに制御を返すので，
+        呼び出し側は毎フレーム少しずつ進めながら画面を描画できる．
+        全て読み込み終わったらワーカーを終了する．
+        """
+        leaves = [leaf for dic in [self.stages, self.characters, self.components, self.sounds] for leaf in dic.leaves()]
+        progress = LoadProgress(
+            total=len(leaves),
+            total_bytes=sum(self.loader.source_nbytes(path) for leaf in leaves for _, path in leaf.sources),
+        )
+        try:
+            for leaf in leaves:
+                leaf.prepare()
+            for leaf in leaves:
+                while not all(self.loader.ready(kind, path) for kind, path in leaf.sources):
+                    progress.waiting = True
+                    yield progress
+                progress.waiting = False
+                leaf.get()
+                progress.advance(sum(self.loader.source_nbytes(path) for _, path in leaf.sources))
+                yield progress
+        finally:
+            self.close()
+
+    def dedup_report(self) -> Dict[str, int]:
+        """重複排除によって共有されたアセットの数と，節約できたバイト数を返す
+        """
+        return {
+            "hits": self.dedup_hits,
+            "saved_bytes": self.dedup_saved_bytes,
+        }
+
+    def _shared_asset(self, kind: str, path: str, create: Callable[[], Any], do_transpalent=False) -> Any:
+        """同じ内容のファイルを既に読み込んでいればそれを返し，無ければcreate()で作って登録する
+        """
+        key = (kind, self.loader.digest(path), do_transpalent)
+        asset = self.assets.get(key)
+        if asset is not None:
+            self.loader.discard(kind, path)
+            self.dedup_hits += 1
+            self.dedup_saved_bytes += asset_nbytes(asset)
+            return asset
+        asset = create()
+        self.assets[key] = asset
+        if kind == IMAGE and pygame.display.get_surface():
+            self.display_format_keys.add(key)
+        return asset
+
+    def to_display_format(self, surface: pygame.surface.Surface) -> pygame.surface.Surface:
+        """Surfaceをdisplayと同じピクセルフォーマットに変換する．カラーキーを持つ場合はRLEACCELを付ける．
+        """
+        if surface.get_flags() & pygame.SRCALPHA:
+            converted = surface.convert_alpha()
+        else:
+            converted = surface.convert()
+        colorkey = converted.get_colorkey()
+        if colorkey is not None:
+            converted.set_colorkey(colorkey, pygame.RLEACCEL)
+        return converted
+
+    def convert_surfaces(self):
+        """読み込み済みの全てのSurfaceを，displayと同じピクセルフォーマットのSurfaceに置き換える．
+        displayが無い状態で読み込んだSurfaceに対して，displayを作った後に1度呼び出す．
+        """
+        if not pygame.display.get_surface():
+            return
+        replaced = {}
+        for key, asset in self.assets.items():
+            if key[0] == IMAGE and key not in self.display_format_keys:
+                converted = self.to_display_format(asset)
+                replaced[id(asset)] = converted
+                self.assets[key] = converted
+                self.display_format_keys.add(key)
+        if not replaced:
+            return
+        for dic in [self.stages, self.characters, self.components]:
+            for leaf in dic.loaded_leaves():
+                if isinstance(leaf.value, list):
+                    leaf.value = [replaced.get(id(surface), surface) for surface in leaf.value]
+                else:
+                    leaf.value = replaced.get(id(leaf.value), leaf.value)
+
+    def close(self):
+        """デコード用のワーカーを終了する．以降の読み込みは呼び出し元のスレッドで行われる．
+        """
+        self.loader.shutdown()
+
+    def _lazy_surface(self, path: str, do_transpalent=False) -> Lazy:
+        """初回アクセス時に_load_surfaceで読み込むLazyを返す
+        """
+        return Lazy(self._load_surface, path, do_transpalent, prepare=lambda: self.loader.submit_image(path), sources=[(IMAGE, path)])
+
+    def _lazy_surfaces(self, dir_path: str, do_transpalent=False) -> Lazy:
+        """初回アクセス時に_load_surfacesで読み込むLazyを返す
+        """
+        paths = self._listdir(dir_path)
+        def prepare():
+            for path in paths:
+                self.loader.submit_image(path)
+        return Lazy(self._load_surfaces, dir_path, do_transpalent, prepare=prepare, sources=[(IMAGE, path) for path in paths])
+
+    def _lazy_sound(self, path: str) -> Lazy:
+        """初回アクセス時に_load_soundで読み込むLazyを返す
+        """
+        return Lazy(self._load_sound, path, prepare=lambda: self.loader.submit_sound(path), sources=[(SOUND, path)])
     
     def _save_json(self, dic: dict, path: str):
         """辞書をJSON形式で保存する
@@ -55,22 +270,24 @@ class GameConfig:
     def _do_transpalent(self, surface: pygame.surface.Surface):
         """透過できていないSurfaceを，(0, 0)の色で透過する
         """
-        surface.set_colorkey(surface.get_at((0, 0)))
+        surface.set_colorkey(surface.get_at((0, 0)), pygame.RLEACCEL)
     
     def _load_surface(self, path: str, do_transpalent=False) -> pygame.surface.Surface:
         """ファイル名を指定すると，画像をSurfaceで読み込んで返す．\
         do_transpalent=Trueの場合は，背景を透過する．
+        displayがある場合は，displayと同じピクセルフォーマットに変換する．
         """
-        surface = pygame.image.load(path)
-        
-        if pygame.display.get_surface():
+        def create():
+            surface = self.loader.image(path)
+            if pygame.display.get_surface():
+                surface = self.to_display_format(surface)
+            elif do_transpalent:
+                # 透過しないものと共有しているかもしれないのでコピーする
+                surface = surface.copy()
             if do_transpalent:
-                surface.convert_alpha()
                 self._do_transpalent(surface)
-            else:
-                surface.convert()
-        
-        return surface
+            return surface
+        return self._shared_asset(IMAGE, path, create, do_transpalent=do_transpalent)
     
     def _load_surfaces(self, dir_path: str, do_transpalent=False) -> List[pygame.surface.Surface]:
         """ディレクトリを指定すると，内部のファイルを全て読み込んで\
@@ -78,7 +295,7 @@ class GameConfig:
         do_transpalent=Trueの場合は，背景を透過する．
         """
         surfaces = []
-        for path in sorted(glob.glob(os.path.join(dir_path, "*"))):
+        for path in self._listdir(dir_path):
             surfaces.append(self._load_surface(path, do_transpalent=do_transpalent))
         return surfaces
     
@@ -87,7 +304,7 @@ class GameConfig:
         ディレクトリを指定した場合はSurfaceのリストを返す．\
         do_transpalent=Trueの場合は，背景を透過する．
         """
-        if os.path.isdir(path):
+        if self._isdir(path):
             return self._load_surfaces(dir_path=path, do_transpalent=do_transpalent)
         else:
             return self._load_surface(path=path, do_transpalent=do_transpalent)
@@ -99,25 +316,36 @@ class GameConfig:
         if tmp_dic:
             json_data = self._load_json(tmp_dic["path"])
             
-            self.stages = {key: Stage(key, dic["name"], pygame.image.load(dic["path"])) for key, dic in sorted(json_data.items(), key=lambda x: -int(x[0]), reverse=True)}
+            self.stages = LazyDict()
+            for key, dic in sorted(json_data.items(), key=lambda x: -int(x[0]), reverse=True):
+                image = self._lazy_surface(dic["path"])
+                self.stages.set(key, Stage(key, dic["name"], image), leaves=[image])
     
     def load_characters(self):
         tmp_dic = self.dic.get("character", False)
         if tmp_dic:
             with open(tmp_dic["path"], "r") as f:
                 json_data = json.load(f)
-            self.characters = {
-                key: Character(
+            self.characters = LazyDict()
+            for key, dic in json_data.items():
+                leaves = [
+                    self._lazy_surface(dic["face_image_path"]),
+                    self._lazy_surface(dic["gu_image_path"]),
+                    self._lazy_surface(dic["choki_image_path"]),
+                    self._lazy_surface(dic["pa_image_path"]),
+                    self._lazy_sound(dic["select_voice_path"]),
+                ]
+                face, gu, choki, pa, select_voice = leaves
+                character = Character(
                     id_=    key,
                     name=   dic["name"],
-                    face=   self._load_surface(dic["face_image_path"]),
-                    gu=     self._load_surface(dic["gu_image_path"]),
-                    choki=  self._load_surface(dic["choki_image_path"]),
-                    pa=     self._load_surface(dic["pa_image_path"]),
-                    select_voice= self._load_sound(dic["select_voice_path"])
+                    face=   face,
+                    gu=     gu,
+                    choki=  choki,
+                    pa=     pa,
+                    select_voice= select_voice
                 )
-                for key, dic in json_data.items()
-            }
+                self.characters.set(key, character, leaves=leaves)
 
     def load_players(self):
         tmp_dic = self.dic.get("player", False)
@@ -159,25 +387,26 @@ class GameConfig:
         if tmp_dic:
             json_data = self._load_json(tmp_dic["path"])
 
-            self.components = {
-                name: self._load_surface_from_path_or_dir(dic["path"], do_transpalent=dic["do_transpalent"])
-                for name, dic in json_data.items()
-            }
+            self.components = LazyDict()
+            for name, dic in json_data.items():
+                if self._isdir(dic["path"]):
+                    self.components.set(name, self._lazy_surfaces(dic["path"], do_transpalent=dic["do_transpalent"]))
+                else:
+                    self.components.set(name, self._lazy_surface(dic["path"], do_transpalent=dic["do_transpalent"]))
 
     def _load_sound(self, path: str) -> pygame.mixer.Sound:
         """ファイルパスからSoundを読み込む
         """
-        return pygame.mixer.Sound(path)
+        return self._shared_asset(SOUND, path, lambda: self.loader.sound(path))
     
     def load_sounds(self):
         tmp_dic = self.dic.get("sounds")
         if tmp_dic:
             json_data = self._load_json(tmp_dic["path"])
 
-            self.sounds = {
-                name: self._load_sound(dic["path"])
-                for name, dic in json_data.items()
-            }
+            self.sounds = LazyDict()
+            for name, dic in json_data.items():
+                self.sounds.set(name, self._lazy_sound(dic["path"]))
 
 
 if __name__ == "__main__":
@@ -1,21 +1,186 @@
 from __future__ import annotations
-from typing import Union
+from typing import List, Optional, Set, Tuple, Union
 
 import pygame
 
+
+def earliest_change(*changes: Optional[int]) -> Optional[int]:
+    """next_change()の値のうち最も早いもの．どれもNone(変化しない)ならNone
+    """
+    due = [change for change in changes if change is not None]
+    return min(due) if due else None
+
+
 class Group(pygame.sprite.AbstractGroup):
+    # Falseの場合は，メンバのGroupを毎回再帰的にたどって描画・更新する(比較用)
+    flatten = True
 
     def __init__(self):
         super().__init__()
         self.groupdict = {}
         self.lostgroups = []
-    
+        # このGroupを直接のメンバとして持つGroup
+        self.parents: Set[Group] = set()
+        # 子孫を含めたメンバが変わるたびに増える
+        self.version = 0
+        # 子孫を含めて描画順に並べたSprite (draw()を独自に持つGroupはそのまま入れる)
+        self._draw_list: Optional[list] = None
+        # self._draw_listを，同じGroupを直接のメンバとするSpriteの並び (Group, 始まり, 終わり) に分けたもの．
+        # draw()を独自に持つGroupは (None, その位置, その位置 + 1)
+        self._draw_runs: List[Tuple[Optional[Group], int, int]] = []
+        # self._draw_listに展開したGroup (自身を含む)．draw()でlostsprites, lostgroupsを空にする
+        self._draw_groups: List[Group] = []
+        # 子孫を含めて更新順に並べたSprite (update()を独自に持つGroupはそのまま入れる)
+        self._update_list: Optional[list] = None
+        # 子孫を含めた全てのメンバ(Sprite, Group)
+        self._members: Optional[set] = None
+        # 静的なレイヤー: 中身を1枚のSurfaceに合成しておき，変化があったときだけ作り直す
+        self.static = False
+        self.static_bgcolor = None
+        self.static_surface = None
+        self.static_rect = None
+        self.static_signature = None
+        self.static_builds = 0
+
+    def set_static(self, static: bool=True, bgcolor: Optional[Tuple[int, int, int]]=None):
+        """静的なレイヤーにする．
+
+        静的なレイヤーは，中身(メンバのGroupを含む)を1枚のSurfaceに合成してキャッシュし，毎フレームそれだけを描画する．
+        Spriteの追加・削除・移動，imageの差し替え・透明度の変更があったときだけ合成し直す．
+        imageのピクセルを直接書き換えた場合は invalidate_static() を呼ぶこと．
+
+        Args:
+            static (bool, optional): 静的にするかどうか. Defaults to True.
+            bgcolor (Optional[Tuple[int, int, int]], optional): 指定した場合，描画先全体をこの色で塗った上に合成した不透明なSurfaceにする(fillも不要になる). \
+                Noneの場合は透過Surfaceにし，中身の範囲だけを描画する. Defaults to None.
+        """
+        self.static = static
+        self.static_bgcolor = bgcolor
+        self.invalidate_static()
+        # 親の描画リストでの扱い(展開するかどうか)が変わる
+        self._member_removed()
+
+    def invalidate_static(self):
+        self.static_surface = None
+        self.static_signature = None
+
+    def _static_signature(self) -> tuple:
+        """合成し直す必要があるかどうかを判定するための，中身の状態
+        """
+        signature = [
+            (id(sprite), id(sprite.image), sprite.image.get_alpha(), tuple(sprite.rect))
+            for sprite in self.sprites()
+        ]
+        signature += [group._static_signature() for group in self.groups()]
+        return tuple(signature)
+
+    def _drawn_rects(self) -> list:
+        """前回描画した領域(メンバのGroupを含む)
+        """
+        rects = [rect for rect in self.spritedict.values() if rect]
+        for group in self.groups():
+            rects += group._drawn_rects()
+        return rects
+
+    def _build_static(self, surface):
+        """中身を合成したSurfaceを作り直す．合成先は描画先と同じ大きさで，描画するのは中身の範囲(static_rect)だけ．
+        """
+        size = surface.get_size()
+        if self.static_bgcolor is not None:
+            composite = pygame.Surface(size).convert()
+            composite.fill(self.static_bgcolor)
+        else:
+            composite = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+            composite.fill((0, 0, 0, 0))
+        rects = self._draw_layer(composite, collect=True)
+        if self.static_bgcolor is not None or rects is None:
+            self.static_rect = composite.get_rect()
+        else:
+            self.static_rect = rects[0].unionall(rects[1:]) if rects else pygame.Rect(0, 0, 0, 0)
+        self.static_surface = composite
+        self.static_builds += 1
+
+    def _member_added(self, obj: Union[pygame.sprite.Sprite, Group]):
+        """子孫にobjが追加されたときに呼ばれる．描画・更新のリストを破棄し，メンバの集合には追加する．
+        """
+        self.version += 1
+        self._draw_list = None
+        self._update_list = None
+        if self._members is not None:
+            self._members.add(obj)
+            if isinstance(obj, Group):
+                self._members |= obj._member_set()
+        for parent in self.parents:
+            parent._member_added(obj)
+
+    def _member_removed(self):
+        """子孫から要素が削除されたときに呼ばれる．
+        (別の経路でまだ含まれているかもしれないので)メンバの集合も破棄する．
+        """
+        self.version += 1
+        self._draw_list = None
+        self._update_list = None
+        self._members = None
+        for parent in self.parents:
+            parent._member_removed()
+
+    def members_moved(self):
+        """メンバ(子孫を含む)のrectを動かしたときに呼ぶ．versionを上げて，PointerDispatcherにグリッドを作り直させる
+        """
+        self.version += 1
+        for parent in self.parents:
+            parent.members_moved()
+
+    def _member_set(self) -> set:
+        if self._members is None:
+            members = set(self.spritedict)
+            members.update(self.groupdict)
+            for group in self.groupdict:
+                members |= group._member_set()
+            self._members = members
+        return self._members
+
+    def _flat_draw_list(self) -> list:
+        if self._draw_list is None:
+            items = list(self.spritedict)
+            runs = [(self, 0, len(items))] if items else []
+            groups = [self]
+            for group in self.groupdict:
+                if type(group).draw is Group.draw and not group.static:
+                    offset = len(items)
+                    items += group._flat_draw_list()
+                    runs += [(owner, start + offset, end + offset) for owner, start, end in group._draw_runs]
+                    groups += group._draw_groups
+                else:
+                    runs.append((None, len(items), len(items) + 1))
+                    items.append(group)
+            self._draw_runs = runs
+            self._draw_groups = groups
+            self._draw_list = items
+        return self._draw_list
+
+    def _flat_update_list(self) -> list:
+        if self._update_list is None:
+            items = list(self.spritedict)
+            for group in self.groupdict:
+                if type(group).update is Group.update:
+                    items += group._flat_update_list()
+                else:
+                    items.append(group)
+            self._update_list = items
+        return self._update_list
+
     def sprites(self):
         return list(self.spritedict)
     
     def groups(self):
         return list(self.groupdict)
 
+    def child_groups(self) -> list:
+        """子のGroup (LayeredGroupのレイヤーを含む)
+        """
+        return list(self.groupdict)
+
     def add_internal(self, obj: Union[pygame.sprite.Sprite, Group]):
         """
         内部に[Sprite, Group]を追加する
@@ -24,8 +189,11 @@ class Group(pygame.sprite.AbstractGroup):
         """
         if isinstance(obj, Group):
             self.groupdict[obj] = 0
+            obj.parents.add(self)
+            self._member_added(obj)
         elif isinstance(obj, pygame.sprite.Sprite):
             self.spritedict[obj] = 0
+            self._member_added(obj)
 
     def remove_internal(self, obj: Union[pygame.sprite.Sprite, Group]):
         """
@@ -38,11 +206,14 @@ class Group(pygame.sprite.AbstractGroup):
             if lost_rect:
                 self.lostgroups.append(lost_rect)
             del self.groupdict[obj]
+            obj.parents.discard(self)
+            self._member_removed()
         elif isinstance(obj, pygame.sprite.Sprite):
             lost_rect = self.spritedict[obj]
             if lost_rect:
                 self.lostsprites.append(lost_rect)
             del self.spritedict[obj]
+            self._member_removed()
             
     def has_internal(self, obj: Union[pygame.sprite.Sprite, Group]):
         """
@@ -130,14 +301,11 @@ class Group(pygame.sprite.AbstractGroup):
         
         for obj in objects:
             if isinstance(obj, pygame.sprite.Sprite) or isinstance(obj, Group):
-                if not self.has_internal(obj):
-                    exist = False
-                    for grp in self.groups():
-                        if grp.has(obj):
-                            exist = True
-                            break
-                    if not exist:
+                if not self.flatten:
+                    if not self._has_recursive(obj):
                         return False
+                elif obj not in self._member_set():
+                    return False
             else:
                 try:
                     if not self.has(*obj):
@@ -147,22 +315,125 @@ class Group(pygame.sprite.AbstractGroup):
         return True
 
 
+    def _has_recursive(self, obj: Union[pygame.sprite.Sprite, Group]) -> bool:
+        """メンバのGroupを再帰的にたどってobjを探す(flatten=Falseの場合)
+        """
+        if self.has_internal(obj):
+            return True
+        for grp in self.groups():
+            if grp._has_recursive(obj):
+                return True
+        return False
+
     def update(self, *args, **kwargs):
         """
         メンバ[Sprite, Group]のupdateを呼び出す
 
         (Spriteのupdateを先に実行)
+        子孫のSpriteは，キャッシュした平坦なリストの順に更新する．update()を独自に持つGroupはそのupdate()を呼ぶ．
         """
-        for sprite in self.sprites():
-            sprite.update(*args, **kwargs)
-        for group in self.groups():
-            group.update(*args, **kwargs)
+        if not self.flatten:
+            for sprite in self.sprites():
+                sprite.update(*args, **kwargs)
+            for group in self.groups():
+                group.update(*args, **kwargs)
+            return
+        for item in self._flat_update_list():
+            item.update(*args, **kwargs)
+
+    def busy(self) -> bool:
+        """入力が無くても変化するメンバ(アニメーション・タイマーなど)を持っているかどうか．
+        busy()を持つメンバのうち，1つでもTrueを返せばTrue．
+        """
+        items = self._flat_update_list() if self.flatten else self.sprites() + self.groups()
+        for item in items:
+            busy = getattr(item, "busy", None)
+            if busy is not None and busy():
+                return True
+        return False
+
+    def next_change(self) -> Optional[int]:
+        """入力が無くても次に見た目が変わるまでのupdate()の回数．メンバのうち最も早いもの．
+        next_change()を持たないメンバは，busy()がTrueなら毎回変わる(0)とみなす．
+
+        Returns:
+            Optional[int]: 変わるまでのupdate()の回数. 0は毎回変わる. Noneは入力が無い限り変わらない
+        """
+        items = self._flat_update_list() if self.flatten else self.sprites() + self.groups()
+        due = None
+        for item in items:
+            next_change = getattr(item, "next_change", None)
+            if next_change is not None:
+                change = next_change()
+            else:
+                busy = getattr(item, "busy", None)
+                change = 0 if busy is not None and busy() else None
+            if change is not None and (due is None or change < due):
+                if change == 0:
+                    return 0
+                due = change
+        return due
 
     def draw(self, surface):
-        super().draw(surface)
-        for group in self.groups():
-            group.draw(surface)
-        self.lostgroups = []
+        if self.static:
+            signature = self._static_signature()
+            if self.static_surface is None or signature != self.static_signature or self.static_surface.get_size() != surface.get_size():
+                self._build_static(surface)
+                self.static_signature = signature
+            surface.blit(self.static_surface, self.static_rect, self.static_rect)
+            return
+        self._draw_layer(surface)
+
+    def _draw_layer(self, surface, collect: bool=False) -> Optional[List[pygame.Rect]]:
+        """メンバを描画する．
+
+        子孫のSpriteは，キャッシュした平坦なリストをまとめてSurface.blitsで描画する．
+        draw()を独自に持つGroupや静的なGroupは，その順番でそのdraw()を呼ぶ．
+        描画した領域は，Spriteを直接のメンバとして持つGroupのspritedictに記録する(clear()で使う)．
+
+        Args:
+            collect (bool, optional): Trueの場合，描画した領域のリストを返す．独自のdraw()を持つGroupを含む場合は領域が分からないのでNone．Defaults to False.
+        """
+        if not self.flatten:
+            super().draw(surface)
+            for group in self.groups():
+                group.draw(surface)
+            self.lostgroups = []
+            return self._drawn_rects() if collect else None
+        rects = [] if collect else None
+        items = self._flat_draw_list()
+        # 続けて並んだSpriteの並びは1回のblitsで描画する
+        pending = []
+        for run in self._draw_runs:
+            if run[0] is not None:
+                pending.append(run)
+                continue
+            if pending:
+                drawn = self._blit_runs(surface, items, pending)
+                if rects is not None:
+                    rects += drawn
+                pending = []
+            items[run[1]].draw(surface)
+            rects = None
+        if pending:
+            drawn = self._blit_runs(surface, items, pending)
+            if rects is not None:
+                rects += drawn
+        for group in self._draw_groups:
+            group.lostsprites = []
+            group.lostgroups = []
+        return rects
+
+    @staticmethod
+    def _blit_runs(surface, items: list, runs: List[Tuple[Group, int, int]]) -> List[pygame.Rect]:
+        """続いたSpriteの並びrunsをまとめて描画し，描画した領域をそれぞれのGroupのspritedictに記録する
+        """
+        base = runs[0][1]
+        sprites = items[base:runs[-1][2]]
+        drawn = surface.blits([(sprite.image, sprite.rect) for sprite in sprites])
+        for owner, start, end in runs:
+            owner.spritedict.update(zip(sprites[start - base:end - base], drawn[start - base:end - base]))
+        return drawn
 
     def clear(self, surface, bgd):
         """erase the previous position of all sprites
@@ -174,8 +445,23 @@ class Group(pygame.sprite.AbstractGroup):
         screen surface. The bgd could also be a function which accepts
         the given surface and the area to be cleared as arguments.
 
-        これよくわからん
-
+        draw()で描画した領域と，その後に削除したSpriteの領域を消す．メンバのGroup(子孫)の分も消す．
+        """
+        if not self.flatten:
+            self._clear_sprites(surface, bgd)
+            for group in self.groups():
+                group.clear(surface, bgd)
+            return
+        # 平坦なリストに展開したGroupの分はここで消し，draw()を独自に持つGroupには任せる
+        items = self._flat_draw_list()
+        for group in self._draw_groups:
+            group._clear_sprites(surface, bgd)
+        for owner, start, _ in self._draw_runs:
+            if owner is None:
+                items[start].clear(surface, bgd)
+
+    def _clear_sprites(self, surface, bgd):
+        """直接のメンバのSpriteの領域を消す
         """
         if callable(bgd):
             for lost_clear_rect in self.lostsprites:
@@ -228,6 +514,25 @@ class LayeredGroup(Group):
         self.background_sprites.draw(surface)
         super().draw(surface)
         self.front_sprites.draw(surface)
+
+    def clear(self, surface, bgd):
+        self.background_sprites.clear(surface, bgd)
+        super().clear(surface, bgd)
+        self.front_sprites.clear(surface, bgd)
+
+    def set_static_background(self, static: bool=True):
+        """background_spritesを静的なレイヤーにする (Group.set_static)
+        """
+        self.background_sprites.set_static(static)
+
+    def child_groups(self) -> list:
+        return [self.background_sprites] + list(self.groupdict) + [self.front_sprites]
+
+    def busy(self) -> bool:
+        return self.background_sprites.busy() or super().busy() or self.front_sprites.busy()
+
+    def next_change(self) -> Optional[int]:
+        return earliest_change(self.background_sprites.next_change(), super().next_change(), self.front_sprites.next_change())
     
     @property
     def middle_sprites(self):
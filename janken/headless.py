@@ -0,0 +1,50 @@
+from typing import Tuple
+import os
+
+import pygame
+
+"""
+ヘッドレスモード
+
+ウィンドウを開かずに画面を動かす(ベンチマーク・CI用)．
+SDLのdummyドライバで映像・音声を出力せず，画面の更新(pygame.display.update)も行わない．
+フレームレートの制限をなくし，1フレームごとにゲームの時間を1tick進めるので，
+どの画面も最大速度で，実際の時間と関係なく同じ結果になる．
+
+環境変数 JANKEN_HEADLESS=1 か，Game(headless=True)，enable()で有効にする．
+"""
+
+HEADLESS_ENV = "JANKEN_HEADLESS"
+
+_enabled = False
+
+
+def is_headless() -> bool:
+    """ヘッドレスモードかどうか
+    """
+    return _enabled or os.environ.get(HEADLESS_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+def enable(size: Tuple[int, int]=(500, 500)):
+    """ヘッドレスモードにする．dummyドライバでdisplayを作り直す．
+
+    Args:
+        size (Tuple[int, int], optional): displayが無い場合に作る大きさ. Defaults to (500, 500).
+    """
+    global _enabled
+    _enabled = True
+    os.environ[HEADLESS_ENV] = "1"
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    if pygame.display.get_init() and pygame.display.get_driver() != "dummy":
+        # 既に本物のドライバで初期化されていたら作り直す
+        surface = pygame.display.get_surface()
+        if surface is not None:
+            size = surface.get_size()
+        pygame.display.quit()
+    if not pygame.display.get_init():
+        pygame.init()
+    if pygame.mixer.get_init() is None:
+        pygame.mixer.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode(size)
@@ -0,0 +1,79 @@
+from typing import Callable, Deque, Dict, List, Set
+from collections import deque
+
+import pygame
+from pygame.event import Event
+
+"""
+キーボード入力のイベントバス
+
+画面ごとに1つのKeyEventBusを持ち，pygameのイベントキューから取り出したKEYDOWN/KEYUPを1回だけ受け取る．
+キーごとに登録したハンドラにだけイベントを渡すので，毎フレーム全てのキーの状態を読む必要がない．
+受け取ったイベントは上限付きのリングバッファ(history)に残す．
+"""
+
+KeyHandlerFnc = Callable[[Event], None]
+
+
+class KeyEventBus:
+    def __init__(self, history_size: int=256):
+        """KEYDOWN/KEYUPをキーごとのハンドラに配る．
+
+        Args:
+            history_size (int, optional): 残しておくイベントの数. 古いものから捨てる. Defaults to 256.
+        """
+        # pygame.K_*** -> ハンドラのリスト
+        self.handlers: Dict[int, List[KeyHandlerFnc]] = {}
+        # 最近受け取ったイベント
+        self.history: Deque[Event] = deque(maxlen=history_size)
+        # 押されているキー
+        self.pressed: Set[int] = set()
+        self.published = 0
+
+    def subscribe(self, key: int, handler: KeyHandlerFnc):
+        """keyのKEYDOWN/KEYUPを受け取るハンドラを登録する
+
+        Args:
+            key (int): pygame.K_***
+            handler (KeyHandlerFnc): イベントを引数に呼ばれる関数
+        """
+        self.handlers.setdefault(key, []).append(handler)
+
+    def unsubscribe(self, key: int, handler: KeyHandlerFnc):
+        handlers = self.handlers.get(key)
+        if handlers is not None and handler in handlers:
+            handlers.remove(handler)
+            if not handlers:
+                del self.handlers[key]
+
+    def publish(self, event: Event):
+        """KEYDOWN/KEYUPのイベントを受け取り，そのキーのハンドラに渡す
+        """
+        if event.type == pygame.KEYDOWN:
+            self.pressed.add(event.key)
+        elif event.type == pygame.KEYUP:
+            self.pressed.discard(event.key)
+        else:
+            return
+        self.history.append(event)
+        self.published += 1
+        # ハンドラの中で登録・解除されてもよいようにコピーしてから呼ぶ
+        for handler in list(self.handlers.get(event.key, ())):
+            handler(event)
+
+    def is_pressed(self, key: int) -> bool:
+        """keyが押されているかどうか(受け取ったイベントから求める)
+        """
+        return key in self.pressed
+
+    def key_downs(self) -> List[Event]:
+        """historyに残っているKEYDOWNのイベント
+        """
+        return [event for event in self.history if event.type == pygame.KEYDOWN]
+
+    def clear(self):
+        self.history.clear()
+        self.pressed.clear()
+
+    def __repr__(self):
+        return "<KeyEventBus: {} keys, {} handlers, {} events>".format(len(self.handlers), sum(len(handlers) for handlers in self.handlers.values()), self.published)
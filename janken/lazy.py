@@ -0,0 +1,128 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from collections.abc import Mapping
+
+"""
+初回アクセス時にアセットを読み込むための部品
+"""
+
+
+class Lazy:
+    def __init__(self, fnc: Callable, *args, prepare: Optional[Callable]=None, sources: Iterable[Tuple[str, str]]=()):
+        """初回のget()でfnc(*args)を呼び出し，その結果を保持する値．
+
+        Args:
+            fnc (Callable): 値を生成する関数
+            prepare (Optional[Callable], optional): 先読み時に呼ばれる関数(ワーカーへのデコードの投入など). Defaults to None.
+            sources (Iterable[Tuple[str, str]], optional): 値の生成で読み込むファイルの(種類, パス)のリスト. 進捗の計算に使う. Defaults to ().
+        """
+        self.fnc = fnc
+        self.args = args
+        self.prepare_fnc = prepare
+        self.sources = list(sources)
+        self.value = None
+        self.loaded = False
+
+    def prepare(self):
+        """get()に先立って，値の生成を(バックグラウンドで)始めておく
+        """
+        if not self.loaded and self.prepare_fnc is not None:
+            self.prepare_fnc()
+            self.prepare_fnc = None
+
+    def get(self) -> Any:
+        if not self.loaded:
+            self.value = self.fnc(*self.args)
+            self.loaded = True
+            self.fnc = self.args = self.prepare_fnc = None
+        return self.value
+
+    def __repr__(self):
+        return "<Lazy: {}>".format(self.value if self.loaded else "not loaded")
+
+
+def resolve(value: Any) -> Any:
+    """Lazyなら中身を，そうでなければそのまま返す
+    """
+    if isinstance(value, Lazy):
+        return value.get()
+    return value
+
+
+def prefetch(leaves: Iterable[Lazy]):
+    """Lazyをまとめて読み込む．
+
+    先に全てのLazyのprepare()を呼んでから読み込むので，並列にデコードできる．
+    """
+    leaves = list(leaves)
+    for leaf in leaves:
+        leaf.prepare()
+    for leaf in leaves:
+        leaf.get()
+
+
+class LazyDict(Mapping):
+    def __init__(self):
+        """値を初回アクセス時に読み込む辞書．
+
+        値がLazyの場合は初回アクセス時に読み込む．
+        値とは別に，キーに紐づくLazy(Stage.imageなど，値の内部で遅延されているもの)を登録でき，prefetch()の対象になる．
+        """
+        self._values: Dict[str, Any] = {}
+        self._leaves: Dict[str, List[Lazy]] = {}
+
+    def set(self, key: str, value: Any, leaves: Iterable[Lazy]=()):
+        """キーに値を登録する
+
+        Args:
+            key (str): キー
+            value (Any): 値(Lazyでもよい)
+            leaves (Iterable[Lazy], optional): 値の内部で遅延されているLazy. Defaults to ().
+        """
+        self._values[key] = value
+        self._leaves[key] = list(leaves)
+        if isinstance(value, Lazy):
+            self._leaves[key].append(value)
+
+    def __getitem__(self, key: str) -> Any:
+        return resolve(self._values[key])
+
+    def entry(self, key: str) -> Tuple[Any, List[Lazy]]:
+        """キーに登録した値(Lazyのまま読み込まない)と，値の内部で遅延されているLazyのリスト．
+        set(key, *entry(key)) で同じ登録を別のLazyDictに作れる．
+        """
+        value = self._values[key]
+        return value, [leaf for leaf in self._leaves[key] if leaf is not value]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def is_loaded(self, key: str) -> bool:
+        """キーに紐づく全てのLazyが読み込み済みかどうか
+        """
+        return all(leaf.loaded for leaf in self._leaves[key])
+
+    def loaded_keys(self) -> List[str]:
+        return [key for key in self._values if self.is_loaded(key)]
+
+    def leaves(self, keys: Optional[Iterable[str]]=None) -> List[Lazy]:
+        """keysに紐づく未読み込みのLazyのリスト．keys=Noneの場合は全てのキー．
+        """
+        if keys is None:
+            keys = list(self._values)
+        return [leaf for key in keys for leaf in self._leaves[key] if not leaf.loaded]
+
+    def loaded_leaves(self) -> List[Lazy]:
+        """読み込み済みのLazyのリスト
+        """
+        return [leaf for leaves in self._leaves.values() for leaf in leaves if leaf.loaded]
+
+    def prefetch(self, keys: Optional[Iterable[str]]=None):
+        """keysに紐づくアセットをまとめて読み込む．keys=Noneの場合は全て．
+        """
+        prefetch(self.leaves(keys))
+
+    def __repr__(self):
+        return "<LazyDict({} items, {} loaded)>".format(len(self), len(self.loaded_keys()))
@@ -0,0 +1,243 @@
+from typing import Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, Future
+import os
+import threading
+
+import pygame
+
+from surface_cache import SurfaceCache, file_digest
+
+"""
+画像・サウンドのデコードをワーカースレッドで並列に行うローダー
+
+ワーカースレッドではファイルのデコードのみを行う．
+displayに依存する convert() / convert_alpha() は呼び出し側(メインスレッド)で行うこと．
+"""
+
+IMAGE = "image"
+SOUND = "sound"
+
+
+def decode_image(path: str) -> pygame.surface.Surface:
+    """画像ファイルをデコードしてSurfaceを返す．convertは行わない．
+    """
+    return pygame.image.load(path)
+
+
+def decode_sound(path: str) -> pygame.mixer.Sound:
+    """サウンドファイルをデコードしてSoundを返す．
+    """
+    return pygame.mixer.Sound(path)
+
+
+def asset_nbytes(asset) -> int:
+    """Surface・Soundが保持するピクセル・サンプルのおおよそのバイト数
+    """
+    if isinstance(asset, pygame.surface.Surface):
+        return asset.get_pitch() * asset.get_height()
+    if isinstance(asset, pygame.mixer.Sound):
+        init = pygame.mixer.get_init()
+        if init:
+            frequency, size, channels = init
+            return int(asset.get_length() * frequency) * channels * abs(size) // 8
+    return 0
+
+
+class LoadProgress:
+    def __init__(self, total: int=0, total_bytes: int=0):
+        """読み込みの進捗．
+
+        Args:
+            total (int, optional): 読み込むアセットの数. Defaults to 0.
+            total_bytes (int, optional): 読み込むファイルの合計バイト数. Defaults to 0.
+        """
+        self.total = total
+        self.completed = 0
+        self.total_bytes = total_bytes
+        self.completed_bytes = 0
+        # ワーカーのデコード待ちで進められなかったかどうか
+        self.waiting = False
+
+    def advance(self, nbytes: int=0):
+        self.completed += 1
+        self.completed_bytes += nbytes
+
+    @property
+    def done(self) -> bool:
+        return self.completed >= self.total
+
+    @property
+    def ratio(self) -> float:
+        """0.0から1.0の進捗率．バイト数が分かる場合はバイト数で，そうでなければ個数で求める．
+        """
+        if self.total_bytes > 0:
+            return min(1.0, self.completed_bytes / self.total_bytes)
+        if self.total > 0:
+            return min(1.0, self.completed / self.total)
+        return 1.0
+
+    def __repr__(self):
+        return "<LoadProgress: {}/{} ({}/{} bytes)>".format(self.completed, self.total, self.completed_bytes, self.total_bytes)
+
+
+def default_workers() -> int:
+    """デフォルトのワーカー数
+    """
+    return min(8, (os.cpu_count() or 1) + 2)
+
+
+class AssetLoader:
+    def __init__(self, workers: Optional[int]=None, surface_cache: Optional[SurfaceCache]=None, bundle=None):
+        """画像・サウンドをワーカースレッドでデコードするローダー．
+
+        submit_* で登録したファイルはすぐにデコードが始まり，image(), sound() で結果を受け取る．
+        登録されていないファイルを要求した場合は，その場で(呼び出し元のスレッドで)デコードする．
+
+        同じファイル(実パスが同じ)や，同時にデコード中の内容が同じファイル(ハッシュが同じ)は1度だけデコードする．
+        デコード結果は取り出した時点でローダーから手放す．取り出した後の共有は呼び出し側(GameConfig)が digest() を使って行う．
+
+        Args:
+            workers (Optional[int], optional): ワーカースレッド数. 0の場合は並列化せず逐次デコードする. Defaults to None.
+            surface_cache (Optional[SurfaceCache], optional): 画像のデコード結果のディスクキャッシュ. Defaults to None.
+            bundle (Optional[AssetBundle], optional): アセットのバンドル. バンドルに含まれるファイルはバンドルから読み込む. Defaults to None.
+        """
+        if workers is None:
+            workers = default_workers()
+        self.workers = workers
+        self.surface_cache = surface_cache
+        self.bundle = bundle
+        self.executor = ThreadPoolExecutor(max_workers=workers) if workers > 0 else None
+        self.lock = threading.Lock()
+        # (種類, 実パス) -> 投入済みでまだ取り出されていないFuture
+        self.futures: Dict[Tuple[str, str], Future] = {}
+        # (種類, 内容のハッシュ) -> デコード中のFuture
+        self.by_digest: Dict[Tuple[str, bytes], Future] = {}
+        # 実パス -> 内容のハッシュ
+        self.digests: Dict[str, bytes] = {}
+
+    def _decoder(self, kind: str):
+        return self._decode_image if kind == IMAGE else self._decode_sound
+
+    def _in_bundle(self, path: str) -> bool:
+        return self.bundle is not None and self.bundle.has(path)
+
+    def digest(self, path: str) -> bytes:
+        """ファイルの内容のハッシュ．バンドルに含まれていればバンドルのインデックスの値を使う．
+        ディスクキャッシュがあれば，ファイルが変わっていない限りキャッシュに記録した値を使う(SurfaceCache.digest)．
+        """
+        realpath = os.path.realpath(path)
+        digest = self.digests.get(realpath)
+        if digest is None:
+            if self._in_bundle(path):
+                digest = self.bundle.digest(path)
+            elif self.surface_cache is not None:
+                digest = self.surface_cache.digest(path)
+            else:
+                digest = file_digest(path)
+            self.digests[realpath] = digest
+        return digest
+
+    def source_nbytes(self, path: str) -> int:
+        """読み込むファイルのバイト数．バンドルに含まれていればバンドル内のデータの長さ．
+        """
+        if self._in_bundle(path):
+            return self.bundle.nbytes(path)
+        return os.path.getsize(path)
+
+    def _decode_sound(self, path: str) -> pygame.mixer.Sound:
+        if self._in_bundle(path):
+            return self.bundle.load_sound(path)
+        return decode_sound(path)
+
+    def _decode_image(self, path: str) -> pygame.surface.Surface:
+        """バンドルに含まれていればバンドルから読み込む．
+        そうでなければ，キャッシュがあればキャッシュから，無ければファイルをデコードしてキャッシュに保存する
+        """
+        if self._in_bundle(path):
+            return self.bundle.load_image(path)
+        if self.surface_cache is None:
+            return decode_image(path)
+        surface = self.surface_cache.load(path)
+        if surface is None:
+            surface = decode_image(path)
+            self.surface_cache.store(path, surface)
+        return surface
+
+    def _load(self, kind: str, path: str):
+        """内容のハッシュを求め，同じ内容のファイルがデコード中ならその結果を，そうでなければデコードした結果を返す．
+        ワーカースレッドから呼ばれる．
+        """
+        key = (kind, self.digest(path))
+        with self.lock:
+            future = self.by_digest.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.by_digest[key] = future
+        if not owner:
+            return future.result()
+        try:
+            value = self._decoder(kind)(path)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            with self.lock:
+                del self.by_digest[key]
+        return value
+
+    def submit(self, kind: str, path: str):
+        """ファイルのデコードをワーカーに投入する．既に投入済みのファイルは投入しない．
+        """
+        key = (kind, os.path.realpath(path))
+        with self.lock:
+            if self.executor is None or key in self.futures:
+                return
+            self.futures[key] = self.executor.submit(self._load, kind, path)
+
+    def submit_image(self, path: str):
+        self.submit(IMAGE, path)
+
+    def submit_sound(self, path: str):
+        self.submit(SOUND, path)
+
+    def take(self, kind: str, path: str):
+        """デコード結果を取り出す．投入されていなければその場でデコードする．
+        ワーカーで発生した例外はここで送出される．
+        """
+        with self.lock:
+            future = self.futures.pop((kind, os.path.realpath(path)), None)
+        if future is not None:
+            return future.result()
+        return self._load(kind, path)
+
+    def ready(self, kind: str, path: str) -> bool:
+        """take()がワーカーのデコードを待たずに返せるかどうか．投入されていないファイルはTrue．
+        """
+        with self.lock:
+            future = self.futures.get((kind, os.path.realpath(path)))
+        return future is None or future.done()
+
+    def discard(self, kind: str, path: str):
+        """投入済みのデコードが不要になった場合に破棄する
+        """
+        with self.lock:
+            future = self.futures.pop((kind, os.path.realpath(path)), None)
+        if future is not None:
+            future.cancel()
+
+    def image(self, path: str) -> pygame.surface.Surface:
+        return self.take(IMAGE, path)
+
+    def sound(self, path: str) -> pygame.mixer.Sound:
+        return self.take(SOUND, path)
+
+    def shutdown(self):
+        """ワーカーを終了する．取り出されなかった結果は破棄する．
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        self.futures = {}
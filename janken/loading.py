@@ -3,7 +3,6 @@ from enum import Enum
 import math
 import random
 import time
-from threading import Thread
 
 import pygame
 from pygame.locals import Rect
@@ -11,39 +10,70 @@ from pygame.sprite import Sprite
 
 from stage import Stage
 from screen import Screen, BaseScreen
-from sprites import SimpleSprite, TextSprite, AlignSprite, load_animation_sprite
-from game_config import GameConfig
+from sprites import SimpleSprite, TextSprite, AlignSprite, ProgressBarSprite, load_animation_sprite
+from registry import asset_registry
+from clock import seconds_to_interval
 
 class LoadingScreen(BaseScreen):
-    def __init__(self):
+    def __init__(self, config_path: str="./jsons/config.json"):
         super().__init__()
+        self.set_static_background()
+        self.config_path = config_path
         self.result = Screen.START
         self.fps = 60
 
         self.game_config = None
+        # GameConfig.load_iter() が返すイテレータと，その進捗
+        self.loading = None
+        self.progress = None
+        # 1フレームで読み込みに使う時間(秒)
+        self.load_budget = self.delta_time / 2
 
         bg_image = pygame.image.load("./images/components/bg.jpeg").convert_alpha()
         bg_sprite = SimpleSprite(bg_image.get_rect(), bg_image)
         self.background_sprites.add(bg_sprite)
 
         x, y = self.display.get_rect().center
-        loading_sprits = load_animation_sprite(x, y, "./images/components/loading", interval=20, multiple=0.7)
+        loading_sprits = load_animation_sprite(x, y, "./images/components/loading", interval=seconds_to_interval(0.35), multiple=0.7)
         self.middle_sprites.add(loading_sprits)
+
+        rect = self.display.get_rect()
+        bar_rect = Rect(0, 0, rect.width // 2, 20)
+        bar_rect.center = (rect.centerx, loading_sprits.rect.bottom + 40)
+        self.progress_bar = ProgressBarSprite(bar_rect)
+        self.front_sprites.add(self.progress_bar)
     
     def init(self):
-        """全てのローディング処理
+        """ローディングの準備．アセットの読み込みはupdate()で少しずつ進める．
+
+        デコードはGameConfigのワーカースレッドが行い，pygameのdisplayに関わる処理は全てメインスレッドで行う．
         """
-        time.sleep(3)
         pygame.font.init()
-        self.game_config = GameConfig("./jsons/config.json")
-        self.run = False
-        self.next_screen = Screen.START
+        self.game_config = asset_registry.acquire(self.config_path, lazy=True)
+        self.loading = self.game_config.load_iter()
+
+    def step_loading(self):
+        """1フレーム分(self.load_budget秒まで)読み込みを進める．全て読み込んだら次の画面へ．
+        """
+        deadline = time.perf_counter() + self.load_budget
+        try:
+            while time.perf_counter() < deadline:
+                self.progress = next(self.loading)
+                if self.progress.waiting:
+                    break
+        except StopIteration:
+            self.run = False
+            self.next_screen = Screen.START
+        if self.progress is not None:
+            self.progress_bar.set_ratio(self.progress.ratio)
+
+    def update(self):
+        self.step_loading()
+        super().update()
     
     def main(self):
-        # 全てのローディングはスレッドで
-        thread = Thread(target=self.init)
-        thread.start()
-        
+        self.init()
+
         loading_voice = pygame.mixer.Sound("./sounds/loading.mp3")
         loading_voice.set_volume(0.1)
         loading_voice.play(loops=0)
@@ -1,4 +1,9 @@
-from screen import Screen
+from typing import Optional, Set, Tuple
+from collections import OrderedDict
+import copy
+
+from screen import Screen, BaseScreen
+from stage import Stage
 from loading import LoadingScreen
 from title import TitleScreen
 from stage_select import StageSelectScreen
@@ -6,6 +11,9 @@ from character_select import CharacterSelectScreen
 from option import OptionScreen
 from game import GameScreen
 from result import ResultScreen
+from registry import asset_registry
+from headless import is_headless, enable as enable_headless
+from replay import InputRecorder, InputPlayer, start as start_replay, stop as stop_replay, env_record_path, env_replay_path, env_replay_unthrottled
 
 class Game:
     class Gameplayer:
@@ -22,7 +30,32 @@ class Game:
             self.stage = None
             self.stock = 0
 
-    def __init__(self):
+    def __init__(self, config_path: str="./jsons/config.json", headless: Optional[bool]=None, record_path: Optional[str]=None, replay_path: Optional[str]=None,
+                 replay_unthrottled: Optional[bool]=None, seed: Optional[int]=None, screen_cache_size: int=4, prefetch: bool=True):
+        """
+        Args:
+            config_path (str, optional): config.jsonのパス. Defaults to "./jsons/config.json".
+            headless (Optional[bool], optional): Trueの場合はウィンドウを開かず，最大速度で動かし，画面ごとのフレームレートを表示する. \
+                Noneの場合は環境変数 JANKEN_HEADLESS に従う. Defaults to None.
+            record_path (Optional[str], optional): 指定した場合はロード後の入力を記録し，終了時に書き出す(replay.py). Noneの場合は環境変数 JANKEN_RECORD に従う. Defaults to None.
+            replay_path (Optional[str], optional): 指定した場合は記録した入力を再生する. Noneの場合は環境変数 JANKEN_REPLAY に従う. Defaults to None.
+            replay_unthrottled (Optional[bool], optional): Trueの場合はフレームレートを制限せずに再生する. \
+                Noneの場合は環境変数 JANKEN_REPLAY_UNTHROTTLED に従う. Defaults to None.
+            seed (Optional[int], optional): 記録するときの乱数のシード. Noneの場合は適当に決める. Defaults to None.
+            screen_cache_size (int, optional): 再利用するために残しておく画面(reusable=True)の最大数. 0の場合は毎回作り直す. Defaults to 4.
+            prefetch (bool, optional): Trueの場合は画面の空き時間に次に来そうな画面(next_screens)を先に作っておく. Defaults to True.
+        """
+        self.config_path = config_path
+        self.record_path = env_record_path() if record_path is None else record_path
+        self.replay_path = env_replay_path() if replay_path is None else replay_path
+        self.replay_unthrottled = env_replay_unthrottled() if replay_unthrottled is None else replay_unthrottled
+        self.seed = seed
+        self.replay = None
+        if headless is None:
+            headless = is_headless()
+        self.headless = headless
+        if self.headless:
+            enable_headless()
         self.gameplayer1 = self.Gameplayer()
         self.gameplayer2 = self.Gameplayer()
         self.gamesetting = self.Gamesetting()
@@ -36,36 +69,176 @@ class Game:
         self.game_screen = GameScreen
         self.result_screen = ResultScreen
         self.option_screen = OptionScreen
+        # 画面の種類 -> 抜けた後も残している画面．最近使ったものが後ろ
+        self.screen_cache_size = screen_cache_size
+        self.screen_cache: "OrderedDict[Screen, BaseScreen]" = OrderedDict()
+        self.screen_cache_hits = 0
+        self.screen_cache_misses = 0
+        self.prefetch = prefetch
+        # 先に作って画像・文字のキャッシュを温めた画面: (画面の種類, ステージ, キャラクター)
+        self.prefetched: Set[Tuple[Screen, str, Tuple[str, ...]]] = set()
 
     def main(self):
+        loading_screen = None
         try:
-            loading_screen = self.loading_screen()
+            loading_screen = self.loading_screen(self.config_path)
             loading_screen.main()
+            if self.headless:
+                self.report(loading_screen)
 
             self.game_config = loading_screen.game_config
         except:
             print("Loading not done.")
+            if loading_screen is not None and loading_screen.game_config is not None:
+                asset_registry.release(self.config_path)
+            return
+        try:
+            # 変換の失敗はロードの失敗とは別に，例外のまま伝える(参照はfinallyで返す)
+            self.game_config.convert_surfaces()
+            self.gameplayer1.player = self.game_config.players["0"]
+            self.gameplayer2.player = self.game_config.players["1"]
+            # ロード画面の後から記録・再生する
+            if self.replay_path is not None:
+                self.replay = InputPlayer.load(self.replay_path, unthrottled=self.replay_unthrottled)
+            elif self.record_path is not None:
+                self.replay = InputRecorder(seed=self.seed)
+            if self.replay is not None:
+                start_replay(self.replay)
+            now = self.get_screen(Screen.START)
+            while True:
+                if self.prefetch:
+                    self.prefetch_next_screens(now)
+                now.main()
+                if self.headless:
+                    self.report(now)
+                if now.next_screen == Screen.QUIT:
+                    break
+                now = self.get_screen(now.next_screen)
+        finally:
+            # 画面で例外が起きた場合も，記録を書き出し，ロード画面で取得したGameConfigの参照を返す
+            self.screen_cache.clear()
+            self.prefetched.clear()
+            try:
+                self.finish_replay()
+            finally:
+                asset_registry.release(self.config_path)
+
+    def finish_replay(self):
+        """記録・再生をやめる．記録していた場合はself.record_pathに書き出す．
+        """
+        if self.replay is None:
+            return
+        stop_replay()
+        if isinstance(self.replay, InputRecorder):
+            self.replay.save(self.record_path)
+        if self.headless:
+            print(self.replay)
+
+    def get_screen(self, screen: Screen) -> BaseScreen:
+        """screenの画面を返す．残している画面があれば再利用し(main()の最初にreset()される)，無ければ作る．
+        """
+        now = self.screen_cache.get(screen)
+        if now is not None:
+            self.screen_cache.move_to_end(screen)
+            self.screen_cache_hits += 1
+        else:
+            self.screen_cache_misses += 1
+            now = self.build_screen(screen)
+            if now.reusable:
+                self.screen_cache[screen] = now
+        # 古いものから捨てる
+        while len(self.screen_cache) > self.screen_cache_size:
+            self.screen_cache.popitem(last=False)
+        return now
+
+    def build_screen(self, screen: Screen, gameplayer1=None, gameplayer2=None, gamesetting=None) -> BaseScreen:
+        """screenの画面を作る．gameplayer1, gameplayer2, gamesettingを指定した場合はself.gameplayer1などの代わりに使う．
+        """
+        gameplayer1 = self.gameplayer1 if gameplayer1 is None else gameplayer1
+        gameplayer2 = self.gameplayer2 if gameplayer2 is None else gameplayer2
+        gamesetting = self.gamesetting if gamesetting is None else gamesetting
+        if screen == Screen.START:
+            return self.start_screen(self.game_config)
+        elif screen == Screen.CHARACTER_SELECT:
+            return self.character_select_screen(self.game_config, gameplayer1, gameplayer2)
+        elif screen == Screen.STAGE_SELECT:
+            return self.stage_select_screen(self.game_config, gamesetting)
+        elif screen == Screen.GAME:
+            return self.game_screen(self.game_config, gameplayer1, gameplayer2, gamesetting)
+        elif screen == Screen.RESULT:
+            return self.result_screen(self.game_config, gameplayer1, gameplayer2, gamesetting)
+        elif screen == Screen.OPTION:
+            return self.option_screen(self.game_config)
+        raise(ValueError("unknown screen: {}".format(screen)))
+
+    def screen_class(self, screen: Screen) -> type:
+        classes = {
+            Screen.START: self.start_screen,
+            Screen.CHARACTER_SELECT: self.character_select_screen,
+            Screen.STAGE_SELECT: self.stage_select_screen,
+            Screen.GAME: self.game_screen,
+            Screen.RESULT: self.result_screen,
+            Screen.OPTION: self.option_screen,
+        }
+        if screen not in classes:
+            raise(ValueError("unknown screen: {}".format(screen)))
+        return classes[screen]
+
+    def prefetch_next_screens(self, now: BaseScreen):
+        """nowの空き時間に，nowの次に来そうな画面(now.next_screens)を1つずつ先に作るようにする(BaseScreen.idle_tasks)
+        画面は，その時点でnowが選んでいるもの(now.prefetch_hints())で作る．nowは選択が変わったときに request_prefetch() で作り直させる．
+        """
+        now.idle_tasks.clear()
+        now.prefetcher = lambda screen: self.prefetch_screen(screen, **now.prefetch_hints())
+        for screen in now.next_screens:
+            if screen not in self.screen_cache:
+                now.request_prefetch(screen)
+
+    def prefetch_screen(self, screen: Screen, stage: Optional[Stage]=None):
+        """screenの画面を先に作る．
+
+        reusable=Trueの画面は作ってself.screen_cacheに残す．
+        それ以外(ゲーム・リザルト)は作るときのプレイヤーやステージで中身が変わり，作るときにストックや勝敗数を書き換えるので，
+        それらの写しで作って捨てる．縮小した画像や文字の描画はキャッシュ(scale_cache, font_registry)に残るので，本番で作るときに速くなる．
+
+        Args:
+            screen (Screen): 作る画面
+            stage (Optional[Stage], optional): ステージセレクトで選んでいるステージ. Noneの場合はself.gamesetting.stage(それも無ければ最初のステージ). Defaults to None.
+        """
+        if screen in self.screen_cache:
             return
-        self.gameplayer1.player = self.game_config.players["0"]
-        self.gameplayer2.player = self.game_config.players["1"]
-        now = self.start_screen(self.game_config)
-        while True:
-            now.main()
-            next_screen = now.next_screen
-            if next_screen == Screen.START:
-                now = self.start_screen(self.game_config)
-            elif next_screen == Screen.CHARACTER_SELECT:
-                now = self.character_select_screen(self.game_config, self.gameplayer1, self.gameplayer2)
-            elif next_screen == Screen.STAGE_SELECT:
-                now = self.stage_select_screen(self.game_config, self.gamesetting)
-            elif next_screen == Screen.GAME:
-                now = self.game_screen(self.gameplayer1, self.gameplayer2, self.gamesetting)
-            elif next_screen == Screen.RESULT:
-                now = self.result_screen(self.game_config, self.gameplayer1, self.gameplayer2, self.gamesetting)
-            elif next_screen == Screen.OPTION:
-                now = self.option_screen(self.game_config)
-            elif next_screen == Screen.QUIT:
-                break
+        if self.screen_class(screen).reusable:
+            self.screen_cache[screen] = self.build_screen(screen)
+            while len(self.screen_cache) > self.screen_cache_size:
+                self.screen_cache.popitem(last=False)
+            return
+        gameplayers = [self._stand_in_gameplayer(gameplayer) for gameplayer in (self.gameplayer1, self.gameplayer2)]
+        gamesetting = copy.copy(self.gamesetting)
+        if stage is not None:
+            gamesetting.stage = stage
+        if gamesetting.stage is None:
+            gamesetting.stage = next(iter(self.game_config.stages.values()))
+        gamesetting.stock = max(1, gamesetting.stock)
+        key = (screen, gamesetting.stage.name, tuple(gameplayer.character.name for gameplayer in gameplayers))
+        if key in self.prefetched:
+            return
+        self.prefetched.add(key)
+        self.build_screen(screen, gameplayers[0], gameplayers[1], gamesetting)
+
+    def _stand_in_gameplayer(self, gameplayer: "Game.Gameplayer") -> "Game.Gameplayer":
+        """先に作る画面に渡す，gameplayerの写し．プレイヤーとキャラクターが無ければ最初のものを使う．
+        """
+        stand_in = copy.copy(gameplayer)
+        player = gameplayer.player if gameplayer.player is not None else next(iter(self.game_config.players.values()))
+        stand_in.player = copy.copy(player)
+        if stand_in.character is None:
+            stand_in.character = next(iter(self.game_config.characters.values()))
+        return stand_in
+
+    def report(self, screen):
+        """画面のフレーム数と平均フレームレートを表示する
+        """
+        print("{}: {} frames, {:.1f} fps".format(type(screen).__name__, screen.clock.frames, screen.clock.average_fps()))
 
 
 if __name__ == "__main__":
@@ -3,10 +3,17 @@ import pygame
 from screen import BaseScreen, Screen
 from sprites import RichSprite
 from component import SimpleButton
+from font_registry import get_font
+from text_cache import render_text
 
 class OptionScreen(BaseScreen):
+    reusable = True
+    next_screens = (Screen.START,)
+
     def __init__(self, game_config):
         super().__init__()
+        self.use_dirty_rects = True
+        self.idle_pacing = True
         self.game_config = game_config
         self._set_return_btn()
     
@@ -16,8 +23,8 @@ class OptionScreen(BaseScreen):
 
     def _set_return_btn(self):
         #SimpleButton(width=rect.width, height=rect.height, text="Return",  outline=self.game_config.components["outline"], func = self._go_to_title)
-        font = pygame.font.Font(None, 60)
-        textsurface = font.render("Return", True, (0, 0, 0))
+        font = get_font(None, 60)
+        textsurface = render_text(font, "Return", True, (0, 0, 0))
         return_btn = RichSprite(*self.display.get_rect().bottomleft, align="left", vertical_align="bottom", image=textsurface)
         return_btn.rect.move_ip(10, -10)
         self.hoverable(return_btn, self.game_config.components["outline"], border_width=5)
@@ -0,0 +1,94 @@
+from typing import Dict, List, Optional
+
+import pygame
+
+from clock import GameClock, ticks_to_seconds
+
+"""
+フレームレートの調整
+
+入力も毎tick動くもの(変形など)も無い状態が続いたら，毎フレーム描画するのをやめて，
+pygame.event.wait(timeout)で次のイベントを待つ(アイドル)．
+アニメーション・タイマーがある場合は，次に画像が切り替わる・時間が来るときまで待つ(12fpsのアニメーションなら12fpsで描画する)．
+イベントが来るか，毎tick動くものが動き出したら通常のフレームレートに戻る．
+"""
+
+
+class FramePacer:
+    def __init__(self, idle_fps: float=4.0, idle_after: float=0.5):
+        """アイドル時にフレームレートを下げる．
+
+        Args:
+            idle_fps (float, optional): アイドル時のフレームレート. 1 / idle_fps 秒までイベントを待つ. Defaults to 4.0.
+            idle_after (float, optional): 入力・毎tick動くものが無い状態がこの秒数続いたらアイドルにする. Defaults to 0.5.
+        """
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self.last_active = pygame.time.get_ticks()
+        self.idle = False
+        # 待っている間に受け取ったイベント．次のフレームのget_events()で，pygame.event.get()の前に処理する
+        self.events: List[pygame.event.Event] = []
+        self.frames = 0
+        self.idle_frames = 0
+        self.wakeups = 0
+
+    def wake(self):
+        """アイドルをやめ，idle_after秒は通常のフレームレートにする
+        """
+        self.last_active = pygame.time.get_ticks()
+        self.idle = False
+
+    def take_events(self) -> List[pygame.event.Event]:
+        """待っている間に受け取ったイベントを取り出す(BaseScreen.get_events)
+        """
+        events = self.events
+        self.events = []
+        return events
+
+    def tick(self, clock: GameClock, fps: float, active: bool, next_change: Optional[int]=None) -> int:
+        """1フレームの最後に呼ぶ．clock.tick()の代わり．
+
+        Args:
+            clock (GameClock): 画面のClock
+            fps (float): 通常のフレームレート
+            active (bool): このフレームで入力があったか，毎tick動くものがあるか
+            next_change (Optional[int], optional): アニメーション・タイマーで次に画面が変わるまでのtick数(Group.next_change). \
+                アイドル中はそれまで待ち，待った時間の分だけ更新を進める. Defaults to None.
+
+        Returns:
+            int: 前のフレームからの経過時間(ミリ秒)
+        """
+        self.frames += 1
+        if active:
+            self.wake()
+        elif not self.idle and pygame.time.get_ticks() - self.last_active >= self.idle_after * 1000:
+            self.idle = True
+        if not self.idle:
+            return clock.tick(fps)
+        self.idle_frames += 1
+        timeout = 1000 / self.idle_fps
+        if next_change is not None:
+            # 1フレームで進められるのはclock.max_steps tickまでなので，それより先なら途中で一度描画する
+            timeout = min(timeout, ticks_to_seconds(min(next_change, clock.max_steps), clock.step) * 1000)
+        event = pygame.event.wait(int(timeout))
+        if event.type != pygame.NOEVENT:
+            # 起こしたイベントはキューの末尾に戻すと，その後に来たイベント(KEYDOWNの後のKEYUPなど)より後になるので，
+            # ここで持っておき，次のフレームのget_events()でキューのイベントより先に処理する
+            self.events.append(event)
+            self.wake()
+            self.wakeups += 1
+        ms = clock.tick()
+        if next_change is None:
+            # 待っていた間は何も動いていないので，溜まった時間で更新を追いかけない
+            clock.resync()
+        return ms
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "frames": self.frames,
+            "idle_frames": self.idle_frames,
+            "wakeups": self.wakeups,
+        }
+
+    def __repr__(self):
+        return "<FramePacer: {} frames, {} idle, {} wakeups>".format(self.frames, self.idle_frames, self.wakeups)
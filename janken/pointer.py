@@ -0,0 +1,167 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pygame
+from pygame.rect import Rect
+
+from group import Group
+
+"""
+マウス入力の振り分け
+
+画面ごとに1つのPointerDispatcherを持ち，マウスの位置とボタンの状態を1フレームに1回だけ読み込む．
+マウスに反応する部品(RichSprite, HoverRect, PressRect)を一様グリッドに登録しておき，
+マウスカーソルのあるセルの部品だけを当たり判定して，enter/exit/pressを呼び出す．
+
+部品は pointer_update(collide, pressed) を持ち，当たり判定の結果を受け取って状態の変化を処理する．
+"""
+
+
+class PointerDispatcher:
+    def __init__(self, cell_size: int=64):
+        """マウスに反応する部品を一様グリッドで管理し，マウスの入力を振り分ける．
+
+        watch()したGroupの中の部品は，Groupのメンバが変わったときに自動で登録し直す．
+        Groupに入れない部品(HoverRect, PressRectなど)は register() で登録する．
+        Groupの中の部品のrectを動かした場合は，そのGroupの members_moved() を呼ぶ．
+        register()した部品のrectを動かした場合は invalidate() を呼ぶ．
+        (毎フレーム全ての部品のrectを調べることはしない)
+
+        Args:
+            cell_size (int, optional): グリッドの1セルの一辺(ピクセル). Defaults to 64.
+        """
+        self.cell_size = cell_size
+        # watch()したGroup
+        self.roots: List[Group] = []
+        # register()された部品 (順序付きの集合として使う)
+        self.registered: Dict[object, None] = {}
+        # 登録順に並べた部品
+        self.targets: List[object] = []
+        # self.targetsをグリッドに登録したときのrect
+        self.rects: List[Rect] = []
+        # セル(cx, cy) -> そのセルに重なる部品のリスト
+        self.grid: Dict[Tuple[int, int], List[object]] = {}
+        # 部品を集めたときにたどったGroupと，そのときのversion
+        self.versions: List[Tuple[Group, int]] = []
+        # 前のフレームでマウスカーソルが中にあった部品
+        self.active: List[object] = []
+        self.dirty = True
+        self.pos = (-1, -1)
+        self.pressed = False
+        self.rebuilds = 0
+        self.hit_tests = 0
+
+    def watch(self, *groups: Group):
+        """groupsの中(子孫のGroup, LayeredGroupのレイヤーを含む)の部品を登録の対象にする
+        """
+        self.roots.extend(groups)
+        self.dirty = True
+
+    def register(self, target):
+        """Groupに入れない部品を登録する
+        """
+        self.registered[target] = None
+        self.dirty = True
+
+    def unregister(self, target):
+        self.registered.pop(target, None)
+        self.dirty = True
+
+    def invalidate(self):
+        """次のdispatch()で部品を登録し直す(register()した部品のrectを動かした場合など)
+        """
+        self.dirty = True
+
+    def _collect(self, group: Group, targets: Dict[object, None]):
+        self.versions.append((group, group.version))
+        for sprite in group.sprites():
+            if hasattr(sprite, "pointer_update"):
+                targets[sprite] = None
+        for child in group.child_groups():
+            self._collect(child, targets)
+
+    def _moved(self) -> bool:
+        """登録したときからrectが変わった部品があるかどうか
+        """
+        return any(target.rect != rect for target, rect in zip(self.targets, self.rects))
+
+    def _changed(self) -> bool:
+        return self.dirty or any(group.version != version for group, version in self.versions)
+
+    def _cells(self, rect: Rect) -> Iterator[Tuple[int, int]]:
+        size = self.cell_size
+        for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+            for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield (cx, cy)
+
+    def rebuild(self):
+        """部品を集め直し，変わっていればグリッドを作り直す
+        """
+        self.versions = []
+        targets: Dict[object, None] = {}
+        for group in self.roots:
+            self._collect(group, targets)
+        targets.update(self.registered)
+        if not self.dirty and list(targets) == self.targets and not self._moved():
+            # 部品以外(アウトラインなど)の追加・削除・移動だけだった
+            return
+
+        # 外れた部品は自分でマウスを読むように戻す
+        for target in self.targets:
+            if target not in targets:
+                target.dispatched = False
+        self.targets = list(targets)
+        self.rects = [Rect(target.rect) for target in self.targets]
+        self.grid = {}
+        for target in self.targets:
+            target.dispatched = True
+            rect = Rect(target.rect)
+            if rect.w <= 0 or rect.h <= 0:
+                continue
+            for cell in self._cells(rect):
+                self.grid.setdefault(cell, []).append(target)
+        # 登録し直した部品のうち，カーソルが中にあった(hoverしている)ものは，離れたときにexitを呼ぶ
+        active = {target: None for target in self.active if target in targets}
+        active.update((target, None) for target in self.targets if getattr(target, "hover", False))
+        self.active = list(active)
+        self.dirty = False
+        self.rebuilds += 1
+
+    def hit_test(self, pos: Tuple[int, int]) -> List[object]:
+        """posが中にある部品のリスト(登録順)
+        """
+        if self._changed():
+            self.rebuild()
+        candidates = self.grid.get((pos[0] // self.cell_size, pos[1] // self.cell_size), ())
+        self.hit_tests += len(candidates)
+        return [target for target in candidates if target.rect.collidepoint(pos)]
+
+    def dispatch(self, pos: Optional[Tuple[int, int]]=None, pressed: Optional[bool]=None):
+        """マウスの状態を読み込み，カーソルが中にある部品と，前のフレームで中にあった部品にだけ当たり判定の結果を渡す．
+
+        Args:
+            pos (Optional[Tuple[int, int]], optional): マウスカーソルの位置. Noneの場合はpygame.mouseから読み込む. Defaults to None.
+            pressed (Optional[bool], optional): 左ボタンが押されているか. Noneの場合はpygame.mouseから読み込む. Defaults to None.
+        """
+        self.pos = pygame.mouse.get_pos() if pos is None else pos
+        self.pressed = pygame.mouse.get_pressed()[0] if pressed is None else pressed
+        hits = self.hit_test(self.pos)
+        if not hits and not self.active:
+            return
+        # 離れた部品のexitを先に呼ぶ
+        for target in self.active:
+            if target not in hits:
+                target.pointer_update(False, self.pressed)
+        for target in hits:
+            target.pointer_update(True, self.pressed)
+        self.active = hits
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "targets": len(self.targets),
+            "cells": len(self.grid),
+            "rebuilds": self.rebuilds,
+            "hit_tests": self.hit_tests,
+        }
+
+    def __repr__(self):
+        return "<PointerDispatcher: {} targets, {} cells, {} rebuilds>".format(len(self.targets), len(self.grid), self.rebuilds)
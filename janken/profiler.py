@@ -0,0 +1,224 @@
+from typing import Deque, Dict, List, Optional, Tuple
+from collections import deque
+import csv
+import json
+import math
+import os
+import time
+
+import pygame
+from pygame.surface import Surface
+
+from group import Group
+
+"""
+フレームのプロファイラ
+
+BaseScreen.main のフレームを段階(フェーズ)ごとに計測する．
+    events:  get_events()
+    update:  fixed_update()
+    draw:    render() のうち描画
+    present: pygame.display.update() (オーバーレイの描画を含む)
+    tick:    次のフレームまでの待ち
+フェーズごとの時間は対数ヒストグラムに数えて p50/p95/p99 を求め，最近のフレームはリングバッファに残す．
+JSON(集計)とCSV(最近のフレーム)に書き出せる．
+
+環境変数 JANKEN_PROFILE にディレクトリを指定すると，全ての画面で計測し，画面が終わるたびに
+<ディレクトリ>/<画面のクラス名>.json, .csv に書き出す．画面ではF3キーでオーバーレイを表示・非表示する．
+"""
+
+PROFILE_ENV = "JANKEN_PROFILE"
+PHASES = ("events", "update", "draw", "present", "tick")
+
+
+class Histogram:
+    # 1バケットの幅(比). 求めたパーセンタイルの誤差はこれ以下
+    GROWTH = 1.1
+    # 計測する最小の時間(秒). これ未満は最初のバケットに数える
+    MIN_SECONDS = 1e-6
+
+    def __init__(self):
+        """時間(秒)の対数ヒストグラム．数える値の個数によらずメモリは一定．
+        """
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= self.MIN_SECONDS:
+            return 0
+        return int(math.log(seconds / self.MIN_SECONDS, self.GROWTH)) + 1
+
+    def add(self, seconds: float):
+        bucket = self._bucket(seconds)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p: float) -> float:
+        """p(0~100)パーセンタイルの値(秒)．そのバケットの上限を返す．
+        """
+        if not self.count:
+            return 0.0
+        rank = self.count * p / 100
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.max, self.MIN_SECONDS * self.GROWTH ** bucket)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.mean(),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+def count_drawables(group: Group) -> Tuple[int, int]:
+    """groupを描画したときに描画される(Spriteの数, Groupの数)．静的なGroupは1枚のSurfaceとして数える．
+    """
+    if group.static:
+        return 1, 1
+    sprites = len(group.spritedict)
+    groups = 1
+    for child in group.child_groups():
+        child_sprites, child_groups = count_drawables(child)
+        sprites += child_sprites
+        groups += child_groups
+    return sprites, groups
+
+
+class FrameProfiler:
+    def __init__(self, history: int=3600):
+        """BaseScreen.main のフレームをフェーズごとに計測する．enabled=Falseの間は何もしない．
+
+        Args:
+            history (int, optional): CSVに書き出すために残す最近のフレーム数. Defaults to 3600.
+        """
+        self.enabled = False
+        self.histograms: Dict[str, Histogram] = {phase: Histogram() for phase in PHASES}
+        self.frame_histogram = Histogram()
+        # 最近のフレーム: (フレーム番号, 各フェーズの時間..., Sprite数, Group数)
+        self.frames: Deque[tuple] = deque(maxlen=history)
+        self.frame_count = 0
+        self.current: Dict[str, float] = {}
+        self.last = 0.0
+        self.sprites = 0
+        self.groups = 0
+        # オーバーレイ
+        self.overlay_visible = False
+        self.overlay_surface: Optional[Surface] = None
+        self.overlay_interval = 0.5
+        self.overlay_updated = 0.0
+
+    def reset(self):
+        self.histograms = {phase: Histogram() for phase in PHASES}
+        self.frame_histogram = Histogram()
+        self.frames.clear()
+        self.frame_count = 0
+
+    def begin_frame(self):
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.last = time.perf_counter()
+
+    def mark(self, phase: str):
+        """前のmark()(またはbegin_frame())からの時間をphaseに加える
+        """
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def end_frame(self, groups: List[Group]):
+        """フレームの計測を終え，ヒストグラムと最近のフレームに加える
+
+        Args:
+            groups (List[Group]): 描画したGroup. 描画したSpriteとGroupの数を数える
+        """
+        self.sprites = self.groups = 0
+        for group in groups:
+            sprites, n = count_drawables(group)
+            self.sprites += sprites
+            self.groups += n
+        for phase, seconds in self.current.items():
+            self.histograms[phase].add(seconds)
+        self.frame_histogram.add(sum(self.current.values()))
+        self.frame_count += 1
+        self.frames.append((self.frame_count,) + tuple(self.current[phase] for phase in PHASES) + (self.sprites, self.groups))
+
+    def summary(self) -> dict:
+        return {
+            "frames": self.frame_count,
+            "frame": self.frame_histogram.summary(),
+            "phases": {phase: histogram.summary() for phase, histogram in self.histograms.items()},
+            "sprites": self.sprites,
+            "groups": self.groups,
+        }
+
+    def export_json(self, path: str):
+        """集計(フェーズごとの平均, p50/p95/p99, 最大)をJSONで書き出す
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+
+    def export_csv(self, path: str):
+        """最近のフレームの時間(秒)をCSVで書き出す
+        """
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("frame",) + PHASES + ("sprites", "groups"))
+            writer.writerows(self.frames)
+
+    def export(self, directory: str, name: str):
+        """directoryに name.json と name.csv を書き出す
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.export_json(os.path.join(directory, name + ".json"))
+        self.export_csv(os.path.join(directory, name + ".csv"))
+
+    def toggle_overlay(self):
+        """オーバーレイの表示・非表示を切り替える．表示する場合は計測も有効にする．
+        """
+        self.overlay_visible = not self.overlay_visible
+        if self.overlay_visible:
+            self.enabled = True
+        self.overlay_surface = None
+
+    def overlay_lines(self) -> List[str]:
+        lines = ["frame p50 {:.2f} p95 {:.2f} p99 {:.2f} ms".format(*(self.frame_histogram.percentile(p) * 1000 for p in (50, 95, 99)))]
+        for phase in PHASES:
+            histogram = self.histograms[phase]
+            lines.append("{:<7} p50 {:.2f} p95 {:.2f} p99 {:.2f} ms".format(phase, *(histogram.percentile(p) * 1000 for p in (50, 95, 99))))
+        lines.append("sprites {} groups {}".format(self.sprites, self.groups))
+        return lines
+
+    def overlay(self, font: pygame.font.Font) -> Surface:
+        """オーバーレイのSurface．overlay_interval秒ごとに作り直す．
+        """
+        now = time.perf_counter()
+        if self.overlay_surface is None or now - self.overlay_updated >= self.overlay_interval:
+            lines = [font.render(line, True, (255, 255, 255)) for line in self.overlay_lines()]
+            width = max(line.get_width() for line in lines) + 8
+            height = sum(line.get_height() for line in lines) + 8
+            # 不透明にして，下の描画が変わらなくても前の文字が残らないようにする
+            surface = Surface((width, height))
+            surface.fill((0, 0, 0))
+            y = 4
+            for line in lines:
+                surface.blit(line, (4, y))
+                y += line.get_height()
+            self.overlay_surface = surface
+            self.overlay_updated = now
+        return self.overlay_surface
+
+    def __repr__(self):
+        return "<FrameProfiler: {} frames, p50 {:.2f} ms, p99 {:.2f} ms>".format(self.frame_count, self.frame_histogram.percentile(50) * 1000, self.frame_histogram.percentile(99) * 1000)
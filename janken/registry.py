@@ -0,0 +1,75 @@
+from typing import Dict, List, Optional
+import os
+import threading
+
+from game_config import GameConfig
+
+"""
+プロセス全体で共有するアセットのレジストリ
+
+同じconfig.jsonから作られるGameConfigは1つだけにして，各画面で使い回す．
+"""
+
+
+class AssetRegistry:
+    class Entry:
+        def __init__(self, game_config: GameConfig):
+            self.game_config = game_config
+            self.refcount = 0
+
+    def __init__(self):
+        """config.jsonのパスごとにGameConfigを参照カウント付きで保持する．
+        """
+        self.entries: Dict[str, AssetRegistry.Entry] = {}
+        self.lock = threading.Lock()
+
+    def _key(self, json_path: str) -> str:
+        return os.path.abspath(json_path)
+
+    def acquire(self, json_path: str="./jsons/config.json", **kwargs) -> GameConfig:
+        """GameConfigを取得し，参照カウントを増やす．まだ読み込まれていなければ読み込む．
+
+        Args:
+            json_path (str, optional): config.jsonのパス. Defaults to "./jsons/config.json".
+            kwargs: 初めて読み込む場合にGameConfigに渡す引数
+
+        Returns:
+            GameConfig: 共有されたGameConfig
+        """
+        key = self._key(json_path)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.Entry(GameConfig(json_path, **kwargs))
+                self.entries[key] = entry
+            entry.refcount += 1
+            return entry.game_config
+
+    def release(self, json_path: str="./jsons/config.json"):
+        """参照カウントを減らす．0になったらGameConfigを破棄する．
+        """
+        key = self._key(json_path)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            entry.refcount -= 1
+            if entry.refcount <= 0:
+                del self.entries[key]
+                entry.game_config.close()
+
+    def get(self, json_path: str="./jsons/config.json") -> Optional[GameConfig]:
+        """読み込み済みのGameConfigを返す．参照カウントは変えない．
+        """
+        entry = self.entries.get(self._key(json_path))
+        return entry.game_config if entry is not None else None
+
+    def refcount(self, json_path: str="./jsons/config.json") -> int:
+        entry = self.entries.get(self._key(json_path))
+        return entry.refcount if entry is not None else 0
+
+    def paths(self) -> List[str]:
+        return list(self.entries)
+
+
+asset_registry = AssetRegistry()
@@ -0,0 +1,239 @@
+from typing import List, Optional, Tuple, Union
+import json
+import os
+import random
+
+import pygame
+from pygame.event import Event
+
+"""
+入力の記録と再生
+
+画面(BaseScreen)がフレームごとに読み込む入力
+    キーボード: get_events()でKeyEventBusに渡すKEYDOWN/KEYUP (KeyHandler, GamePlayerSetter)
+    マウス: PointerDispatcherに渡すカーソルの位置とボタン (RichSprite, HoverRect, PressRect)
+    そのフレームでupdate()を呼んだ回数(固定の時間刻みのtick数)
+を記録し，同じ順番で再生する．乱数もシードから作り直すので，再生した画面は記録したときとフレーム単位で同じに進む．
+
+Game(record_path=...)/環境変数 JANKEN_RECORD=<path> で記録し，
+Game(replay_path=...)/環境変数 JANKEN_REPLAY=<path> で再生する．ロード画面は読み込みの時間で長さが変わるので対象外．
+再生時にunthrottled=True(環境変数 JANKEN_REPLAY_UNTHROTTLED=1)にすると，フレームレートを制限せずに最大速度で再生する．
+"""
+
+RECORD_ENV = "JANKEN_RECORD"
+REPLAY_ENV = "JANKEN_REPLAY"
+REPLAY_UNTHROTTLED_ENV = "JANKEN_REPLAY_UNTHROTTLED"
+# 記録ファイルの形式のバージョン
+REPLAY_VERSION = 1
+# 記録するイベント
+RECORDED_EVENTS = (pygame.KEYDOWN, pygame.KEYUP, pygame.QUIT)
+
+_session: Optional[Union["InputRecorder", "InputPlayer"]] = None
+_rng: Optional[random.Random] = None
+
+
+class InputFrame:
+    def __init__(self, events: List[Event], pos: Tuple[int, int], buttons: Tuple[bool, bool, bool], steps: int=0):
+        """1フレーム分の入力
+
+        Args:
+            events (List[Event]): KEYDOWN/KEYUP/QUITのイベント
+            pos (Tuple[int, int]): マウスカーソルの位置
+            buttons (Tuple[bool, bool, bool]): マウスのボタン(左, 中, 右)が押されているか
+            steps (int, optional): このフレームでupdate()を呼んだ回数. Defaults to 0.
+        """
+        self.events = events
+        self.pos = pos
+        self.buttons = buttons
+        self.steps = steps
+
+    def to_list(self) -> list:
+        buttons = sum(1 << i for i, pressed in enumerate(self.buttons) if pressed)
+        events = [[event.type, getattr(event, "key", 0), getattr(event, "mod", 0)] for event in self.events]
+        return [self.steps, self.pos[0], self.pos[1], buttons, events]
+
+    @classmethod
+    def from_list(cls, lst: list) -> "InputFrame":
+        steps, x, y, buttons, events = lst
+        return cls(
+            events=[_make_event(event_type, key, mod) for event_type, key, mod in events],
+            pos=(x, y),
+            buttons=tuple(bool(buttons & (1 << i)) for i in range(3)),
+            steps=steps
+        )
+
+    def __repr__(self):
+        return "<InputFrame: {} events, pos {}, {} steps>".format(len(self.events), self.pos, self.steps)
+
+
+def _make_event(event_type: int, key: int, mod: int) -> Event:
+    if event_type == pygame.QUIT:
+        return Event(pygame.QUIT)
+    return Event(event_type, key=key, mod=mod, unicode="", scancode=0)
+
+
+class InputRecorder:
+    def __init__(self, seed: Optional[int]=None):
+        """画面が読み込んだ入力をフレームごとに記録する．
+
+        Args:
+            seed (Optional[int], optional): 乱数のシード. Noneの場合は適当に決める. Defaults to None.
+        """
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.frames: List[InputFrame] = []
+        # (画面が始まったフレーム, 画面のクラス名)
+        self.screens: List[Tuple[int, str]] = []
+        self.unthrottled = False
+
+    def begin_screen(self, name: str):
+        self.screens.append((len(self.frames), name))
+
+    def frame(self, events: List[Event]) -> InputFrame:
+        """pygameのイベントキューから取り出したeventsとマウスの状態を記録する
+        """
+        frame = InputFrame(
+            events=[event for event in events if event.type in RECORDED_EVENTS],
+            pos=pygame.mouse.get_pos(),
+            buttons=tuple(pygame.mouse.get_pressed()[:3])
+        )
+        self.frames.append(frame)
+        return frame
+
+    def steps(self, steps: int) -> int:
+        """このフレームでupdate()を呼ぶ回数を記録する
+        """
+        if self.frames:
+            self.frames[-1].steps = steps
+        return steps
+
+    def to_dict(self) -> dict:
+        return {
+            "version": REPLAY_VERSION,
+            "seed": self.seed,
+            "screens": self.screens,
+            "frames": [frame.to_list() for frame in self.frames],
+        }
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    def __repr__(self):
+        return "<InputRecorder: {} frames, {} screens, seed {}>".format(len(self.frames), len(self.screens), self.seed)
+
+
+class InputPlayer:
+    def __init__(self, frames: List[InputFrame], seed: int, screens: List[Tuple[int, str]]=(), unthrottled: bool=False):
+        """記録した入力をフレームごとに返す．最後まで再生したらQUITを返す．
+
+        Args:
+            frames (List[InputFrame]): 記録した入力
+            seed (int): 記録したときの乱数のシード
+            screens (List[Tuple[int, str]], optional): (画面が始まったフレーム, 画面のクラス名). 再生がずれていないかの確認に使う. Defaults to ().
+            unthrottled (bool, optional): Trueの場合はフレームレートを制限せずに再生する. Defaults to False.
+        """
+        self.frames = frames
+        self.seed = seed
+        self.screens = [tuple(screen) for screen in screens]
+        self.unthrottled = unthrottled
+        self.index = 0
+        self.screen_index = 0
+        # 直前にframe()で返した入力
+        self.current: Optional[InputFrame] = None
+        # 記録と違う画面になったところ: (フレーム, 記録した画面, 再生した画面)
+        self.mismatches: List[Tuple[int, str, str]] = []
+
+    @classmethod
+    def from_dict(cls, dic: dict, unthrottled: bool=False) -> "InputPlayer":
+        if dic.get("version") != REPLAY_VERSION:
+            raise(ValueError("unsupported replay version: {}".format(dic.get("version"))))
+        return cls(
+            frames=[InputFrame.from_list(lst) for lst in dic["frames"]],
+            seed=dic["seed"],
+            screens=dic.get("screens", []),
+            unthrottled=unthrottled
+        )
+
+    @classmethod
+    def load(cls, path: str, unthrottled: bool=False) -> "InputPlayer":
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f), unthrottled=unthrottled)
+
+    @property
+    def finished(self) -> bool:
+        return self.index >= len(self.frames)
+
+    def begin_screen(self, name: str):
+        """記録したときと同じ画面が同じフレームで始まったかを確かめる
+        """
+        if self.screen_index < len(self.screens):
+            expected = self.screens[self.screen_index]
+            if expected != (self.index, name):
+                self.mismatches.append((self.index, "{}@{}".format(expected[1], expected[0]), name))
+        self.screen_index += 1
+
+    def frame(self, events: List[Event]) -> InputFrame:
+        """次のフレームの入力を返す．実際の入力はウィンドウを閉じる(QUIT)以外は無視する．
+        """
+        quit_events = [event for event in events if event.type == pygame.QUIT]
+        if self.finished:
+            self.current = InputFrame([Event(pygame.QUIT)], (0, 0), (False, False, False))
+        else:
+            self.current = self.frames[self.index]
+            self.index += 1
+            if quit_events:
+                self.current = InputFrame(self.current.events + quit_events, self.current.pos, self.current.buttons, self.current.steps)
+        return self.current
+
+    def steps(self, steps: int) -> int:
+        """記録したときにこのフレームでupdate()を呼んだ回数(stepsは無視する)
+        """
+        if self.current is None:
+            return steps
+        return self.current.steps
+
+    def __repr__(self):
+        return "<InputPlayer: {}/{} frames, {} mismatches>".format(self.index, len(self.frames), len(self.mismatches))
+
+
+def start(session: Union[InputRecorder, InputPlayer]):
+    """記録・再生を始める．以降に作った画面が入力をsessionから読み書きする．乱数をsessionのシードで初期化する．
+    """
+    global _session, _rng
+    _session = session
+    _rng = random.Random(session.seed)
+    random.seed(session.seed)
+
+
+def stop() -> Optional[Union[InputRecorder, InputPlayer]]:
+    """記録・再生をやめ，それまでのsessionを返す
+    """
+    global _session, _rng
+    session = _session
+    _session = None
+    _rng = None
+    return session
+
+
+def current() -> Optional[Union[InputRecorder, InputPlayer]]:
+    """記録・再生中のsession．無ければNone
+    """
+    return _session
+
+
+def rng() -> random.Random:
+    """ゲームの乱数．記録・再生中はシードから作ったRandom，そうでなければrandomモジュール(同じ関数を持つ)
+    """
+    return random if _rng is None else _rng
+
+
+def env_record_path() -> Optional[str]:
+    return os.environ.get(RECORD_ENV) or None
+
+
+def env_replay_path() -> Optional[str]:
+    return os.environ.get(REPLAY_ENV) or None
+
+
+def env_replay_unthrottled() -> bool:
+    return os.environ.get(REPLAY_UNTHROTTLED_ENV, "").lower() in ("1", "true", "yes", "on")
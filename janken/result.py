@@ -7,6 +7,8 @@ from sprites import RichSprite, SimpleSprite, TextSprite, layout_rects
 from group import Group, LayeredGroup
 from transform import to_hoverable
 from component import SimpleButton
+from scale_cache import cached_scale
+from font_registry import get_font, DEFAULT_FONT
 
 class ResultText(Group):
     def __init__(self, game_player1, game_player2, rect) -> None:
@@ -27,7 +29,7 @@ class ResultText(Group):
             x = self.rect.centerx,
             y = self.rect.centery,
             text = self.text,
-            font = pygame.font.Font("./fonts/Mplus2-Medium.ttf", self.font_size),
+            font = get_font(DEFAULT_FONT, self.font_size),
             align = "center",
             vertical_align = "middle"
         )
@@ -46,8 +48,13 @@ class ResultText(Group):
 
 
 class ResultScreen(BaseScreen):
+    next_screens = (Screen.GAME, Screen.CHARACTER_SELECT, Screen.START)
+
     def __init__(self, game_config, game_player1, game_player2, game_setting):
         super().__init__()
+        self.use_dirty_rects = True
+        self.idle_pacing = True
+        self.set_static_background()
         self.game_config = game_config
         self.game_player1 = game_player1
         self.game_player2 = game_player2
@@ -62,7 +69,7 @@ class ResultScreen(BaseScreen):
 
     def init(self):
         bg_image = self.game_config.components["background"]
-        bg_image = pygame.transform.scale(bg_image, self.display.get_rect().size)
+        bg_image = cached_scale(bg_image, self.display.get_rect().size)
         bg_sprite = SimpleSprite(rect=self.display.get_rect(), image=bg_image)
         self.background_sprites.add(bg_sprite)
 
@@ -0,0 +1,148 @@
+from typing import Callable, Dict, Tuple
+from collections import OrderedDict
+import weakref
+
+import pygame
+from pygame.surface import Surface
+
+"""
+拡大・縮小したSurfaceのキャッシュ
+
+同じ画像を同じサイズに拡大・縮小した結果を使い回す．
+キャッシュしたSurfaceそのものではなくsubsurfaceを返すので，
+呼び出し側で set_alpha() や set_colorkey() をしてもキャッシュには影響しない．
+(ピクセルを書き換える場合は copy() すること)
+"""
+
+SCALE = "scale"
+SMOOTHSCALE = "smoothscale"
+SCALE2X = "scale2x"
+
+
+def _scale2x(surface: Surface, size: Tuple[int, int]) -> Surface:
+    """scale2xをsizeになるまで繰り返す
+    """
+    while surface.get_width() < size[0]:
+        surface = pygame.transform.scale2x(surface)
+    return surface
+
+
+ALGORITHMS: Dict[str, Callable[[Surface, Tuple[int, int]], Surface]] = {
+    SCALE: pygame.transform.scale,
+    SMOOTHSCALE: pygame.transform.smoothscale,
+    SCALE2X: _scale2x,
+}
+
+
+def surface_nbytes(surface: Surface) -> int:
+    return surface.get_pitch() * surface.get_height()
+
+
+class ScaleCache:
+    def __init__(self, max_bytes: int=64 * 1024 * 1024):
+        """(元のSurface, サイズ, アルゴリズム)ごとに拡大・縮小の結果を保持するLRUキャッシュ．
+
+        保持している結果の合計バイト数がmax_bytesを超えたら，最も長く使われていないものから捨てる．
+        元のSurfaceが破棄されたら，その結果も捨てる．
+
+        Args:
+            max_bytes (int, optional): 保持する結果の合計バイト数の上限. Defaults to 64MiB.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        # (id(元のSurface), サイズ, アルゴリズム) -> (元のSurfaceへの弱参照, 結果)
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def scale(self, surface: Surface, size: Tuple[int, int], algorithm: str=SCALE) -> Surface:
+        """surfaceをsizeに拡大・縮小したSurface(キャッシュのsubsurface)を返す
+
+        Args:
+            surface (Surface): 元のSurface
+            size (Tuple[int, int]): 拡大・縮小後のサイズ
+            algorithm (str, optional): SCALE, SMOOTHSCALE, SCALE2X のいずれか. Defaults to SCALE.
+        """
+        size = (int(size[0]), int(size[1]))
+        key = (id(surface), size, algorithm)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0]() is surface:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            scaled = entry[1]
+        else:
+            self.misses += 1
+            scaled = ALGORITHMS[algorithm](surface, size)
+            self._put(key, surface, scaled)
+        return scaled.subsurface(scaled.get_rect())
+
+    def _put(self, key: tuple, surface: Surface, scaled: Surface):
+        self._remove(key)
+        source_id = key[0]
+        ref = weakref.ref(surface, lambda _: self._remove_source(source_id))
+        self.entries[key] = (ref, scaled)
+        self.nbytes += surface_nbytes(scaled)
+        self._evict()
+
+    def _remove(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= surface_nbytes(entry[1])
+
+    def _remove_source(self, source_id: int):
+        """元のSurfaceが破棄されたときに，その結果を全て捨てる
+        """
+        for key in [key for key in self.entries if key[0] == source_id]:
+            self._remove(key)
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self.entries:
+            key = next(iter(self.entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def resize(self, max_bytes: int):
+        """上限のバイト数を変更する．超えていれば古いものから捨てる．
+        """
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __repr__(self):
+        return "<ScaleCache: {} entries, {}/{} bytes, {} hits, {} misses>".format(len(self.entries), self.nbytes, self.max_bytes, self.hits, self.misses)
+
+
+scale_cache = ScaleCache()
+
+
+def cached_scale(surface: Surface, size: Tuple[int, int]) -> Surface:
+    """キャッシュ付きの pygame.transform.scale
+    """
+    return scale_cache.scale(surface, size, SCALE)
+
+
+def cached_smoothscale(surface: Surface, size: Tuple[int, int]) -> Surface:
+    """キャッシュ付きの pygame.transform.smoothscale
+    """
+    return scale_cache.scale(surface, size, SMOOTHSCALE)
+
+
+def cached_scale2x(surface: Surface, times: int=1) -> Surface:
+    """キャッシュ付きの pygame.transform.scale2x．times回繰り返す．
+    """
+    w, h = surface.get_size()
+    return scale_cache.scale(surface, (w * 2 ** times, h * 2 ** times), SCALE2X)
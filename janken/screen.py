@@ -1,9 +1,22 @@
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+from collections import deque
 from enum import Enum
+import os
+import time
 
 import pygame
 
 from sprites import make_outline_splites
-from group import Group as MyGroup
+from group import Group as MyGroup, earliest_change
+from dirty_rect import BlitRecorder, DirtyRectTracker
+from pointer import PointerDispatcher
+from key_events import KeyEventBus
+from pacing import FramePacer
+from clock import GameClock
+from headless import is_headless, enable as enable_headless
+from profiler import FrameProfiler, PROFILE_ENV
+from font_registry import get_font
+from replay import current as current_replay
 
 class Screen(Enum):
     START = 0
@@ -15,7 +28,18 @@ class Screen(Enum):
     QUIT = 6
 
 class BaseScreen:
+    # Trueの場合，Gameは画面を抜けた後もインスタンスを残し，次に同じ画面に来たときに再利用する
+    reusable = False
+    # この画面の次に来そうな画面．Gameはこの画面の空き時間にそれらを先に作っておく(idle_tasks)
+    next_screens: Tuple[Screen, ...] = ()
+
     def __init__(self):
+        # Trueの場合はウィンドウを開かず，フレームレートを制限しない (headless.py)
+        self.headless = is_headless()
+        if self.headless:
+            enable_headless()
+        # 入力を記録・再生している場合はInputRecorder/InputPlayer (replay.py)
+        self.replay = current_replay()
         if not pygame.init():
             pygame.init()
         if not pygame.display.get_surface():
@@ -29,12 +53,35 @@ class BaseScreen:
         self.middle_sprites = MyGroup()
         self.background_sprites = MyGroup()
         # self.groups = [pygame.sprite.Group() for i in range(9)]
+        # 描画のフレームレート
         self.fps = 60
+        # 直前のフレームの実際の経過時間(秒)．update()は固定の時間刻み(self.clock.step秒)で呼ばれる
         self.delta_time = 1 / self.fps
-        self.clock = pygame.time.Clock()
+        self.clock = GameClock(unthrottled=self.headless or (self.replay is not None and self.replay.unthrottled))
         self.run = True
         self.next_screen = Screen.QUIT
-        self.key_downs = []
+        # KEYDOWN/KEYUPはget_events()でここに渡し，キーごとのハンドラに配る
+        self.key_events = KeyEventBus()
+        # Trueの場合，前のフレームから変化した領域だけを描画・更新する
+        self.use_dirty_rects = False
+        self.dirty_rect_tracker = DirtyRectTracker()
+        # マウス入力を1フレームに1回読み込み，カーソル付近の部品だけに振り分ける
+        self.pointer = PointerDispatcher()
+        self.pointer.watch(self.background_sprites, self.middle_sprites, self.front_sprites)
+        # self.pointerに渡すマウスの(位置, 左ボタン)．Noneの場合はpygame.mouseから読む
+        self.pointer_input = (None, None)
+        # Trueの場合，入力もアニメーション・タイマーも無いときはフレームレートを下げてイベントを待つ
+        self.idle_pacing = False
+        self.pacer = FramePacer()
+        # 前回のget_events()でイベントを受け取ったかどうか
+        self.input_received = False
+        # main()のフレームをフェーズごとに計測する．F3キーでオーバーレイを表示する (profiler.py)
+        self.profiler = FrameProfiler()
+        self.key_events.subscribe(pygame.K_F3, self.on_profiler_key)
+        # フレームの空き時間に1つずつ実行する処理(次の画面の準備など)
+        self.idle_tasks: Deque[Callable[[], None]] = deque()
+        # 次の画面を先に作る関数(Gameがセットする)．request_prefetch()で使う
+        self.prefetcher: Optional[Callable[[Screen], None]] = None
     
     # @property
     # def front_sprites(self) -> pygame.sprite.Group:
@@ -48,6 +95,24 @@ class BaseScreen:
     # def background_sprites(self) -> pygame.sprite.Group:
     #     return self.groups[1]
     
+    def reset(self):
+        """画面に入るときの状態にする．main()の最初に毎回呼ばれる(Spriteや画像は作り直さない)．
+        画面ごとの状態(選択中の項目やBGM，ウィンドウのタイトルなど)はサブクラスでオーバーライドして設定する．
+        __init__では画面の外に影響すること(音の再生など)をせず，ここで行うので，画面は先に作っておける．
+        """
+        self.run = True
+        self.next_screen = Screen.QUIT
+        self.key_events.clear()
+        self.input_received = False
+        self.pacer.wake()
+        self.replay = current_replay()
+        self.clock.unthrottled = self.headless or (self.replay is not None and self.replay.unthrottled)
+        # フレーム数・フレームレート・プロファイラの集計は画面に入るたびに数え直す
+        self.clock.reset()
+        self.delta_time = self.clock.delta_time
+        self.profiler.reset()
+        self.invalidate()
+
     def hoverable(self, rich_sprite, outline_image, group=None, border_width: int=5):
         if group is None:
             group = self.middle_sprites
@@ -56,11 +121,25 @@ class BaseScreen:
         rich_sprite.change_exit_fnc(group.remove, (outlines,))
     
     def get_events(self):
-        for event in pygame.event.get():
+        # アイドル中にself.pacerを起こしたイベントが先
+        events = self.pacer.take_events() + pygame.event.get()
+        if self.replay is not None:
+            # 記録する場合はこのフレームの入力を残し，再生する場合は記録した入力に置き換える
+            frame = self.replay.frame(events)
+            events = frame.events
+            self.pointer_input = (frame.pos, frame.buttons[0])
+        self.input_received = bool(events)
+        for event in events:
             if event.type == pygame.QUIT:
                 self.run = False
-            elif event.type == pygame.KEYDOWN:
-                self.key_downs.append(event)
+            elif event.type == pygame.KEYDOWN or event.type == pygame.KEYUP:
+                self.key_events.publish(event)
+
+    @property
+    def key_downs(self):
+        """最近のKEYDOWNのイベント (self.key_eventsのhistoryに残っているもの)
+        """
+        return self.key_events.key_downs()
     
     def empty_all_sprites(self):
         self.background_sprites.empty()
@@ -71,20 +150,187 @@ class BaseScreen:
         self.background_sprites.update()
         self.middle_sprites.update()
         self.front_sprites.update()
+        self.pointer.dispatch(*self.pointer_input)
+
+    def busy(self) -> bool:
+        """入力が無くても変化するもの(アニメーション・タイマーなど)が動いているかどうか
+        """
+        return self.background_sprites.busy() or self.middle_sprites.busy() or self.front_sprites.busy()
+
+    def next_change(self) -> Optional[int]:
+        """入力が無くても次に画面が変わるまでのupdate()の回数(Group.next_change)．0は毎回変わる．Noneは入力が無い限り変わらない
+        """
+        return earliest_change(self.background_sprites.next_change(), self.middle_sprites.next_change(), self.front_sprites.next_change())
+
+    def add_idle_task(self, fnc: Callable[[], None]):
+        """fncをフレームの空き時間に実行する(run_idle_task)
+        """
+        self.idle_tasks.append(fnc)
 
-    def draw(self):
-        self.display.fill((255, 255, 255))
-        self.background_sprites.draw(self.display)
-        self.middle_sprites.draw(self.display)
-        self.front_sprites.draw(self.display)
+    def prefetch_hints(self) -> Dict[str, Any]:
+        """次の画面を先に作るときに使う，この画面で選んでいるもの(ステージなど)．Game.prefetch_screen()に渡す
+        """
+        return {}
+
+    def request_prefetch(self, screen: Screen):
+        """screenの画面を空き時間に先に作る．prefetch_hints()は実行するときに読むので，選択が変わったときに呼び直せばよい
+        """
+        if self.prefetcher is not None:
+            self.add_idle_task(lambda: self.prefetcher(screen))
+
+    def run_idle_task(self) -> bool:
+        """入力が無く，このフレームの処理がフレームの時間の半分より早く終わった場合に，idle_tasksを1つ実行する．
+        idle_pacing=Falseの画面(ゲームなど)では，アニメーション・タイマーが動いている間(busy())は実行しない．
+        1つの処理がフレームの時間を超えることがあるので，動きが止まって見えないようにするため．
+
+        Returns:
+            bool: 実行したかどうか
+        """
+        if not self.idle_tasks or self.input_received:
+            return False
+        if not self.idle_pacing and self.busy():
+            return False
+        if not self.clock.unthrottled and time.perf_counter() - self.clock.last_time > 0.5 / self.fps:
+            return False
+        self.idle_tasks.popleft()()
+        return True
+
+    def tick(self):
+        """フレームの最後に呼び，次のフレームまで待つ．待つ前に空き時間があればidle_tasksを1つ実行する．
+
+        idle_pacing=Trueの場合は，入力も毎tick動くものも無い状態が続くと，
+        self.pacerがフレームレートを下げてイベントを待つ．アニメーション・タイマーがあれば次に変わるときまで待つ．
+        """
+        self.run_idle_task()
+        if self.clock.unthrottled:
+            self.clock.tick()
+        elif not self.idle_pacing:
+            self.clock.tick(self.fps)
+        else:
+            # idle_tasksが残っている間はアイドルにしない．アニメーション・タイマーは次に変わるときまで待てばよい
+            next_change = self.next_change()
+            self.pacer.tick(self.clock, self.fps, self.input_received or next_change == 0 or bool(self.idle_tasks), next_change)
+        self.delta_time = self.clock.delta_time
+
+    def fixed_update(self):
+        """前のフレームからの実際の経過時間の分だけ，固定の時間刻み(self.clock.step秒)でupdate()を呼ぶ．
+        描画が遅れたフレームでは複数回，描画のフレームレートが高いフレームでは0回になる．
+        """
+        steps = self.clock.steps()
+        if self.replay is not None:
+            # 再生する場合は記録したときと同じ回数だけ進める
+            steps = self.replay.steps(steps)
+        for _ in range(steps):
+            self.update()
+            if not self.run:
+                break
+
+    def set_static_background(self, static: bool=True):
+        """background_spritesを静的なレイヤーにする．
+        白で塗った上に背景を合成した1枚のSurfaceをキャッシュし，毎フレームの全体のfillと背景の描画をその1回の描画に置き換える．
+        背景のSpriteが追加・削除・移動されたときだけ合成し直す．
+        """
+        self.background_sprites.set_static(static, bgcolor=(255, 255, 255))
+
+    def draw(self, surface=None):
+        if surface is None:
+            surface = self.display
+        if not self.background_sprites.static:
+            surface.fill((255, 255, 255))
+        self.background_sprites.draw(surface)
+        self.middle_sprites.draw(surface)
+        self.front_sprites.draw(surface)
+
+    def invalidate(self):
+        """次のフレームで画面全体を描画し直す．
+        use_dirty_rects=Trueの場合に，スプライトの画像のピクセルを直接書き換えたときに呼ぶ．
+        """
+        self.dirty_rect_tracker.invalidate()
+
+    def render(self):
+        """描画して画面を更新する．
+
+        use_dirty_rects=Trueの場合は，まず描画内容だけを記録して前のフレームと比べ，
+        変化した領域(互いに重ならない)ごとに描画し直してpygame.display.update(rects)に渡す．変化が無ければ何もしない．
+        """
+        if not self.use_dirty_rects:
+            self.draw()
+            self.present()
+            return
+        recorder = BlitRecorder(self.display)
+        self.draw(recorder)
+        rects = self.dirty_rect_tracker.dirty_rects(recorder)
+        if not rects and not self.profiler.overlay_visible:
+            return
+        for rect in rects:
+            self.display.set_clip(rect)
+            self.draw()
+        self.display.set_clip(None)
+        self.present(rects)
+
+    def present(self, rects=None):
+        """描画した内容をウィンドウに反映する(pygame.display.update)．ヘッドレスモードでは何もしない．
+        """
+        if self.headless:
+            return
+        if self.profiler.enabled:
+            self.profiler.mark("draw")
+            if self.profiler.overlay_visible:
+                overlay_rect = self.display.blit(self.profiler.overlay(get_font(size=12)), (0, 0))
+                if rects is not None:
+                    rects = list(rects) + [overlay_rect]
+        if rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(rects)
+        if self.profiler.enabled:
+            self.profiler.mark("present")
+
+    def on_profiler_key(self, event):
+        """F3キーでプロファイラのオーバーレイを表示・非表示する
+        """
+        if event.type != pygame.KEYDOWN:
+            return
+        self.profiler.toggle_overlay()
+        if not self.profiler.overlay_visible:
+            # オーバーレイの下を描画し直す
+            self.invalidate()
+
+    def profiled_frame(self):
+        """main()の1フレームをself.profilerで計測しながら進める
+        """
+        profiler = self.profiler
+        profiler.begin_frame()
+        self.get_events()
+        profiler.mark("events")
+        self.fixed_update()
+        profiler.mark("update")
+        # 描画と画面の更新はpresent()の中で分けて計測する．present()を呼ばなかった場合は全て描画に数える
+        self.render()
+        profiler.mark("draw")
+        self.tick()
+        profiler.mark("tick")
+        profiler.end_frame([self.background_sprites, self.middle_sprites, self.front_sprites])
     
     def main(self):
+        # 環境変数 JANKEN_PROFILE にディレクトリを指定した場合は，計測して画面の終了時に書き出す
+        profile_dir = os.environ.get(PROFILE_ENV)
+        if profile_dir:
+            self.profiler.enabled = True
+        self.reset()
+        if self.replay is not None:
+            self.replay.begin_screen(type(self).__name__)
+        self.clock.resync()
         while self.run:
+            if self.profiler.enabled:
+                self.profiled_frame()
+                continue
             self.get_events()
-            self.update()
-            self.draw()
-            pygame.display.update()
-            self.clock.tick(self.fps)
+            self.fixed_update()
+            self.render()
+            self.tick()
+        if profile_dir:
+            self.profiler.export(profile_dir, type(self).__name__)
 
         # for group in self.groups:
         #     if len(group):
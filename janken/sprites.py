@@ -6,6 +6,9 @@ from pygame.rect import Rect
 from pygame.surface import Surface
 from pygame.sprite import Sprite
 
+from scale_cache import cached_scale
+from text_cache import render_text
+
 """
 pygame.sprite.Sprite
 
@@ -67,8 +70,9 @@ def make_outline_splites(rect: Rect, image: Surface, border_width: int=5) -> Lis
 class TextSprite(Sprite):
     def __init__(self, x: int, y: int, text: str, font: pygame.font.Font,
             color: Tuple[int, int, int]=(0, 0, 0), bgcolor: Optional[Tuple[int, int, int]]=None,
-            align: str="left", vertical_align: str="top"):
+            align: str="left", vertical_align: str="top", use_atlas: bool=False):
         """テキストを描画するスプライト．(x, y)を基準に，align, vertical_alignで配置を決める．
+        描画結果はtext_cacheにキャッシュされる．数字・かなだけの変わりやすいテキストはuse_atlas=Trueでグリフから組み立てる．
         
                left    center    right
            top   .________.________.
@@ -84,7 +88,7 @@ class TextSprite(Sprite):
         super().__init__()
         self.text = text
         self.font = font
-        self.image = font.render(text, True, color, bgcolor)
+        self.image = render_text(font, text, True, color, bgcolor, use_atlas=use_atlas)
         # rect計算
         rect = self.image.get_rect()
         # 水平方向配置
@@ -117,19 +121,55 @@ class AnimationSprite(Sprite):
     def image(self):
         return self.images[self.image_index]
     
+    def busy(self) -> bool:
+        return len(self.images) > 1
+
+    def next_change(self) -> Optional[int]:
+        """次に画像が切り替わるまでのupdate()の回数．アニメーションしない場合はNone
+        """
+        if len(self.images) <= 1:
+            return None
+        return max(self.interval - self.counter, 0) + 1
+
     def update(self):
         self.counter += 1
         if self.counter > self.interval:
             self.counter = 0
             self.image_index = (self.image_index + 1) % len(self.images)
 
+class ProgressBarSprite(Sprite):
+    def __init__(self, rect: Rect, color: Tuple[int, int, int]=(0, 0, 0), bgcolor: Tuple[int, int, int]=(255, 255, 255), border_width: int=2):
+        """進捗率に応じて伸びるバー
+        """
+        super().__init__()
+        self.rect = rect
+        self.color = color
+        self.bgcolor = bgcolor
+        self.border_width = border_width
+        self.image = Surface(rect.size).convert()
+        self.ratio = -1.0
+        self.set_ratio(0.0)
+
+    def set_ratio(self, ratio: float):
+        """進捗率(0.0から1.0)を設定する．変わった場合のみ描画し直す．
+        """
+        ratio = max(0.0, min(1.0, ratio))
+        if ratio == self.ratio:
+            return
+        self.ratio = ratio
+        w, h = self.rect.size
+        b = self.border_width
+        self.image.fill(self.color)
+        self.image.fill(self.bgcolor, (b, b, w - b * 2, h - b * 2))
+        self.image.fill(self.color, (b, b, int((w - b * 2) * ratio), h - b * 2))
+
 def load_animation_sprite(x: int, y: int, images_dir: str, interval: int=0, multiple:float=1.0, align:str="center", vertical_align:str="middle") -> AnimationSprite:
     images = [pygame.image.load(image_path).convert_alpha() for image_path in sorted(glob.glob(os.path.join(images_dir, "*")))]
     return make_animation_sprites(x=x, y=y, images=images, interval=interval, multiple=multiple, align=align, vertical_align=vertical_align)
 
 def make_animation_sprites(x: int, y: int, images: List[Surface], interval: int=0, multiple:float=1.0, align:str="center", vertical_align:str="middle") -> AnimationSprite:
     if multiple != 1.0:
-        images = [pygame.transform.scale(image, (int(image.get_rect().w * multiple), int(image.get_rect().h * multiple))) for image in images]
+        images = [cached_scale(image, (int(image.get_rect().w * multiple), int(image.get_rect().h * multiple))) for image in images]
 
     rect = images[0].get_rect()
     
@@ -185,7 +225,7 @@ class RichSprite(Sprite):
             vertical_align (str, optional): [description]. Defaults to "middle".
             images (List[Surface], optional): [description]. Defaults to None.
             multiple (float, optional): [description]. Defaults to 1.0.
-            interval (int, optional): [description]. Defaults to 0.
+            interval (int, optional): 画像を切り替えるまでのtick数 - 1. 秒で指定する場合は clock.seconds_to_interval() で変換する. Defaults to 0.
         """
         if image is None and images is None:
             raise(TypeError("'image', 'images' のどちらか一方は None でない必要があります."))
@@ -212,6 +252,9 @@ class RichSprite(Sprite):
         # マウスクリック
         self.press_fnc = None
         self.change_press_fnc(press_fnc, press_fnc_args)
+
+        # TrueのときはPointerDispatcherが当たり判定を行う
+        self.dispatched = False
     
     @property
     def image(self):
@@ -247,6 +290,18 @@ class RichSprite(Sprite):
     def back_image_index(self):
         self.image_index = (self.image_index - 1) % len(self.images)
 
+    def busy(self) -> bool:
+        """アニメーションしているかどうか
+        """
+        return len(self.images) > 1
+
+    def next_change(self) -> Optional[int]:
+        """次に画像が切り替わるまでのupdate()の回数．アニメーションしない場合はNone
+        """
+        if len(self.images) <= 1:
+            return None
+        return max(self.interval - self.counter, 0) + 1
+
     def update(self):
         """更新処理
         """
@@ -256,41 +311,48 @@ class RichSprite(Sprite):
             if self.counter > self.interval:
                 self.counter = 0
                 self.image_index = (self.image_index + 1) % len(self.images)
-        # マウスとの当たり判定を行う
-        if self.check_hover or self.check_press:
+        # マウスとの当たり判定を行う (PointerDispatcherに登録されている場合はそちらが行う)
+        if not self.dispatched and (self.check_hover or self.check_press):
             mouse_pos = pygame.mouse.get_pos()
-            collide = self.rect.collidepoint(*mouse_pos)
-            # マウスホーバーチェックを行う
-            if self.check_hover:
-                if collide:  # hoverている
-                    if not self.hover:  # 元々hoverしていなかった
-                        self.hover = True
-                        if self.enter_fnc is not None:  # enter_fncを実行
-                            if self.enter_fnc_args is None:
-                                self.enter_fnc()
-                            else:
-                                self.enter_fnc(*self.enter_fnc_args)
-                else:   # hoverしていない
-                    if self.hover:  # 元々hoverしていた
-                        self.hover = False
-                        if self.exit_fnc is not None:   # exit_fncを実行
-                            if self.exit_fnc_args is None:
-                                self.exit_fnc()
-                            else:
-                                self.exit_fnc(*self.exit_fnc_args)
-            # マウス押下チェックを行う
-            if self.check_press:
-                now_pressed = pygame.mouse.get_pressed()[0]
-                if collide:
-                    if now_pressed and not self.pressed:
-                        self.pressed = True
-                        if self.press_fnc_args is None:
-                            self.press_fnc()
+            self.pointer_update(self.rect.collidepoint(*mouse_pos), pygame.mouse.get_pressed()[0])
+
+    def pointer_update(self, collide: bool, pressed: bool):
+        """マウスとの当たり判定の結果から，enter/exit/pressの関数を呼び出す
+
+        Args:
+            collide (bool): マウスカーソルがrectの中にあるかどうか
+            pressed (bool): マウスの左ボタンが押されているかどうか
+        """
+        # マウスホーバーチェックを行う
+        if self.check_hover:
+            if collide:  # hoverている
+                if not self.hover:  # 元々hoverしていなかった
+                    self.hover = True
+                    if self.enter_fnc is not None:  # enter_fncを実行
+                        if self.enter_fnc_args is None:
+                            self.enter_fnc()
+                        else:
+                            self.enter_fnc(*self.enter_fnc_args)
+            else:   # hoverしていない
+                if self.hover:  # 元々hoverしていた
+                    self.hover = False
+                    if self.exit_fnc is not None:   # exit_fncを実行
+                        if self.exit_fnc_args is None:
+                            self.exit_fnc()
                         else:
-                            self.press_fnc(*self.press_fnc_args)
-                    elif not now_pressed and self.pressed:
-                        self.pressed = False
-                        
+                            self.exit_fnc(*self.exit_fnc_args)
+        # マウス押下チェックを行う
+        if self.check_press:
+            if collide:
+                if pressed and not self.pressed:
+                    self.pressed = True
+                    if self.press_fnc_args is None:
+                        self.press_fnc()
+                    else:
+                        self.press_fnc(*self.press_fnc_args)
+                elif not pressed and self.pressed:
+                    self.pressed = False
+
 
 class HoverRect:
     def __init__(self, rect: Rect, enter_fnc: Callable, exit_fnc: Callable):
@@ -300,10 +362,13 @@ class HoverRect:
         self.hover = False
         self.enter_fnc = enter_fnc
         self.exit_fnc = exit_fnc
+        self.dispatched = False
     
     def update(self):
-        mouse_pos = pygame.mouse.get_pos()
-        if self.rect.collidepoint(*mouse_pos):  # hoverしている
+        self.pointer_update(self.rect.collidepoint(*pygame.mouse.get_pos()), pygame.mouse.get_pressed()[0])
+
+    def pointer_update(self, collide: bool, pressed: bool):
+        if collide:  # hoverしている
             if not self.hover:
                 self.hover = True
                 if self.enter_fnc is not None:
@@ -322,11 +387,13 @@ class PressRect:
         self.rect = rect
         self.fnc = fnc
         self.pressed = False
+        self.dispatched = False
     
     def update(self):
-        pos = pygame.mouse.get_pos()
-        pressed = pygame.mouse.get_pressed()[0]
-        if self.rect.collidepoint(pos):
+        self.pointer_update(self.rect.collidepoint(pygame.mouse.get_pos()), pygame.mouse.get_pressed()[0])
+
+    def pointer_update(self, collide: bool, pressed: bool):
+        if collide:
             if pressed and not self.pressed:
                 self.pressed = True
                 self.fnc(self)
@@ -405,7 +472,7 @@ def layout_rects(base_rect: Rect, cols: Optional[int]=None, rows: Optional[int]=
 
 
 def fit_surface(surface: Surface, rect: Rect) -> Surface:
-    """rectに収まるように縮小・拡大したsurfaceを返す
+    """rectに収まるように縮小・拡大したsurfaceを返す．結果はキャッシュされる．
 
     Args:
         surface (Surface): 元画像Surface
@@ -416,7 +483,7 @@ def fit_surface(surface: Surface, rect: Rect) -> Surface:
     """
     s_rect = surface.get_rect()
     amp = min(rect.w / s_rect.w, rect.h / s_rect.h)
-    return pygame.transform.scale(surface, (int(s_rect.w * amp), int(s_rect.h * amp)))
+    return cached_scale(surface, (int(s_rect.w * amp), int(s_rect.h * amp)))
 
 
 if __name__ == "__main__":
@@ -1,12 +1,29 @@
+from typing import Union
+
 from pygame.surface import Surface
 from pygame.rect import Rect
 
+from lazy import Lazy, resolve
+
 class Stage:
-    def __init__(self, id_: str, name: str, image: Surface):
+    def __init__(self, id_: str, name: str, image: Union[Surface, Lazy]):
         self.id = id_
         self.name = name
-        self.image = image
+        self._image = image
+    
+    @property
+    def image(self) -> Surface:
+        return resolve(self._image)
     
+    @image.setter
+    def image(self, image: Surface):
+        self._image = image
+    
+    def clone(self, id_: str, name: str) -> "Stage":
+        """画像を(読み込む前ならLazyのまま)共有した，別のidと名前のStageを作る
+        """
+        return Stage(id_, name, self._image)
+
     def thumbnail_image(self, width: int, height: int):
         return self.image.subsurface(self.thumbnail_rect(width, height))
     
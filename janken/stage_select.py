@@ -1,4 +1,4 @@
-from typing import Dict, List, Callable, Tuple
+from typing import Any, Dict, List, Callable, Tuple
 from enum import Enum
 import math
 import random
@@ -15,11 +15,13 @@ from component import CounterBtn
 from component import make_counter_btn
 from component import ValuesGroup
 from game_config import GameConfig
+from text_cache import render_text
 
 
 class StageSelectScreen2(BaseScreen):
     def __init__(self, game_config: GameConfig, gamesetting):
         super().__init__()
+        self.set_static_background()
         # game_configから必要な情報を取り出す
         self.stages = game_config.stages
         self.gamesetting = gamesetting
@@ -118,6 +120,8 @@ class StageSelectScreen2(BaseScreen):
             sound=self.click_sound,
         )
         self.stock_counter = counter_btn
+        for press_rect in counter_btn.press_rects:
+            self.pointer.register(press_rect)
         rect = counter_btn.rect
         stock_label = TextSprite(
             x=rect.right + 5,
@@ -238,6 +242,7 @@ class StageSelectScreen2(BaseScreen):
         hover_rect = HoverRect(rect, enter_fnc, exit_fnc)
         outline_sprites = make_outline_splites(rect, self.outline_image, border_width=3)
         self.hover_rects[hover_rect] = outline_sprites
+        self.pointer.register(hover_rect)
     
     def _visible_outlines(self, hover_rect: HoverRect):
         """ hover_rect に対応した OutlineSprite を見えるようにする (self.middle_spritesに追加)
@@ -272,6 +277,7 @@ class StageSelectScreen2(BaseScreen):
         rect = sprite.rect
         press_rect = PressRect(rect, fnc)
         self.press_rects[press_rect] = value
+        self.pointer.register(press_rect)
     
     def _update_stage(self, new_stage: Stage):
         """ self.selected_stage を new_stage に置き換える
@@ -308,39 +314,34 @@ class StageSelectScreen2(BaseScreen):
                 if event.type == pygame.QUIT:
                     self.next_screen = Screen.QUIT
                     self.run = False
-            # hover_rectの更新
-            for hover_rect in self.hover_rects:
-                hover_rect.update()
-            # press_rectの更新
-            for press_rect in self.press_rects:
-                press_rect.update()
-            # componentsの更新
-            self.stock_counter.update()
-            self.stock = self.stock_counter.count
-            
+            # hover_rect, press_rect, componentsはself.update()でself.pointerが更新する
             self.update()
-            self.draw()
+            self.stock = self.stock_counter.count
+
+            self.render()
             
             # # press_rect の領域表示
             # for press_rect in self.press_rects:
             #     pygame.draw.rect(self.display, (0, 0, 255), press_rect.rect, width=2)
 
-            pygame.display.update()
         self.bgm_sound.stop()
         self.click_sound.stop()
 
 
 class StageSelectScreen(BaseScreen):
+    reusable = True
+    next_screens = (Screen.GAME, Screen.CHARACTER_SELECT)
+
     def __init__(self, game_config: GameConfig, gamesetting):
         super().__init__()
+        self.idle_pacing = True
+        self.set_static_background()
         # game_configから必要な情報を取り出す
         self.stages = game_config.stages
         self.gamesetting = gamesetting
         self.load_images(game_config)
         self.load_sounds(game_config)
 
-        pygame.display.set_caption("ステージセレクト")
-
         self.selected_stage = None
         self.stock = 3
 
@@ -358,6 +359,12 @@ class StageSelectScreen(BaseScreen):
         self._set_stock_btn()
 
         self._select_stage(list(self.stages.values())[0])
+
+    def reset(self):
+        super().reset()
+        pygame.display.set_caption("ステージセレクト")
+        self._select_stage(list(self.stages.values())[0])
+        self.stock_btn.reset()
     
     def load_sounds(self, game_config: GameConfig):
         """サウンドを読み込む
@@ -410,7 +417,7 @@ class StageSelectScreen(BaseScreen):
             ("back", "left", 5, 5, Screen.CHARACTER_SELECT)
         ]
         for text, align, x, y, next_screen in tuples:
-            btn_surface = self.btn_font.render(text, True, (0, 0, 0))
+            btn_surface = render_text(self.btn_font, text, True, (0, 0, 0))
             btn_sprite = RichSprite(
                 x=x,
                 y=y,
@@ -446,6 +453,11 @@ class StageSelectScreen(BaseScreen):
         self.selected_stage = stage
         new_view_sprite = self.stage_view_sprites[self.selected_stage]
         self.middle_sprites.add(new_view_sprite)
+        # 先に作るゲーム画面(背景の縮小など)を選んだステージに合わせる
+        self.request_prefetch(Screen.GAME)
+
+    def prefetch_hints(self) -> Dict[str, Any]:
+        return {"stage": self.selected_stage}
 
     def _set_stages(self):
         """画面右側にステージのサムネイルをタイル表示する
@@ -490,15 +502,6 @@ class StageSelectScreen(BaseScreen):
         # self.front_sprites.add(counter_btn)
         # print("set counter")
 
-    def main(self):
-        while self.run:
-            self.get_events()
-            self.clock.tick(self.fps)
-            self.update()
-            self.draw()
-            # print(self.front_sprites)
-            pygame.display.update()
-
 
 def get_sample_stages(json_path="./jsons/stage.json"):
     """ json stages の サンプルを読み込む
@@ -0,0 +1,166 @@
+from typing import Optional
+import hashlib
+import mmap
+import os
+import struct
+import threading
+
+import pygame
+
+"""
+デコード済みのピクセルデータをディスクにキャッシュする
+
+キャッシュは画像ファイルと同じディレクトリの .surface_cache/ 以下に，
+<ファイル名>.surf として保存される．
+ファイルの更新時刻・サイズが一致すればそのまま使い，一致しない場合は内容のハッシュを比較する．
+ハッシュも一致しなければキャッシュは作り直される．
+
+内容のハッシュ(重複排除に使う)も，更新時刻・サイズと一緒に .surf のヘッダか <ファイル名>.digest (サウンドなど) に記録しておき，
+それらが変わっていなければファイルを読まずに使う．
+"""
+
+CACHE_DIR_NAME = ".surface_cache"
+MAGIC = b"JKSC"
+VERSION = 1
+# magic, version, mtime_ns, file_size, digest, width, height, format, has_colorkey, colorkey (ピクセルデータが64バイト境界から始まるようにパディング)
+HEADER = struct.Struct("<4sHqQ16sII4s?4B9x")
+# magic, version, mtime_ns, file_size, digest (HEADERの先頭と同じ並び)
+DIGEST_MAGIC = b"JKSD"
+DIGEST_HEADER = struct.Struct("<4sHqQ16s")
+
+
+def file_digest(path: str) -> bytes:
+    """ファイル内容のハッシュ
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+class SurfaceCache:
+    def __init__(self, dir_name: str=CACHE_DIR_NAME):
+        """デコード済みSurfaceのディスクキャッシュ．
+
+        複数のワーカースレッドから同時に呼び出してよい．
+        """
+        self.dir_name = dir_name
+        # hits, missesはワーカースレッドから数えるのでself.lockで守る
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _miss(self) -> None:
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def _hit(self):
+        with self.lock:
+            self.hits += 1
+
+    def cache_path(self, path: str) -> str:
+        """画像ファイルのパスに対応するキャッシュファイルのパス
+        """
+        dir_path, name = os.path.split(path)
+        return os.path.join(dir_path, self.dir_name, name + ".surf")
+
+    def digest_path(self, path: str) -> str:
+        """ファイルの内容のハッシュを記録するファイルのパス
+        """
+        dir_path, name = os.path.split(path)
+        return os.path.join(dir_path, self.dir_name, name + ".digest")
+
+    def digest(self, path: str) -> bytes:
+        """ファイルの内容のハッシュ(file_digest)．
+        .surfのヘッダか.digestに記録した更新時刻・サイズが今のファイルと一致すれば，記録したハッシュを返す(ファイルは読まない)．
+        そうでなければハッシュを求めて.digestに記録する．
+        """
+        stat = os.stat(path)
+        for record_path, magic in ((self.cache_path(path), MAGIC), (self.digest_path(path), DIGEST_MAGIC)):
+            digest = self._recorded_digest(record_path, magic, stat)
+            if digest is not None:
+                return digest
+        digest = file_digest(path)
+        self._write(self.digest_path(path), DIGEST_HEADER.pack(DIGEST_MAGIC, VERSION, stat.st_mtime_ns, stat.st_size, digest))
+        return digest
+
+    def _recorded_digest(self, record_path: str, magic: bytes, stat: os.stat_result) -> Optional[bytes]:
+        try:
+            with open(record_path, "rb") as f:
+                data = f.read(DIGEST_HEADER.size)
+        except OSError:
+            return None
+        if len(data) < DIGEST_HEADER.size:
+            return None
+        record_magic, version, mtime_ns, file_size, digest = DIGEST_HEADER.unpack(data)
+        if record_magic != magic or version != VERSION or (mtime_ns, file_size) != (stat.st_mtime_ns, stat.st_size):
+            return None
+        return digest
+
+    def load(self, path: str) -> Optional[pygame.surface.Surface]:
+        """キャッシュからSurfaceを復元する．キャッシュが無い・古い場合はNone．
+
+        ピクセルデータはmmapしたキャッシュファイルをそのまま共有する(コピーオンライト)．
+        """
+        cache_path = self.cache_path(path)
+        try:
+            stat = os.stat(path)
+            with open(cache_path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):
+            return self._miss()
+        if len(mm) < HEADER.size:
+            return self._miss()
+        magic, version, mtime_ns, file_size, digest, w, h, fmt, has_colorkey, *colorkey = HEADER.unpack_from(mm)
+        if magic != MAGIC or version != VERSION:
+            return self._miss()
+        if (mtime_ns, file_size) != (stat.st_mtime_ns, stat.st_size):
+            # 更新時刻が変わっていても，内容が同じならキャッシュを使う
+            if file_digest(path) != digest:
+                return self._miss()
+            HEADER.pack_into(mm, 0, magic, version, stat.st_mtime_ns, stat.st_size, digest, w, h, fmt, has_colorkey, *colorkey)
+            self._write(cache_path, bytes(mm))
+        fmt = fmt.rstrip(b"\0").decode()
+        try:
+            surface = pygame.image.frombuffer(memoryview(mm)[HEADER.size:], (w, h), fmt)
+        except ValueError:
+            return self._miss()
+        if has_colorkey:
+            surface.set_colorkey(colorkey)
+        self._hit()
+        return surface
+
+    def store(self, path: str, surface: pygame.surface.Surface):
+        """デコードしたSurfaceをキャッシュに保存する．保存できない場合は何もしない．
+        """
+        try:
+            stat = os.stat(path)
+            # 重複排除のために求めたハッシュが.digestに残っていればそれを使う
+            digest = self.digest(path)
+        except OSError:
+            return
+        fmt = "RGBA" if surface.get_flags() & pygame.SRCALPHA else "RGB"
+        colorkey = surface.get_colorkey()
+        header = HEADER.pack(
+            MAGIC, VERSION, stat.st_mtime_ns, stat.st_size, digest,
+            surface.get_width(), surface.get_height(), fmt.encode().ljust(4, b"\0"),
+            colorkey is not None, *(colorkey if colorkey is not None else (0, 0, 0, 0))
+        )
+        self._write(self.cache_path(path), header + pygame.image.tobytes(surface, fmt))
+
+    def _write(self, cache_path: str, data: bytes):
+        """一時ファイルに書いてから置き換える(他スレッド・他プロセスが途中のファイルを読まないように)
+        """
+        tmp_path = "{}.{}.{}.tmp".format(cache_path, os.getpid(), threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
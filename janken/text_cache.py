@@ -0,0 +1,199 @@
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+import weakref
+
+import pygame
+from pygame.surface import Surface
+
+"""
+描画したテキストのキャッシュ
+
+同じ(フォント, テキスト, 色, 背景色, アンチエイリアス)の描画結果を使い回す．
+プレイヤー名やストック数のように変わるテキストは，1文字ずつ描画してキャッシュしたグリフ(GlyphAtlas)を
+並べて作ることで，FreeTypeによる描画を避ける．
+
+キャッシュしたSurfaceそのものではなくsubsurfaceを返すので，
+呼び出し側で set_alpha() などをしてもキャッシュには影響しない．
+"""
+
+Color = Tuple[int, int, int]
+
+DIGITS = "0123456789"
+HIRAGANA = "".join(chr(c) for c in range(ord("ぁ"), ord("ゖ") + 1))
+KATAKANA = "".join(chr(c) for c in range(ord("ァ"), ord("ヺ") + 1))
+# グリフをキャッシュして組み立てに使う文字
+ATLAS_CHARS = frozenset(DIGITS + HIRAGANA + KATAKANA + "ー・ 　")
+
+
+def surface_nbytes(surface: Surface) -> int:
+    return surface.get_pitch() * surface.get_height()
+
+
+class GlyphAtlas:
+    def __init__(self, font: pygame.font.Font, color: Color, bgcolor: Optional[Color]=None):
+        """1つの(フォント, 色, 背景色)について，1文字ずつ描画したグリフを保持する．
+        アンチエイリアスありの描画のみを扱う．
+
+        隣り合う文字の間のカーニングは反映されないので，固定幅に近い文字(数字・かな)のみに使う．
+        """
+        self.font = font
+        self.color = color
+        self.bgcolor = bgcolor
+        self.glyphs: Dict[str, Surface] = {}
+
+    def glyph(self, char: str) -> Surface:
+        surface = self.glyphs.get(char)
+        if surface is None:
+            surface = self.font.render(char, True, self.color, self.bgcolor)
+            self.glyphs[char] = surface
+        return surface
+
+    def warm(self, chars: str=DIGITS):
+        """charsのグリフを先に描画しておく
+        """
+        for char in chars:
+            self.glyph(char)
+
+    def compose(self, text: str) -> Surface:
+        """グリフを並べてtextを描画したSurfaceを作る
+        """
+        glyphs = [self.glyph(char) for char in text]
+        size = (sum(glyph.get_width() for glyph in glyphs), self.font.get_height())
+        if self.bgcolor is None:
+            surface = Surface(size, pygame.SRCALPHA, 32)
+            # グリフは重ならず，下地は透明なので，最大値の合成でそのままコピーされる
+            flags = pygame.BLEND_RGBA_MAX
+        else:
+            surface = Surface(size)
+            surface.fill(self.bgcolor)
+            flags = 0
+        x = 0
+        for glyph in glyphs:
+            surface.blit(glyph, (x, 0), special_flags=flags)
+            x += glyph.get_width()
+        return surface
+
+    def nbytes(self) -> int:
+        return sum(surface_nbytes(glyph) for glyph in self.glyphs.values())
+
+
+class TextCache:
+    def __init__(self, max_bytes: int=16 * 1024 * 1024):
+        """描画したテキストを保持するLRUキャッシュ．
+
+        保持している描画結果の合計バイト数がmax_bytesを超えたら，最も長く使われていないものから捨てる．
+        フォントが破棄されたら，そのフォントの描画結果とグリフも捨てる．
+
+        Args:
+            max_bytes (int, optional): 保持する描画結果の合計バイト数の上限. Defaults to 16MiB.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        # (id(font), テキスト, 色, 背景色, アンチエイリアス) -> 描画結果
+        self.entries: OrderedDict = OrderedDict()
+        # (id(font), 色, 背景色) -> GlyphAtlas
+        self.atlases: Dict[tuple, GlyphAtlas] = {}
+        # id(font) -> フォントへの弱参照
+        self.fonts: Dict[int, weakref.ref] = {}
+        self.hits = 0
+        self.misses = 0
+        self.composed = 0
+        self.evictions = 0
+
+    def _font_id(self, font: pygame.font.Font) -> int:
+        font_id = id(font)
+        ref = self.fonts.get(font_id)
+        if ref is None or ref() is not font:
+            self._remove_font(font_id)
+            self.fonts[font_id] = weakref.ref(font, lambda _: self._remove_font(font_id))
+        return font_id
+
+    def _remove_font(self, font_id: int):
+        """フォントが破棄されたときに，そのフォントの描画結果とグリフを全て捨てる
+        """
+        self.fonts.pop(font_id, None)
+        for key in [key for key in self.entries if key[0] == font_id]:
+            self._remove(key)
+        for key in [key for key in self.atlases if key[0] == font_id]:
+            del self.atlases[key]
+
+    def atlas(self, font: pygame.font.Font, color: Color, bgcolor: Optional[Color]=None) -> GlyphAtlas:
+        """(フォント, 色, 背景色)のGlyphAtlasを返す．無ければ作る．
+        """
+        key = (self._font_id(font), tuple(color), tuple(bgcolor) if bgcolor is not None else None)
+        atlas = self.atlases.get(key)
+        if atlas is None:
+            atlas = GlyphAtlas(font, color, bgcolor)
+            self.atlases[key] = atlas
+        return atlas
+
+    def render(self, font: pygame.font.Font, text: str, antialias: bool=True, color: Color=(0, 0, 0), bgcolor: Optional[Color]=None, use_atlas: bool=False) -> Surface:
+        """font.render(text, antialias, color, bgcolor) の結果(キャッシュのsubsurface)を返す
+
+        Args:
+            font (pygame.font.Font): フォント
+            text (str): テキスト
+            antialias (bool, optional): アンチエイリアス. Defaults to True.
+            color (Color, optional): 文字色. Defaults to (0, 0, 0).
+            bgcolor (Optional[Color], optional): 背景色. Noneの場合は透過. Defaults to None.
+            use_atlas (bool, optional): Trueの場合，textの全ての文字がATLAS_CHARSに含まれていれば，グリフを並べて作る. Defaults to False.
+        """
+        color = tuple(color)
+        bgcolor = tuple(bgcolor) if bgcolor is not None else None
+        key = (self._font_id(font), text, color, bgcolor, antialias)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            if use_atlas and antialias and text and ATLAS_CHARS.issuperset(text):
+                surface = self.atlas(font, color, bgcolor).compose(text)
+                self.composed += 1
+            else:
+                surface = font.render(text, antialias, color, bgcolor)
+            self._put(key, surface)
+        return surface.subsurface(surface.get_rect())
+
+    def _put(self, key: tuple, surface: Surface):
+        self._remove(key)
+        self.entries[key] = surface
+        self.nbytes += surface_nbytes(surface)
+        while self.nbytes > self.max_bytes and self.entries:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _remove(self, key: tuple):
+        surface = self.entries.pop(key, None)
+        if surface is not None:
+            self.nbytes -= surface_nbytes(surface)
+
+    def clear(self):
+        self.entries.clear()
+        self.atlases.clear()
+        self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "atlases": len(self.atlases),
+            "glyph_bytes": sum(atlas.nbytes() for atlas in self.atlases.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "composed": self.composed,
+            "evictions": self.evictions,
+        }
+
+    def __repr__(self):
+        return "<TextCache: {} entries, {}/{} bytes, {} hits, {} misses>".format(len(self.entries), self.nbytes, self.max_bytes, self.hits, self.misses)
+
+
+text_cache = TextCache()
+
+
+def render_text(font: pygame.font.Font, text: str, antialias: bool=True, color: Color=(0, 0, 0), bgcolor: Optional[Color]=None, use_atlas: bool=False) -> Surface:
+    """text_cacheを使って描画する
+    """
+    return text_cache.render(font, text, antialias, color, bgcolor, use_atlas=use_atlas)
@@ -11,10 +11,19 @@ from stage import Stage
 from screen import Screen, BaseScreen
 from sprites import make_animation_sprites, RichSprite, make_outline_splites, adjust_rect
 from game_config import GameConfig
+from scale_cache import cached_scale
+from text_cache import render_text
+from clock import seconds_to_interval
 
 class TitleScreen(BaseScreen):
+    reusable = True
+    next_screens = (Screen.CHARACTER_SELECT, Screen.OPTION)
+
     def __init__(self, game_config: GameConfig):
         super().__init__()
+        self.use_dirty_rects = True
+        self.idle_pacing = True
+        self.set_static_background()
 
         self.components = game_config.components
 
@@ -31,12 +40,15 @@ class TitleScreen(BaseScreen):
         self._set_title()
         self._set_start_btn()
         self._set_option_btn()
-        self._set_bgm()
     
 
+    def reset(self):
+        super().reset()
+        self._set_bgm()
+
     def _set_background(self):
         rect = self.display.get_rect()
-        bg_surface = pygame.transform.scale(self.components["background"], (rect.w, rect.h))
+        bg_surface = cached_scale(self.components["background"], (rect.w, rect.h))
         bg_sprite = RichSprite(0, 0, align="left", vertical_align="top", image=bg_surface)
         self.background_sprites.add(bg_sprite)
     
@@ -47,13 +59,13 @@ class TitleScreen(BaseScreen):
         x = rect.w // 2
         y = rect.h // 3
         # title_sprite = make_animation_sprites(x, y, images=title_surfaces, interval=3, multiple=1.0)
-        title_sprite = RichSprite(x=x, y=y, images=title_surfaces, interval=4)
+        title_sprite = RichSprite(x=x, y=y, images=title_surfaces, interval=seconds_to_interval(1 / 12))
         self.middle_sprites.add(title_sprite)
     
 
     def _set_start_btn(self):
         # start_btn_surfaces = self.components["start"]
-        start_btn_surface = self.font.render("start", True, (0, 0, 0))
+        start_btn_surface = render_text(self.font, "start", True, (0, 0, 0))
         rect = self.display.get_rect()
         x = rect.w // 2
         y = rect.h * 2 // 3
@@ -66,7 +78,7 @@ class TitleScreen(BaseScreen):
     
 
     def _set_option_btn(self):
-        option_surface = self.font.render("option", True, (0, 0, 0))
+        option_surface = render_text(self.font, "option", True, (0, 0, 0))
         rect = self.display.get_rect()
         x = rect.w // 2
         y = rect.h * 3 // 4
@@ -116,17 +128,6 @@ class TitleScreen(BaseScreen):
         print("go to option screen")
         self.run = False
         self.next_screen = Screen.OPTION
-    
-    def main(self):
-        while self.run:
-            self.get_events()
-
-            self.update()
-            self.draw()
-
-            pygame.display.update()
-            self.clock.tick(self.fps)
-
 
 
 if __name__ == "__main__":
@@ -3,18 +3,20 @@ from math import ceil
 import pygame
 
 from sprites import make_outline_splites
+from scale_cache import cached_smoothscale
 
 def surface_fit_to_rect(surface: pygame.surface.Surface, rect: pygame.rect.Rect) -> pygame.surface.Surface:
     """
     surfaceのアスペクト比を維持しつつrect内部を満たすsubsurfaceを返す\\
-    surfaceとrectのcenterを揃え，rectからはみ出た部分が切り取られるようにsubsurfaceを返す
+    surfaceとrectのcenterを揃え，rectからはみ出た部分が切り取られるようにsubsurfaceを返す\\
+    拡大・縮小の結果はキャッシュされる
     """
     s_rect = surface.get_rect()
     amp = max(rect.width / s_rect.width, rect.height / s_rect.height)
     if amp != 1:
-        tmpsurface = pygame.transform.smoothscale(surface, (ceil(s_rect.width * amp), ceil(s_rect.height * amp)))
+        tmpsurface = cached_smoothscale(surface, (ceil(s_rect.width * amp), ceil(s_rect.height * amp)))
     else:
-        tmpsurface = surface.copy()
+        tmpsurface = surface
     tag_rect = rect.copy()
     s_rect = tmpsurface.get_rect()
     tag_rect.center = s_rect.center
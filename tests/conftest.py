@@ -0,0 +1,8 @@
+import os
+import sys
+
+# janken/ のモジュールはトップレベルのモジュールとしてimportする (python janken/main.py と同じ)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "janken"))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
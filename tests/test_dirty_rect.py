@@ -0,0 +1,36 @@
+import pygame
+from pygame.rect import Rect
+
+from dirty_rect import BlitRecorder, DirtyRectTracker, merge_rects
+
+
+def record(tracker, blits):
+    recorder = BlitRecorder(pygame.Surface((500, 500)))
+    for source, dest in blits:
+        recorder.blit(source, dest)
+    return tracker.dirty_rects(recorder)
+
+
+def test_merge_rects():
+    assert merge_rects([Rect(0, 0, 10, 10), Rect(0, 0, 10, 10)]) == [Rect(0, 0, 10, 10)]
+    assert merge_rects([Rect(0, 0, 10, 10), Rect(2, 2, 4, 4)]) == [Rect(0, 0, 10, 10)]
+    assert merge_rects([Rect(0, 0, 10, 10), Rect(5, 5, 10, 10)]) == [Rect(0, 0, 15, 15)]
+    # まとめて大きくなった領域が，先に残したものと重なる場合
+    assert merge_rects([Rect(0, 0, 10, 10), Rect(20, 0, 10, 10), Rect(5, 0, 20, 5)]) == [Rect(0, 0, 30, 10)]
+    assert merge_rects([Rect(0, 0, 10, 10), Rect(10, 0, 10, 10)]) == [Rect(0, 0, 10, 10), Rect(10, 0, 10, 10)]
+
+
+def test_swapped_image_gives_one_rect():
+    tracker = DirtyRectTracker()
+    background = pygame.Surface((500, 500))
+    frames = [pygame.Surface((440, 187)) for _ in range(2)]
+    assert record(tracker, [(background, (0, 0)), (frames[0], (30, 73))]) == [Rect(0, 0, 500, 500)]
+    assert record(tracker, [(background, (0, 0)), (frames[0], (30, 73))]) == []
+    assert record(tracker, [(background, (0, 0)), (frames[1], (30, 73))]) == [Rect(30, 73, 440, 187)]
+
+
+def test_separate_changes_stay_separate():
+    tracker = DirtyRectTracker()
+    a, b = pygame.Surface((10, 10)), pygame.Surface((10, 10))
+    record(tracker, [(a, (0, 0)), (a, (100, 100))])
+    assert sorted(map(tuple, record(tracker, [(b, (0, 0)), (b, (100, 100))]))) == [(0, 0, 10, 10), (100, 100, 10, 10)]
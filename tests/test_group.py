@@ -0,0 +1,65 @@
+import pygame
+import pytest
+
+from group import Group, LayeredGroup
+from sprites import SimpleSprite
+
+
+def red_sprite(x, y):
+    image = pygame.Surface((10, 10))
+    image.fill((255, 0, 0))
+    return SimpleSprite(pygame.Rect(x, y, 10, 10), image)
+
+
+@pytest.fixture(params=[True, False], ids=["flat", "recursive"])
+def flatten(request, monkeypatch):
+    monkeypatch.setattr(Group, "flatten", request.param)
+    return request.param
+
+
+def test_clear_erases_nested_sprites(flatten):
+    surface = pygame.Surface((100, 100))
+    background = pygame.Surface((100, 100))
+    root = Group()
+    child = Group()
+    layered = LayeredGroup()
+    root.add(red_sprite(0, 0), child, layered)
+    child.add(red_sprite(20, 20))
+    layered.front_sprites.add(red_sprite(40, 40))
+    root.draw(surface)
+    assert surface.get_at((25, 25)) == (255, 0, 0)
+    assert surface.get_at((45, 45)) == (255, 0, 0)
+
+    root.clear(surface, background)
+    assert pygame.image.tobytes(surface, "RGB") == pygame.image.tobytes(background, "RGB")
+
+
+def test_clear_erases_removed_sprite(flatten):
+    surface = pygame.Surface((100, 100))
+    background = pygame.Surface((100, 100))
+    root = Group()
+    child = Group()
+    root.add(child)
+    sprite = red_sprite(20, 20)
+    child.add(sprite)
+    root.draw(surface)
+    child.remove(sprite)
+    root.clear(surface, background)
+    assert surface.get_at((25, 25)) == (0, 0, 0)
+    # 描画した後は，削除した領域を覚えておかない
+    root.draw(surface)
+    assert child.lostsprites == []
+
+
+def test_clear_after_move(flatten):
+    surface = pygame.Surface((100, 100))
+    cleared = []
+    root = Group()
+    child = Group()
+    root.add(child)
+    sprite = red_sprite(20, 20)
+    child.add(sprite)
+    root.draw(surface)
+    sprite.rect.move_ip(30, 0)
+    root.clear(surface, lambda surface, rect: cleared.append(tuple(rect)))
+    assert cleared == [(20, 20, 10, 10)]
@@ -0,0 +1,43 @@
+import pygame
+import pytest
+
+from clock import GameClock
+from pacing import FramePacer
+
+
+@pytest.fixture
+def display():
+    pygame.init()
+    pygame.display.set_mode((100, 100))
+    pygame.event.clear()
+    yield
+    pygame.event.clear()
+
+
+def idle_pacer() -> FramePacer:
+    pacer = FramePacer(idle_fps=100, idle_after=0)
+    pacer.idle = True
+    return pacer
+
+
+def test_waking_event_stays_before_later_events(display):
+    pacer = idle_pacer()
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_a))
+    pygame.event.post(pygame.event.Event(pygame.KEYUP, key=pygame.K_a))
+    pacer.tick(GameClock(), 60, False)
+    assert not pacer.idle
+    assert pacer.wakeups == 1
+    events = pacer.take_events() + pygame.event.get()
+    assert [event.type for event in events] == [pygame.KEYDOWN, pygame.KEYUP]
+    assert pacer.take_events() == []
+
+
+def test_idle_wait_without_events(display):
+    pacer = idle_pacer()
+    clock = GameClock()
+    pacer.tick(clock, 60, False)
+    assert pacer.idle
+    assert pacer.idle_frames == 1
+    assert pacer.take_events() == []
+    # 待っていた間の時間で更新を追いかけない
+    assert clock.steps() == 1
@@ -0,0 +1,49 @@
+import os
+
+import pygame
+import pytest
+
+from screen import BaseScreen
+from component import SimpleButton
+
+
+@pytest.fixture
+def screen(monkeypatch):
+    # フォントなどはリポジトリのルートからの相対パス
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    # フォントはfont_registryにキャッシュされるので，pygame.quit()はしない
+    pygame.init()
+    pygame.display.set_mode((700, 700))
+    return BaseScreen()
+
+
+def click(screen, pos):
+    for pressed in (False, True, False):
+        screen.pointer_input = (pos, pressed)
+        screen.update()
+
+
+def test_moved_button_is_pressed_at_new_position(screen):
+    pressed = []
+    button = SimpleButton(width=100, height=40, text="x", outline=pygame.Surface((700, 700)), func=lambda: pressed.append(1))
+    screen.middle_sprites.add(button)
+    click(screen, (50, 20))
+    assert len(pressed) == 1
+
+    # SimpleButton.update()が中のスプライトを動かす
+    button.rect.topleft = (300, 300)
+    screen.update()
+    click(screen, (50, 20))
+    assert len(pressed) == 1
+    click(screen, (350, 320))
+    assert len(pressed) == 2
+
+
+def test_dispatch_does_not_rebuild_without_changes(screen):
+    button = SimpleButton(width=100, height=40, text="x", outline=pygame.Surface((700, 700)), func=lambda: None)
+    screen.middle_sprites.add(button)
+    screen.update()
+    rebuilds = screen.pointer.rebuilds
+    for _ in range(10):
+        click(screen, (50, 20))
+    assert screen.pointer.rebuilds == rebuilds
@@ -0,0 +1,54 @@
+import os
+
+import pygame
+import pytest
+
+import surface_cache
+from surface_cache import SurfaceCache
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """file_digest()でハッシュを求めたファイルのリスト
+    """
+    paths = []
+    file_digest = surface_cache.file_digest
+
+    def counted(path):
+        paths.append(path)
+        return file_digest(path)
+
+    monkeypatch.setattr(surface_cache, "file_digest", counted)
+    return paths
+
+
+def test_digest_is_reused_until_file_changes(tmp_path, hashed):
+    path = str(tmp_path / "voice.wav")
+    with open(path, "wb") as f:
+        f.write(b"a" * 100)
+    digest = SurfaceCache().digest(path)
+    assert hashed == [path]
+    hashed.clear()
+    # 別のインスタンス(次の起動)でも，ファイルを読まずに記録した値を使う
+    assert SurfaceCache().digest(path) == digest
+    assert hashed == []
+
+    with open(path, "wb") as f:
+        f.write(b"b" * 101)
+    assert SurfaceCache().digest(path) != digest
+    assert hashed == [path]
+
+
+def test_digest_uses_surface_cache_header(tmp_path, hashed):
+    path = str(tmp_path / "face.png")
+    surface = pygame.Surface((4, 4))
+    pygame.image.save(surface, path)
+    cache = SurfaceCache()
+    cache.store(path, surface)
+    expected = surface_cache.file_digest(path)
+    # .digestが無くても，.surfのヘッダに記録したハッシュを使う
+    os.remove(cache.digest_path(path))
+    hashed.clear()
+    assert SurfaceCache().digest(path) == expected
+    assert hashed == []
+    assert not os.path.exists(cache.digest_path(path))
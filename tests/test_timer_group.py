@@ -0,0 +1,174 @@
+import random
+
+from group import Group, LayeredGroup
+from component import TimerGroup
+
+
+class CountingTimerGroup(LayeredGroup):
+    """ヒープにする前のTimerGroup．update()のたびに全てのタイマーの残りtick数を数え直す(比較用)
+    """
+    def __init__(self):
+        super().__init__()
+        self.time_sprites = {}
+
+    def add_timer_sprite(self, sprite, timer, start_delay=0, on_delete_fnc=None, on_delete_fnc_args=None, layer="middle", debug_label=""):
+        self.time_sprites[sprite] = {
+            "time": timer,
+            "start_delay": start_delay,
+            "fnc": on_delete_fnc,
+            "fnc_args": on_delete_fnc_args,
+            "layer": layer,
+        }
+
+    def busy(self):
+        return bool(self.time_sprites) or super().busy()
+
+    def _layer(self, layer):
+        if layer == "front":
+            return self.front_sprites
+        elif layer == "middle":
+            return self.middle_sprites
+        return self.background_sprites
+
+    def update(self):
+        delete_sprites = []
+        for sprite, dic in self.time_sprites.items():
+            if dic["start_delay"] > 0:
+                dic["start_delay"] -= 1
+            elif dic["start_delay"] == 0:
+                self._layer(dic["layer"]).add(sprite)
+                dic["start_delay"] -= 1
+            else:
+                dic["time"] -= 1
+                if dic["time"] <= 0:
+                    delete_sprites.append(sprite)
+
+        for sprite in delete_sprites:
+            dic = self.time_sprites.pop(sprite)
+            self._layer(dic["layer"]).remove(sprite)
+            if dic["fnc"] is not None:
+                if dic["fnc_args"] is not None:
+                    dic["fnc"](dic["fnc_args"])
+                else:
+                    dic["fnc"]()
+
+
+def run_schedule(timer_group, seed, ticks=300, n_sprites=40):
+    """乱数で決めたタイマーを登録しながらupdate()を呼び，tickごとの各レイヤーの中身と呼ばれた関数を記録する
+    """
+    rnd = random.Random(seed)
+    sprites = [Group() for _ in range(n_sprites)]
+    index = {sprite: i for i, sprite in enumerate(sprites)}
+    log = []
+    now = [0]
+
+    def on_delete(i):
+        log.append(("deleted", now[0], i))
+        if rnd.random() < 0.5:
+            sprite = rnd.choice(sprites)
+            # 関数の中で登録中のスプライトを登録し直した場合の順番は，前の実装でも決まっていない
+            if sprite in timer_group.time_sprites:
+                return
+            timer_group.add_timer_sprite(sprite, rnd.randrange(5), rnd.randrange(5), on_delete_fnc=on_delete,
+                                         on_delete_fnc_args=index[sprite], layer=rnd.choice(["front", "middle", "back"]))
+
+    for t in range(ticks):
+        now[0] = t
+        if rnd.random() < 0.3:
+            sprite = rnd.choice(sprites)
+            timer_group.add_timer_sprite(sprite, rnd.randrange(8), rnd.randrange(8), on_delete_fnc=on_delete,
+                                         on_delete_fnc_args=index[sprite], layer=rnd.choice(["front", "middle", "back"]))
+        timer_group.update()
+        log.append((
+            t,
+            sorted(index[group] for group in timer_group.front_sprites.groups()),
+            sorted(index[group] for group in timer_group.middle_sprites.groups()),
+            sorted(index[group] for group in timer_group.background_sprites.groups()),
+            timer_group.busy(),
+        ))
+    return log
+
+
+def test_same_as_counting_timer_group():
+    for seed in range(200):
+        assert run_schedule(TimerGroup(), seed) == run_schedule(CountingTimerGroup(), seed), seed
+
+
+def updates_until(timer_group, predicate, limit=100):
+    for n in range(1, limit + 1):
+        timer_group.update()
+        if predicate():
+            return n
+    return None
+
+
+def test_start_delay_and_lifetime():
+    for start_delay in range(4):
+        for timer in range(4):
+            timer_group = TimerGroup()
+            sprite = Group()
+            timer_group.add_timer_sprite(sprite, timer, start_delay=start_delay)
+            # start_delay回目の次のupdate()で追加し，その後max(timer, 1)回のupdate()で削除する
+            added = updates_until(timer_group, lambda: sprite in timer_group.middle_sprites.groups())
+            assert added == start_delay + 1
+            removed = updates_until(timer_group, lambda: sprite not in timer_group.middle_sprites.groups())
+            assert removed == max(timer, 1)
+            assert not timer_group.busy()
+
+
+def test_replace_timer_keeps_sprite():
+    timer_group = TimerGroup()
+    sprite = Group()
+    timer_group.add_timer_sprite(sprite, 2)
+    timer_group.update()
+    assert sprite in timer_group.middle_sprites.groups()
+    # 同じスプライトのタイマーを置き換えると，追加したまま新しいタイマーで数え直す
+    timer_group.add_timer_sprite(sprite, 3)
+    assert updates_until(timer_group, lambda: sprite not in timer_group.middle_sprites.groups()) == 4
+
+
+def test_cancel_before_start():
+    timer_group = TimerGroup()
+    sprite = Group()
+    called = []
+    handle = timer_group.add_timer_sprite(sprite, 3, start_delay=2, on_delete_fnc=called.append, on_delete_fnc_args=1)
+    handle.cancel()
+    assert not handle.active
+    assert not timer_group.busy()
+    for _ in range(10):
+        timer_group.update()
+        assert sprite not in timer_group.middle_sprites.groups()
+    assert called == []
+
+
+def test_cancel_after_start():
+    timer_group = TimerGroup()
+    sprite = Group()
+    kept = Group()
+    called = []
+    handle = timer_group.add_timer_sprite(sprite, 5, layer="front", on_delete_fnc=called.append, on_delete_fnc_args=1)
+    timer_group.add_timer_sprite(kept, 5, on_delete_fnc=called.append, on_delete_fnc_args=2)
+    timer_group.update()
+    handle.cancel()
+    assert sprite not in timer_group.front_sprites.groups()
+    # remove_sprite=Falseの場合は追加したスプライトを残す
+    timer_group.cancel_timer_sprite(kept, remove_sprite=False)
+    assert kept in timer_group.middle_sprites.groups()
+    assert not timer_group.busy()
+    for _ in range(10):
+        timer_group.update()
+    assert called == []
+    assert kept in timer_group.middle_sprites.groups()
+
+
+def test_cancel_many_compacts_queue():
+    timer_group = TimerGroup()
+    handles = [timer_group.add_timer_sprite(Group(), 10) for _ in range(100)]
+    for handle in handles[::2]:
+        handle.cancel()
+    # 取り消したものが半分を超えたらヒープを作り直す
+    assert len(timer_group._queue) <= 2 * len(timer_group.time_sprites)
+    for _ in range(11):
+        timer_group.update()
+    assert not timer_group.busy()
+    assert not any(handle.active for handle in handles)